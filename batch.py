@@ -0,0 +1,214 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+import pytesseract
+from database import DatabaseManager
+from detectors import DETECTORS, create_detector, find_cascade_path, find_model_path
+from engine import DetectionEngine, DetectionZone, ImageArchiver, StageTimings
+from ocr import OCREngine, BACKENDS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+# One engine per worker process, built by the pool initializer
+_worker_engine = None
+
+
+def init_worker(detector, model_path, output_dir, tesseract_cmd, ocr_backend, zone=None, detect_scale=1.0):
+    global _worker_engine
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _worker_engine = DetectionEngine(detector=create_detector(detector, model_path), output_dir=output_dir,
+                                     ocr=OCREngine(ocr_backend), zones={None: zone} if zone else None,
+                                     detect_scale=detect_scale)
+
+
+def process_image_file(path):
+    img = cv2.imread(path)
+    if img is None:
+        print(f"Could not read image file: {path}")
+        return path, None, None
+    timings = {}
+    return path, strip_images(_worker_engine.process_frame(img, timings=timings)), timings
+
+
+def process_video_frame(label, frame):
+    timings = {}
+    return label, strip_images(_worker_engine.process_frame(frame, timings=timings)), timings
+
+
+def strip_images(plates):
+    # Only the encoded JPEG needs to travel back to the parent
+    for plate in plates:
+        plate.pop('image', None)
+    return plates
+
+
+def resolve_model_path(detector, path=None):
+    if detector == 'haar':
+        path = path or find_cascade_path()
+        if path is None:
+            raise FileNotFoundError("Haarcascade file not found.")
+    else:
+        path = path or find_model_path()
+        if path is None:
+            raise FileNotFoundError("ONNX plate detection model not found.")
+    return path
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def iter_video_frames(video_path, frame_step):
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video file: {video_path}")
+    index = 0
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret or frame is None:
+                break
+            if index % frame_step == 0:
+                yield f"{video_path}#{index}", frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def run_batch(input_path, db_manager, workers=None, output_dir=None, frame_step=1,
+              cascade_path=None, tesseract_cmd=None, ocr_backend='auto', max_pending=None, camera=None, lane=None,
+              zone=None, detect_scale=1.0, detector='haar', model_path=None):
+    model_path = resolve_model_path(detector, model_path or cascade_path)
+    archiver = ImageArchiver() if output_dir else None
+    workers = workers or os.cpu_count() or 1
+    # Bound the frames in flight so a long video doesn't end up in memory
+    max_pending = max_pending or workers * 4
+
+    frames = 0
+    plates_found = 0
+    failed = 0
+    # Stage timings come back from the workers with each frame's result
+    stage_timings = StageTimings()
+    # Saves are queued without waiting so the database writer can group them into
+    # one commit; they are waited on a writer batch at a time
+    saves = []
+    start = time.perf_counter()
+
+    def wait_for_saves():
+        wait(saves)
+        saves.clear()
+
+    def collect(future):
+        nonlocal frames, plates_found, failed
+        label, plates, timings = future.result()
+        frames += 1
+        if plates is None:
+            failed += 1
+            return
+        stage_timings.add(timings)
+        plates_found += len(plates)
+        if plates:
+            save = db_manager.save_detection(plates, camera=camera, lane=lane, wait=False)
+            if save is not None:
+                saves.append(save)
+                if len(saves) >= db_manager.batch_size:
+                    wait_for_saves()
+            if archiver is not None:
+                for plate in plates:
+                    archiver.submit(plate['filename'], plate['jpeg'])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(detector, model_path, output_dir, tesseract_cmd, ocr_backend, zone,
+                                       detect_scale)) as pool:
+        pending = set()
+        if os.path.isdir(input_path):
+            jobs = ((process_image_file, path) for path in list_images(input_path))
+        else:
+            jobs = ((process_video_frame, label, frame)
+                    for label, frame in iter_video_frames(input_path, frame_step))
+        for job in jobs:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            pending.add(pool.submit(*job))
+        for future in pending:
+            collect(future)
+    wait_for_saves()
+    if archiver is not None:
+        archiver.close(timeout=None)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'frames': frames,
+        'failed': failed,
+        'plates': plates_found,
+        'workers': workers,
+        'elapsed': elapsed,
+        'frames_per_sec': frames / elapsed if elapsed > 0 else 0.0,
+        'plates_per_sec': plates_found / elapsed if elapsed > 0 else 0.0,
+        'stages': stage_timings.summary(),
+        'stages_text': stage_timings.format(),
+    }
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless license plate detection over an image folder or video file")
+    parser.add_argument('input', help="Directory of images or a video file")
+    parser.add_argument('--db', default='license_plates.db', help="SQLite database to write detections to")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--output-dir', default=None, help="Archive plate crops to this directory (default: don't write crops)")
+    parser.add_argument('--frame-step', type=int, default=1, help="Process every Nth video frame")
+    parser.add_argument('--detector', default='haar', choices=sorted(DETECTORS),
+                        help="Plate detector backend (default: haar)")
+    parser.add_argument('--cascade', default=None, help="Path to the Haar cascade XML")
+    parser.add_argument('--model', default=None, help="Path to the ONNX model for the dnn detector")
+    parser.add_argument('--tesseract-cmd', default=None, help="Path to the tesseract executable")
+    parser.add_argument('--ocr-backend', default='auto', choices=['auto'] + sorted(BACKENDS),
+                        help="OCR backend (default: in-process tesserocr if available, else pytesseract)")
+    parser.add_argument('--camera', default=None, help="Camera name to tag the detections with")
+    parser.add_argument('--lane', default=None, help="Lane to tag the detections with")
+    parser.add_argument('--detect-scale', type=float, default=1.0,
+                        help="Run the detector on frames shrunk by this factor (e.g. 0.5); OCR still uses full resolution")
+    parser.add_argument('--auto-zone', action='store_true',
+                        help="Restrict detection to the region and plate sizes learned from this camera's stored plates")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        parser.error(f"Input not found: {args.input}")
+    if args.frame_step < 1:
+        parser.error("--frame-step must be at least 1")
+    if not 0 < args.detect_scale <= 1:
+        parser.error("--detect-scale must be in (0, 1]")
+
+    db_manager = DatabaseManager(args.db)
+    zone = None
+    if args.auto_zone:
+        zone = DetectionZone.from_boxes(db_manager.get_plate_boxes(args.camera))
+        if zone is None:
+            print("Not enough stored plates to calibrate a zone, searching whole frames")
+        else:
+            print(f"Calibrated from {zone.samples} plates: {zone}")
+    stats = run_batch(args.input, db_manager, workers=args.workers, output_dir=args.output_dir,
+                      frame_step=args.frame_step, cascade_path=args.cascade,
+                      detector=args.detector, model_path=args.model,
+                      tesseract_cmd=args.tesseract_cmd, ocr_backend=args.ocr_backend,
+                      camera=args.camera, lane=args.lane, zone=zone, detect_scale=args.detect_scale)
+    db_manager.close()
+    print(f"Processed {stats['frames']} frames ({stats['failed']} unreadable) with {stats['workers']} workers "
+          f"in {stats['elapsed']:.2f}s")
+    print(f"Plates detected: {stats['plates']}")
+    print(f"Throughput: {stats['frames_per_sec']:.2f} frames/s, {stats['plates_per_sec']:.2f} plates/s")
+    if stats['stages_text']:
+        print(f"Mean time per frame: {stats['stages_text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from batch import list_images, resolve_model_path, run_batch
+from database import DatabaseManager
+from detectors import DETECTORS, create_detector
+from engine import DetectionEngine
+from ocr import OCREngine, BACKENDS
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+STAGES = ('decode', 'grayscale', 'detect', 'crop', 'ocr', 'save')
+PLATE_CHARS = 'ABCEHKMOPTXY'
+CLIP_NAME = 'gate_clip.avi'
+
+
+def plate_text(rng):
+    letters = rng.choice(list(PLATE_CHARS), 3)
+    digits = rng.integers(0, 10, 5)
+    return f"{letters[0]}{digits[0]}{digits[1]}{digits[2]}{letters[1]}{letters[2]}{digits[3]}{digits[4]}"
+
+
+def draw_gate_frame(rng, size=(640, 480), text=None, position=None):
+    # Flat background with sensor noise and one plate-like box, close to what the gate camera sees
+    width, height = size
+    frame = np.full((height, width, 3), int(rng.integers(60, 140)), np.uint8)
+    noise = rng.normal(0, 6, frame.shape)
+    frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    text = text or plate_text(rng)
+    x, y = position or (int(rng.integers(40, width - 260)), int(rng.integers(height // 2, height - 80)))
+    cv2.rectangle(frame, (x, y), (x + 200, y + 46), (255, 255, 255), -1)
+    cv2.rectangle(frame, (x, y), (x + 200, y + 46), (0, 0, 0), 2)
+    cv2.putText(frame, text, (x + 6, y + 36), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2, cv2.LINE_AA)
+    return frame
+
+
+def make_corpus(directory, images=40, clip_frames=60, seed=1234):
+    # Writes the same synthetic gate images and clip for a given seed, so runs are comparable
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for i in range(images):
+        cv2.imwrite(os.path.join(directory, f'gate_{i:03d}.png'), draw_gate_frame(rng))
+    writer = cv2.VideoWriter(os.path.join(directory, CLIP_NAME), cv2.VideoWriter_fourcc(*'MJPG'), 15, (640, 480))
+    text = plate_text(rng)
+    for i in range(clip_frames):
+        # One car rolling towards the barrier
+        writer.write(draw_gate_frame(rng, text=text, position=(60 + i * 4, 250 + i)))
+    writer.release()
+    with open(os.path.join(directory, 'corpus.json'), 'w') as file:
+        json.dump({'seed': seed, 'images': images, 'clip_frames': clip_frames}, file)
+
+
+def iter_corpus(directory):
+    # Yields (stage time of decode, frame) for every image and every clip frame
+    for path in list_images(directory):
+        start = time.perf_counter()
+        img = cv2.imread(path)
+        elapsed = time.perf_counter() - start
+        if img is not None:
+            yield elapsed, img
+    clip = os.path.join(directory, CLIP_NAME)
+    if os.path.exists(clip):
+        capture = cv2.VideoCapture(clip)
+        while True:
+            start = time.perf_counter()
+            ret, frame = capture.read()
+            elapsed = time.perf_counter() - start
+            if not ret:
+                break
+            yield elapsed, frame
+        capture.release()
+
+
+def summarize(samples):
+    samples = np.array(samples) * 1000
+    return {
+        'count': int(len(samples)),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+    }
+
+
+def time_stages(engine, db_manager, directory, repeat=3):
+    samples = {stage: [] for stage in STAGES}
+    # One untimed pass so cascade parsing, OCR start-up and disk caches don't count
+    passes = [False] + [True] * repeat
+    for timed in passes:
+        for decode_time, img in iter_corpus(directory):
+            marks = {'decode': decode_time}
+            start = time.perf_counter()
+            image, offset, min_size, max_size = engine.prepare_detection(img)
+            marks['grayscale'] = time.perf_counter() - start
+            start = time.perf_counter()
+            plates = engine.restore_boxes(engine.detector.detect(image, min_size, max_size), offset)
+            marks['detect'] = time.perf_counter() - start
+            start = time.perf_counter()
+            crops = [engine.extract_plate(img, box) for box in plates]
+            marks['crop'] = time.perf_counter() - start
+            start = time.perf_counter()
+            readings = engine.ocr.read_plates(crops)
+            marks['ocr'] = time.perf_counter() - start
+            plates_data = [{
+                'text': text, 'x': int(x), 'y': int(y), 'w': int(w), 'h': int(h),
+                'confidence': confidence, 'filename': None,
+                'jpeg': cv2.imencode('.jpg', crop)[1].tobytes(),
+            } for (x, y, w, h), crop, (text, error, confidence, source) in zip(plates, crops, readings)]
+            start = time.perf_counter()
+            db_manager.save_detection(plates_data)
+            marks['save'] = time.perf_counter() - start
+            if timed:
+                for stage, seconds in marks.items():
+                    samples[stage].append(seconds)
+    return {stage: summarize(values) for stage, values in samples.items() if values}
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process and of finished worker processes
+    if resource is not None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        unit = 1 if sys.platform == 'darwin' else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+        return {'self': own / 2 ** 20, 'workers': children / 2 ** 20}
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return {'self': getattr(info, 'peak_wset', info.rss) / 2 ** 20, 'workers': None}
+    return None
+
+
+def run(args):
+    if not os.path.isdir(args.corpus) or not list_images(args.corpus):
+        print(f"Generating synthetic corpus in {args.corpus} (seed {args.seed})")
+        make_corpus(args.corpus, seed=args.seed)
+    model_path = resolve_model_path(args.detector, args.model)
+    engine = DetectionEngine(detector=create_detector(args.detector, model_path),
+                             ocr=OCREngine(args.ocr_backend), detect_scale=args.detect_scale)
+    work_dir = tempfile.mkdtemp(prefix='plate_bench_')
+    try:
+        db_manager = DatabaseManager(os.path.join(work_dir, 'stages.db'))
+        stages = time_stages(engine, db_manager, args.corpus, args.repeat)
+        db_manager.close()
+
+        throughput = {}
+        max_workers = args.max_workers or os.cpu_count() or 1
+        for workers in range(1, max_workers + 1):
+            db_manager = DatabaseManager(os.path.join(work_dir, f'throughput_{workers}.db'))
+            stats = run_batch(args.corpus, db_manager, workers=workers, ocr_backend=args.ocr_backend,
+                              detector=args.detector, model_path=model_path, detect_scale=args.detect_scale)
+            db_manager.close()
+            throughput[str(workers)] = {'frames': stats['frames'], 'frames_per_sec': stats['frames_per_sec']}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'detector': args.detector,
+            'ocr_backend': engine.ocr.backend.name,
+            'detect_scale': args.detect_scale,
+            'corpus': os.path.abspath(args.corpus),
+            'repeat': args.repeat,
+        },
+        'stages': stages,
+        'throughput': throughput,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    print(f"{'stage':<10} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for stage in STAGES:
+        if stage in stages:
+            s = stages[stage]
+            print(f"{stage:<10} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f}")
+    for workers, stats in throughput.items():
+        print(f"{workers} worker(s): {stats['frames_per_sec']:.2f} frames/s")
+    if results['peak_rss_mb']:
+        print(f"Peak RSS: {results['peak_rss_mb']['self']:.1f} MB"
+              + (f" (workers {results['peak_rss_mb']['workers']:.1f} MB)" if results['peak_rss_mb']['workers'] else ''))
+    print(f"Results written to {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = []
+    print(f"{'metric':<22} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    def check(metric, old, new, higher_is_better):
+        if old is None or new is None or old == 0:
+            return
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > args.threshold:
+            flag = '  REGRESSION'
+            regressions.append(metric)
+        print(f"{metric:<22} {old:>10.2f} {new:>10.2f} {change:>+8.1%}{flag}")
+
+    for stage in STAGES:
+        old = baseline['stages'].get(stage, {}).get('mean_ms')
+        new = current['stages'].get(stage, {}).get('mean_ms')
+        check(f"{stage} mean ms", old, new, higher_is_better=False)
+    for workers in sorted(set(baseline['throughput']) & set(current['throughput']), key=int):
+        check(f"{workers} worker(s) frames/s", baseline['throughput'][workers]['frames_per_sec'],
+              current['throughput'][workers]['frames_per_sec'], higher_is_better=True)
+    old_rss = (baseline.get('peak_rss_mb') or {}).get('self')
+    new_rss = (current.get('peak_rss_mb') or {}).get('self')
+    check("peak RSS MB", old_rss, new_rss, higher_is_better=False)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark for the plate recognition pipeline")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Benchmark the pipeline and write the results as JSON")
+    run_parser.add_argument('--corpus', default='benchmarks/corpus',
+                            help="Directory of gate images plus an optional gate_clip.avi "
+                                 "(generated from --seed if missing)")
+    run_parser.add_argument('--seed', type=int, default=1234, help="Seed for the generated corpus")
+    run_parser.add_argument('--output', default='benchmark.json', help="Where to write the results")
+    run_parser.add_argument('--repeat', type=int, default=3, help="Timed passes over the corpus")
+    run_parser.add_argument('--max-workers', type=int, default=None,
+                            help="Measure throughput for 1..N workers (default: all cores)")
+    run_parser.add_argument('--detector', default='haar', choices=sorted(DETECTORS))
+    run_parser.add_argument('--model', default=None, help="Cascade XML or ONNX model for the detector")
+    run_parser.add_argument('--ocr-backend', default='auto', choices=['auto'] + sorted(BACKENDS))
+    run_parser.add_argument('--detect-scale', type=float, default=1.0)
+
+    compare_parser = commands.add_parser('compare', help="Flag regressions against a saved baseline")
+    compare_parser.add_argument('baseline', help="Results JSON to compare against")
+    compare_parser.add_argument('current', help="Results JSON of the run being checked")
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="Relative slowdown that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import threading
+import time
+import cv2
+from metrics import REGISTRY
+
+CAPTURES = REGISTRY.counter('alpr_captures_total', "Captures fired by the capture trigger")
+
+
+class FrameGrabber:
+    """Reads a capture device as fast as it delivers and keeps only the newest frame.
+
+    Frames are decoded into a preallocated back buffer and swapped with the
+    front buffer, so the camera is never held up by whoever is consuming.
+    Consumers ask for a frame newer than the last sequence number they saw and
+    get a private copy. A frame replaced before any consumer took it counts as
+    dropped; ``stats`` also reports how old the newest frame is.
+    """
+
+    def __init__(self, capture, name='camera', retry_delay=0.1):
+        self.capture = capture
+        self.name = name
+        self.retry_delay = retry_delay
+        self._front = None
+        self._back = None
+        self._seq = 0
+        self._consumed_seq = 0
+        self._frame_time = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.fps = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-grabber", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            # read() decodes in place when the buffer already has the frame's shape
+            ret, frame = self.capture.read(self._back)
+            if not ret or frame is None:
+                self.read_failures += 1
+                time.sleep(self.retry_delay)
+                continue
+            now = time.monotonic()
+            with self._cond:
+                if self._seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                if self._frame_time is not None and now > self._frame_time:
+                    self.fps = 0.9 * self.fps + 0.1 / (now - self._frame_time)
+                self._back, self._front = self._front, frame
+                self._seq += 1
+                self._frame_time = now
+                self.frames_read += 1
+                self._cond.notify_all()
+
+    def latest(self, last_seq=0, timeout=None, consume=True):
+        # Returns (seq, frame copy) for the newest frame after last_seq, or (last_seq, None) on timeout.
+        # Peeking with consume=False (the preview) does not stop the frame counting as dropped.
+        with self._cond:
+            if self._seq <= last_seq:
+                self._cond.wait_for(lambda: self._seq > last_seq or not self._running, timeout)
+            if self._seq <= last_seq or self._front is None:
+                return last_seq, None
+            if consume:
+                self._consumed_seq = self._seq
+            return self._seq, self._front.copy()
+
+    def frame_age(self):
+        # Seconds since the newest frame arrived
+        with self._cond:
+            if self._frame_time is None:
+                return None
+            return time.monotonic() - self._frame_time
+
+    def stats(self):
+        age = self.frame_age()
+        with self._cond:
+            return {
+                'frames_read': self.frames_read,
+                'frames_dropped': self.frames_dropped,
+                'read_failures': self.read_failures,
+                'fps': round(self.fps, 1),
+                'frame_age_ms': None if age is None else round(age * 1000, 1),
+            }
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.capture.release()
+
+
+class LoopingVideoCapture:
+    """Plays a video file on repeat at its recorded frame rate.
+
+    Lets a recording stand in for a live camera, so the whole capture path can
+    run without hardware.
+    """
+
+    def __init__(self, path, default_fps=25.0):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / (fps if fps and fps > 0 else default_fps)
+        self._next_frame = time.monotonic()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def set(self, prop, value):
+        return self.capture.set(prop, value)
+
+    def read(self, image=None):
+        delay = self._next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame = max(self._next_frame, time.monotonic()) + self.frame_interval
+        ret, frame = self.capture.read(image)
+        if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read(image)
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+class CameraSource:
+    """Where a camera's frames come from and how its detections are tagged.
+
+    ``source`` is a device index, an RTSP/HTTP URL or a path to a video file.
+    ``zone`` optionally limits where and at what size plates are searched for.
+    ``width``/``height`` request a capture size from a device; by default it
+    runs at whatever resolution the driver delivers.
+    """
+
+    def __init__(self, name, source, lane=None, width=None, height=None, zone=None):
+        self.name = name
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.lane = lane
+        self.width = width
+        self.height = height
+        self.zone = zone
+
+    @property
+    def kind(self):
+        if isinstance(self.source, int):
+            return 'device'
+        if '://' in self.source:
+            return 'stream'
+        return 'file'
+
+    def open(self):
+        if self.kind == 'file':
+            capture = LoopingVideoCapture(self.source)
+        else:
+            capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            capture.release()
+            raise IOError(f"Could not open {self.kind} source for camera '{self.name}': {self.source}")
+        if self.kind == 'device' and self.width and self.height:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return capture
+
+
+class CameraFeed:
+    """A running camera: its grabber plus the thread that feeds its capture trigger.
+
+    Feeds only decide *when* to capture. ``on_capture(feed, frame)`` hands the
+    BGR frame on, so any number of feeds can share one detection pool.
+    """
+
+    def __init__(self, source, trigger, on_capture):
+        self.source = source
+        self.trigger = trigger
+        self.on_capture = on_capture
+        self.grabber = None
+        self.running = False
+        self._thread = None
+
+    @property
+    def name(self):
+        return self.source.name
+
+    def start(self):
+        self.grabber = FrameGrabber(self.source.open(), name=self.name)
+        self.grabber.start()
+        self.trigger.reset()
+        self.running = True
+        self._thread = threading.Thread(target=self._watch, name=f"{self.name}-trigger", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        # Frames that arrive while the trigger is busy are skipped, not queued
+        grabber = self.grabber
+        seq = 0
+        while self.running:
+            try:
+                seq, frame = grabber.latest(seq, timeout=0.5)
+                if frame is not None and self.trigger.update(frame):
+                    CAPTURES.inc(camera=self.name)
+                    self.on_capture(self, frame)
+            except Exception as e:
+                print(f"Camera '{self.name}' update error: {e}")
+                time.sleep(0.1)
+
+    def latest(self, last_seq=0, timeout=0, consume=False):
+        if self.grabber is None:
+            return last_seq, None
+        return self.grabber.latest(last_seq, timeout=timeout, consume=consume)
+
+    def stats(self):
+        stats = self.grabber.stats() if self.grabber is not None else {}
+        stats.update(self.trigger.stats())
+        return stats
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
@@ -0,0 +1,194 @@
+import argparse
+import os
+import sys
+import threading
+import cv2
+import numpy as np
+from database import DatabaseManager
+
+GLYPH_SIZE = (12, 20)
+MODEL_PATH = 'models/char_classifier.npz'
+
+
+def text_mask(plate_binary):
+    # Characters as white on black, whichever way round the plate was thresholded
+    binary = (plate_binary > 127).astype(np.uint8) * 255
+    return 255 - binary if binary.mean() > 127 else binary
+
+
+def segment_characters(plate_binary, min_height=0.35, max_height=0.95, max_width=0.25, min_area=12,
+                       split_ratio=1.6):
+    """Boxes (x, y, w, h) of the character blobs in a binarized plate, left to right.
+
+    Connected components that are too short, too tall, too wide or too small
+    to be a character (borders, bolts, the region flag, speckle) are dropped.
+    Blobs much wider than the typical character are touching characters and
+    are cut into equal slices.
+    """
+    mask = text_mask(plate_binary)
+    height, width = mask.shape[:2]
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    x, y, w, h, area = stats[1:].T
+    keep = ((h >= min_height * height) & (h <= max_height * height) & (w <= max_width * width)
+            & (area >= min_area))
+    boxes = stats[1:][keep][:, :4]
+    if not len(boxes):
+        return boxes.reshape(0, 4)
+    boxes = boxes[np.argsort(boxes[:, 0])]
+    typical = np.median(boxes[:, 2])
+    split = []
+    for bx, by, bw, bh in boxes:
+        pieces = int(round(bw / typical)) if bw > split_ratio * typical else 1
+        edges = np.linspace(bx, bx + bw, pieces + 1).round().astype(int)
+        split.extend((left, by, right - left, bh) for left, right in zip(edges[:-1], edges[1:]))
+    return np.array(split, dtype=np.int32).reshape(-1, 4)
+
+
+def glyph_vectors(plate_binary, boxes, size=GLYPH_SIZE):
+    # One unit-length row per character, resized to a fixed grid
+    mask = text_mask(plate_binary)
+    vectors = np.empty((len(boxes), size[0] * size[1]), np.float32)
+    for i, (x, y, w, h) in enumerate(boxes):
+        glyph = cv2.resize(mask[y:y + h, x:x + w], size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        vectors[i] = glyph.ravel()
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+class CharClassifier:
+    """Nearest-neighbour classifier for single plate characters.
+
+    Every training glyph is kept as a unit vector; a character is labelled
+    with the class of its most similar sample (cosine similarity, one matrix
+    product per plate). Confidence compares the distance to the best class
+    with the distance to the runner-up class: 1.0 for an exact match, near
+    0 when two classes are equally close. Plates that segment into a number
+    of characters never seen in training are not read at all, since a
+    character was lost or split.
+    """
+
+    def __init__(self, samples=None, labels=None, lengths=None):
+        self.samples = np.empty((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), np.float32) if samples is None else samples
+        self.labels = np.empty(0, '<U1') if labels is None else labels
+        self.lengths = set() if lengths is None else {int(n) for n in lengths}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def classes(self):
+        return sorted(set(self.labels.tolist()))
+
+    def train(self, plates):
+        # plates: (text, plate_binary) pairs; plates whose blobs don't line up with the text are skipped
+        samples, labels, lengths = [], [], set()
+        used = 0
+        for text, plate_binary in plates:
+            text = ''.join(c for c in str(text).upper() if c.isalnum())
+            boxes = segment_characters(plate_binary)
+            if not text or len(boxes) != len(text):
+                continue
+            samples.append(glyph_vectors(plate_binary, boxes))
+            labels.extend(text)
+            lengths.add(len(text))
+            used += 1
+        if samples:
+            with self._lock:
+                self.samples = np.concatenate([self.samples] + samples)
+                self.labels = np.concatenate([self.labels, np.array(labels, '<U1')])
+                self.lengths |= lengths
+        return used
+
+    def classify(self, vectors):
+        # Returns (characters, confidences) for unit glyph vectors
+        with self._lock:
+            samples, labels = self.samples, self.labels
+        classes, class_index = np.unique(labels, return_inverse=True)
+        similarity = vectors @ samples.T
+        # Best similarity per class: (glyphs, classes)
+        per_class = np.full((len(vectors), len(classes)), -1.0, np.float32)
+        for c in range(len(classes)):
+            per_class[:, c] = similarity[:, class_index == c].max(axis=1)
+        order = np.argsort(-per_class, axis=1)
+        rows = np.arange(len(vectors))
+        best = per_class[rows, order[:, 0]]
+        runner_up = per_class[rows, order[:, 1]] if len(classes) > 1 else np.full(len(vectors), -1.0)
+        confidence = 1.0 - (1.0 - best) / np.maximum(1.0 - runner_up, 1e-6)
+        return classes[order[:, 0]], np.clip(confidence, 0.0, 1.0)
+
+    def read(self, plate_binary):
+        # Returns (text, confidence) with the weakest character's confidence, or None if it can't segment the plate
+        if len(self.classes) < 2:
+            return None
+        boxes = segment_characters(plate_binary)
+        if len(boxes) not in self.lengths:
+            return None
+        characters, confidence = self.classify(glyph_vectors(plate_binary, boxes))
+        return ''.join(characters), float(confidence.min())
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            np.savez_compressed(path, samples=self.samples, labels=self.labels,
+                                lengths=np.array(sorted(self.lengths), np.int32))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            classifier = cls(data['samples'], data['labels'], data['lengths'])
+        print(f"Character classifier loaded: {path} ({len(classifier)} glyphs, {len(classifier.classes)} classes)")
+        return classifier
+
+
+def corrected_plates(db_manager, limit=None):
+    # (text, plate_binary) for every plate someone corrected in the edit dialog
+    for text, image in db_manager.get_corrected_plates(limit):
+        crop = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if crop is not None:
+            yield text, crop
+
+
+def train_from_database(db_manager, limit=None):
+    classifier = CharClassifier()
+    used = classifier.train(corrected_plates(db_manager, limit))
+    return classifier, used
+
+
+def print_accuracy(db_manager):
+    print(f"{'source':<12} {'plates':>7} {'corrected':>9} {'accuracy':>8}")
+    for source, plates, corrected in db_manager.get_ocr_accuracy():
+        accuracy = 1 - corrected / plates if plates else 0.0
+        print(f"{source or '-':<12} {plates:>7} {corrected:>9} {accuracy:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fast plate character classifier from corrected plates")
+    commands = parser.add_subparsers(dest='command', required=True)
+    train_parser = commands.add_parser('train', help="Build the classifier from plates corrected in the edit dialog")
+    train_parser.add_argument('--db', default='license_plates.db', help="Detections database")
+    train_parser.add_argument('--output', default=MODEL_PATH, help="Where to write the classifier")
+    train_parser.add_argument('--limit', type=int, default=None, help="Use at most this many corrected plates")
+    report_parser = commands.add_parser('report', help="Fast path vs Tesseract mix and accuracy")
+    report_parser.add_argument('--db', default='license_plates.db', help="Detections database")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        if args.command == 'train':
+            classifier, used = train_from_database(db_manager, args.limit)
+            if not used:
+                print("No corrected plates could be segmented; nothing to train on")
+                return 1
+            classifier.save(args.output)
+            print(f"Trained on {used} plates ({len(classifier)} glyphs, classes {''.join(classifier.classes)}); "
+                  f"saved to {args.output}")
+        else:
+            print_accuracy(db_manager)
+        return 0
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
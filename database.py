@@ -0,0 +1,1040 @@
+import sqlite3
+import atexit
+import base64
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from metrics import REGISTRY
+from platesearch import GRAM_SIZE, allowed_errors, candidate_grams, min_shared_grams, normalize_plate, plate_grams, rank_matches
+
+# Bumped whenever init_database learns a new migration step
+SCHEMA_VERSION = 10
+
+# Columns of the rows iter_export_chunks yields; 'image' is only present with images
+EXPORT_COLUMNS = ('detection_id', 'timestamp', 'camera', 'lane', 'plates_count', 'plate_id', 'plate_text',
+                  'confidence', 'ocr_source', 'x', 'y', 'w', 'h', 'decision', 'watch_plate', 'image_hash')
+
+# Matches the per-plate lines save_detection writes into detection_data
+SUMMARY_LINE = re.compile(r"Plate (\w+): (\d+)x(\d+)px at \((\d+), (\d+)\)")
+
+# Applied to every connection; journal_mode=WAL is persistent in the file itself
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA busy_timeout = 5000',
+)
+
+DB_WRITES = REGISTRY.counter('alpr_db_writes_total', "Writes committed by the database writer thread")
+DB_WRITE_ERRORS = REGISTRY.counter('alpr_db_write_errors_total', "Queued writes that failed")
+DB_COMMIT_SECONDS = REGISTRY.histogram('alpr_db_commit_seconds', "Duration of one group commit")
+DB_BATCH_SIZE = REGISTRY.histogram('alpr_db_commit_batch_size', "Writes per group commit",
+                                   buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+
+class DatabaseManager:
+    """SQLite access for the detector.
+
+    All writes go through one writer thread that owns a persistent WAL
+    connection and groups queued writes into a single commit. Reads use
+    per-thread read-only connections, so the UI never waits behind a write.
+    With an ``image_store``, plate images live in the store and rows keep
+    only their content hash.
+    """
+
+    def __init__(self, db_name='license_plates.db', batch_size=64, batch_window=0.01, image_store=None):
+        self.db_name = db_name
+        self.image_store = image_store
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._readers = threading.local()
+        self._write_queue = queue.Queue()
+        # Writers that have entered execute_write but whose write the writer thread hasn't taken yet
+        self._submitting = 0
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self.commits = 0
+        self.writes = 0
+        self.init_database()
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
+        # Queued writes are flushed even if the app exits without calling close()
+        atexit.register(self.close)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def init_database(self):
+        try:
+            conn = sqlite3.connect(self.db_name)
+            # Only takes effect on a new file; 'retention.py prune --vacuum' converts existing ones
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('PRAGMA journal_mode = WAL')
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS detections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    plates_count INTEGER,
+                    plate_images BLOB,
+                    detection_data TEXT,
+                    camera TEXT,
+                    lane TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS plates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    detection_id INTEGER NOT NULL REFERENCES detections(id) ON DELETE CASCADE,
+                    plate_text TEXT NOT NULL,
+                    x INTEGER,
+                    y INTEGER,
+                    w INTEGER,
+                    h INTEGER,
+                    confidence REAL,
+                    filename TEXT,
+                    image BLOB,
+                    ocr_source TEXT,
+                    ocr_text TEXT,
+                    image_hash TEXT,
+                    norm_text TEXT,
+                    decision TEXT,
+                    watch_plate TEXT,
+                    watch_distance REAL,
+                    corrected_by_user INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS vehicle_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    detection_id INTEGER,
+                    plate_text TEXT,
+                    first_seen TEXT NOT NULL,
+                    last_seen TEXT NOT NULL,
+                    sightings INTEGER,
+                    ocr_runs INTEGER,
+                    camera TEXT
+                )
+            ''')
+            # N-grams of every distinct normalized plate text, for fuzzy search
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS plate_grams (
+                    gram TEXT NOT NULL,
+                    norm_text TEXT NOT NULL,
+                    PRIMARY KEY (gram, norm_text)
+                ) WITHOUT ROWID
+            ''')
+            # How many texts each n-gram indexes, so search can start from the rarest
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS gram_counts (
+                    gram TEXT PRIMARY KEY,
+                    texts INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            # Daily reports, kept up to date by every save so reading one is a key lookup
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS daily_plates (
+                    day TEXT NOT NULL,
+                    plate_text TEXT NOT NULL,
+                    first_seen TEXT NOT NULL,
+                    last_seen TEXT NOT NULL,
+                    visits INTEGER NOT NULL,
+                    PRIMARY KEY (day, plate_text)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS hourly_traffic (
+                    day TEXT NOT NULL,
+                    hour INTEGER NOT NULL,
+                    camera TEXT NOT NULL,
+                    detections INTEGER NOT NULL,
+                    plates INTEGER NOT NULL,
+                    PRIMARY KEY (day, hour, camera)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_plates_text ON plates(plate_text)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_plates_detection ON plates(detection_id)')
+            conn.commit()
+            self.migrate(conn)
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                print("Warning: this database predates incremental vacuum, so retention can't give freed space "
+                      "back to the disk. Stop the app and run 'python retention.py prune --vacuum' once to convert "
+                      "it (a full VACUUM that needs free disk space of about twice the database size)")
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_detections_camera ON detections(camera, timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_plates_image_hash ON plates(image_hash)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_plates_norm_text ON plates(norm_text)')
+            conn.commit()
+            conn.close()
+            print(f"Database initialized: {self.db_name}")
+        except Exception as e:
+            print(f"Database initialization error: {e}")
+
+    def migrate(self, conn):
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        cursor = conn.cursor()
+        migrated = self.migrate_plate_images(cursor) if version < 1 else 0
+        if version < 2:
+            # Camera/lane tags; tables created by this version already have them
+            self.add_column(cursor, 'detections', 'camera', 'TEXT')
+            self.add_column(cursor, 'detections', 'lane', 'TEXT')
+            self.add_column(cursor, 'vehicle_events', 'camera', 'TEXT')
+        if version < 3:
+            # Which OCR path read each plate, and its reading before any correction
+            self.add_column(cursor, 'plates', 'ocr_source', 'TEXT')
+            self.add_column(cursor, 'plates', 'ocr_text', 'TEXT')
+        if version < 4:
+            # Content hash of the plate image when it lives in the image store
+            self.add_column(cursor, 'plates', 'image_hash', 'TEXT')
+        if version < 6:
+            # Confusion-normalized plate text and its n-grams, for fuzzy search
+            self.add_column(cursor, 'plates', 'norm_text', 'TEXT')
+            indexed = self.index_plate_texts(cursor)
+            if indexed:
+                print(f"Indexed {indexed} plate texts for fuzzy search")
+        if version < 7:
+            # Watchlist decision for each plate and the entry it matched
+            self.add_column(cursor, 'plates', 'decision', 'TEXT')
+            self.add_column(cursor, 'plates', 'watch_plate', 'TEXT')
+            self.add_column(cursor, 'plates', 'watch_distance', 'REAL')
+        if version < 8:
+            # Daily report tables start from everything already in the database
+            self.rebuild_reports(cursor)
+        if version < 9:
+            # Only edits made in the edit dialog count as corrections. Older rows can't tell
+            # those apart from tracker vote updates, so none of them count
+            self.add_column(cursor, 'plates', 'corrected_by_user', 'INTEGER NOT NULL DEFAULT 0')
+        if version < 10:
+            # N-gram frequencies for plate search, counted from the existing index
+            cursor.execute('DELETE FROM gram_counts')
+            cursor.execute('INSERT INTO gram_counts (gram, texts) SELECT gram, COUNT(*) FROM plate_grams GROUP BY gram')
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+        if migrated:
+            # Reclaim the space the base64 blobs used
+            conn.execute('VACUUM')
+            print(f"Migrated {migrated} detections to the plates table")
+
+    def add_column(self, cursor, table, column, declaration):
+        columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+    def migrate_plate_images(self, cursor):
+        # Moves rows from the old JSON/base64 plate_images blob into the plates table, in place
+        rows = cursor.execute('''
+            SELECT id, plate_images, detection_data
+            FROM detections
+            WHERE plate_images IS NOT NULL
+        ''').fetchall()
+        migrated = 0
+        for detection_id, plate_images_blob, detection_data in rows:
+            try:
+                plate_images = json.loads(bytes(plate_images_blob).decode())
+            except Exception as e:
+                print(f"Skipping unreadable plate_images for detection ID {detection_id}: {e}")
+                continue
+            boxes = {}
+            for match in SUMMARY_LINE.finditer(detection_data or ''):
+                text, w, h, x, y = match.groups()
+                boxes[text] = (int(x), int(y), int(w), int(h))
+            for key, value in plate_images.items():
+                if not key.startswith('plate_'):
+                    continue
+                plate_text = key[len('plate_'):]
+                x, y, w, h = boxes.get(plate_text, (None, None, None, None))
+                cursor.execute('''
+                    INSERT INTO plates
+                    (detection_id, plate_text, x, y, w, h, confidence, filename, image)
+                    VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)
+                ''', (
+                    detection_id, plate_text, x, y, w, h,
+                    plate_images.get(f"filename_{plate_text}"),
+                    base64.b64decode(value)
+                ))
+            cursor.execute('UPDATE detections SET plate_images = NULL WHERE id = ?', (detection_id,))
+            migrated += 1
+        return migrated
+
+    def index_plate_texts(self, cursor):
+        # Fills norm_text and plate_grams for plates written before fuzzy search existed
+        cursor.connection.create_function('normalize_plate', 1, normalize_plate, deterministic=True)
+        cursor.execute('UPDATE plates SET norm_text = normalize_plate(plate_text) WHERE norm_text IS NULL')
+        texts = [row[0] for row in cursor.execute('SELECT DISTINCT norm_text FROM plates')]
+        cursor.executemany('INSERT OR IGNORE INTO plate_grams (gram, norm_text) VALUES (?, ?)',
+                           [(gram, normalized) for normalized in texts for gram in plate_grams(normalized)])
+        return len(texts)
+
+    def add_plate_grams(self, cursor, normalized):
+        # Texts already indexed cost one lookup per n-gram. Grams of texts no plate uses any
+        # more (deleted or corrected) are left behind; they only ever join to nothing
+        for gram in plate_grams(normalized):
+            cursor.execute('INSERT OR IGNORE INTO plate_grams (gram, norm_text) VALUES (?, ?)', (gram, normalized))
+            if cursor.rowcount == 1:
+                cursor.execute('''
+                    INSERT INTO gram_counts (gram, texts) VALUES (?, 1)
+                    ON CONFLICT (gram) DO UPDATE SET texts = texts + 1
+                ''', (gram,))
+
+    def rebuild_reports(self, cursor):
+        # Recomputes the daily report tables from the detections table (one full scan)
+        cursor.execute('DELETE FROM daily_plates')
+        cursor.execute('DELETE FROM hourly_traffic')
+        cursor.execute('''
+            INSERT INTO daily_plates (day, plate_text, first_seen, last_seen, visits)
+            SELECT substr(d.timestamp, 1, 10), p.plate_text, MIN(d.timestamp), MAX(d.timestamp), COUNT(DISTINCT d.id)
+            FROM plates p
+            JOIN detections d ON d.id = p.detection_id
+            GROUP BY substr(d.timestamp, 1, 10), p.plate_text
+        ''')
+        cursor.execute('''
+            INSERT INTO hourly_traffic (day, hour, camera, detections, plates)
+            SELECT substr(timestamp, 1, 10), CAST(substr(timestamp, 12, 2) AS INTEGER), COALESCE(camera, ''),
+                   COUNT(*), COALESCE(SUM(plates_count), 0)
+            FROM detections
+            GROUP BY 1, 2, 3
+        ''')
+
+    def add_to_reports(self, cursor, timestamp, camera, plate_texts):
+        # Counts one new detection into the daily report tables
+        day, hour = timestamp[:10], int(timestamp[11:13])
+        cursor.execute('''
+            INSERT INTO hourly_traffic (day, hour, camera, detections, plates) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (day, hour, camera) DO UPDATE
+            SET detections = detections + 1, plates = plates + excluded.plates
+        ''', (day, hour, camera or '', len(plate_texts)))
+        cursor.executemany('''
+            INSERT INTO daily_plates (day, plate_text, first_seen, last_seen, visits) VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (day, plate_text) DO UPDATE
+            SET first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen),
+                visits = visits + 1
+        ''', [(day, text, timestamp, timestamp) for text in set(plate_texts)])
+
+    def refresh_daily_plate(self, cursor, day, plate_text):
+        # Recounts one plate's day after an edit or delete, through idx_plates_text
+        first_seen, last_seen, visits = cursor.execute('''
+            SELECT MIN(d.timestamp), MAX(d.timestamp), COUNT(DISTINCT d.id)
+            FROM plates p
+            JOIN detections d ON d.id = p.detection_id
+            WHERE p.plate_text = ? AND d.timestamp >= ? AND d.timestamp < ?
+        ''', (plate_text, day, day + 'T~')).fetchone()
+        if visits:
+            cursor.execute('''
+                INSERT OR REPLACE INTO daily_plates (day, plate_text, first_seen, last_seen, visits)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (day, plate_text, first_seen, last_seen, visits))
+        else:
+            cursor.execute('DELETE FROM daily_plates WHERE day = ? AND plate_text = ?', (day, plate_text))
+
+    def _writer_loop(self):
+        conn = self.connect()
+        running = True
+        while running:
+            batch = [self._write_queue.get()]
+            # Everything already queued shares one commit. The window is only waited out while
+            # another writer is part-way through submitting, so a lone write commits at once
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                with self._submit_lock:
+                    others = self._submitting > sum(1 for item in batch if item is not None)
+                if remaining <= 0 or not others:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._submit_lock:
+                self._submitting -= sum(1 for item in batch if item is not None)
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+                # Drain anything queued behind the shutdown marker
+                while True:
+                    try:
+                        item = self._write_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+            if batch:
+                self._commit_batch(conn, batch)
+        conn.close()
+
+    def _commit_batch(self, conn, batch):
+        cursor = conn.cursor()
+        results = []
+        start = time.perf_counter()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for write, future in batch:
+                # A savepoint per write keeps one failure from sinking the rest of the batch
+                cursor.execute('SAVEPOINT write')
+                try:
+                    results.append((future, write(cursor), None))
+                    cursor.execute('RELEASE write')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write')
+                    cursor.execute('RELEASE write')
+                    results.append((future, None, e))
+            cursor.execute('COMMIT')
+            self.commits += 1
+            self.writes += len(batch)
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - start)
+            DB_BATCH_SIZE.observe(len(batch))
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            results = [(future, None, e) for write, future in batch]
+        for future, result, error in results:
+            if error is not None:
+                DB_WRITE_ERRORS.inc()
+                future.set_exception(error)
+            else:
+                DB_WRITES.inc()
+                future.set_result(result)
+
+    def execute_write(self, write, wait=True):
+        # Queues write(cursor) for the writer thread; returns its result once committed
+        if self._closed:
+            raise RuntimeError("Database is closed")
+        future = Future()
+        with self._submit_lock:
+            self._submitting += 1
+        self._write_queue.put((write, future))
+        return future.result() if wait else future
+
+    def pending_writes(self):
+        return self._write_queue.qsize()
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._write_queue.put(None)
+        self._writer.join(timeout)
+
+    def reader(self):
+        # Read-only connection owned by the calling thread
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            uri = Path(os.path.abspath(self.db_name)).as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._readers.conn = conn
+        return conn
+
+    def save_detection(self, plates_data, camera=None, lane=None, wait=True):
+        # Returns the detection id. With wait=False it returns the queued write's Future at once,
+        # so a caller saving many detections can let the writer group them into one commit
+        try:
+            timestamp = datetime.now().isoformat()
+            detection_summary = self.summarize_plates(plates_data)
+            plate_rows = [(
+                plate['text'],
+                plate['x'],
+                plate['y'],
+                plate['w'],
+                plate['h'],
+                plate.get('confidence'),
+                plate.get('filename'),
+                None if plate.get('image_hash') else self.plate_image_bytes(plate),
+                plate.get('ocr_source'),
+                plate.get('image_hash'),
+                plate.get('decision'),
+                plate['watch_match'].entry.plate if plate.get('watch_match') else None,
+                plate['watch_match'].distance if plate.get('watch_match') else None,
+                normalize_plate(plate['text'])
+            ) for plate in plates_data]
+
+            def write(cursor):
+                cursor.execute('''
+                    INSERT INTO detections
+                    (timestamp, plates_count, plate_images, detection_data, camera, lane)
+                    VALUES (?, ?, NULL, ?, ?, ?)
+                ''', (timestamp, len(plate_rows), detection_summary, camera, lane))
+                detection_id = cursor.lastrowid
+                plate_ids = []
+                for row in plate_rows:
+                    cursor.execute('''
+                        INSERT INTO plates
+                        (detection_id, plate_text, x, y, w, h, confidence, filename, image, ocr_source, image_hash,
+                         decision, watch_plate, watch_distance, norm_text)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (detection_id,) + row)
+                    plate_ids.append(cursor.lastrowid)
+                    self.add_plate_grams(cursor, row[-1])
+                self.add_to_reports(cursor, timestamp, camera, [row[0] for row in plate_rows])
+                return detection_id, plate_ids
+
+            future = self.execute_write(write, wait=False)
+            if not wait:
+                future.add_done_callback(lambda done: self.detection_saved(plates_data, done))
+                return future
+            return self.detection_saved(plates_data, future)
+        except Exception as e:
+            print(f"Database save error: {e}")
+            return None
+
+    def detection_saved(self, plates_data, future):
+        # Records the plate ids of a save_detection write once it has committed
+        try:
+            detection_id, plate_ids = future.result()
+        except Exception as e:
+            print(f"Database save error: {e}")
+            return None
+        for plate, plate_id in zip(plates_data, plate_ids):
+            plate['plate_id'] = plate_id
+        print(f"Detection saved to database with ID: {detection_id}")
+        return detection_id
+
+    def summarize_plates(self, plates_data):
+        detection_summary = f"Plates detected: {len(plates_data)}"
+        for plate in plates_data:
+            detection_summary += f"\nPlate {plate['text']}: {plate['w']}x{plate['h']}px at ({plate['x']}, {plate['y']})"
+        return detection_summary
+
+    def save_vehicle_event(self, track):
+        try:
+            row = (
+                track.detection_id,
+                track.best_text or track.saved_text,
+                track.first_seen.isoformat(),
+                track.last_seen.isoformat(),
+                track.sightings,
+                track.ocr_runs,
+                track.camera
+            )
+
+            def write(cursor):
+                cursor.execute('''
+                    INSERT INTO vehicle_events
+                    (detection_id, plate_text, first_seen, last_seen, sightings, ocr_runs, camera)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', row)
+                return cursor.lastrowid
+
+            event_id = self.execute_write(write)
+            print(f"Vehicle event saved with ID: {event_id} ({track.sightings} sightings)")
+            return event_id
+        except Exception as e:
+            print(f"Database save error: {e}")
+            return None
+
+    def image_to_blob(self, image_path):
+        try:
+            with open(image_path, 'rb') as file:
+                return file.read()
+        except Exception as e:
+            print(f"Error converting image to blob: {e}")
+            return None
+
+    def plate_image_bytes(self, plate):
+        # Raw JPEG bytes for a plate, from memory or from the archived file
+        data = plate.get('jpeg')
+        if data is None and plate.get('filename') and os.path.exists(plate['filename']):
+            data = self.image_to_blob(plate['filename'])
+        return data
+
+    def get_recent_detections(self, limit=20):
+        # One row per plate: (detection_id, timestamp, plates_count, plate_id, plate_text, filename)
+        try:
+            return self.reader().execute('''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM (SELECT id, timestamp, plates_count FROM detections ORDER BY timestamp DESC LIMIT ?) d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                ORDER BY d.timestamp DESC, p.id
+            ''', (limit,)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_all_detections(self):
+        try:
+            return self.reader().execute('''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM detections d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                ORDER BY d.timestamp DESC, p.id
+            ''').fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_detection_page(self, before=None, limit=100):
+        # Keyset pagination, newest first. `before` is the (timestamp, id) of the last
+        # detection already shown; image blobs are never selected.
+        try:
+            where = ''
+            params = []
+            if before is not None:
+                where = 'WHERE (timestamp, id) < (?, ?)'
+                params = [before[0], before[1]]
+            return self.reader().execute(f'''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM (
+                    SELECT id, timestamp, plates_count FROM detections
+                    {where}
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                ) d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                ORDER BY d.timestamp DESC, d.id DESC, p.id
+            ''', params + [limit]).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_detections_after(self, after, limit=1000):
+        # Detections newer than the (timestamp, id) key `after`, newest first
+        try:
+            return self.reader().execute('''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM (
+                    SELECT id, timestamp, plates_count FROM detections
+                    WHERE (timestamp, id) > (?, ?)
+                    ORDER BY timestamp ASC, id ASC
+                    LIMIT ?
+                ) d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                ORDER BY d.timestamp DESC, d.id DESC, p.id
+            ''', (after[0], after[1], limit)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def find_plate(self, plate_text, start=None, end=None):
+        # Indexed lookup by exact plate text, optionally within [start, end) ISO timestamps
+        try:
+            query = '''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM plates p
+                JOIN detections d ON d.id = p.detection_id
+                WHERE p.plate_text = ?
+            '''
+            params = [plate_text]
+            if start is not None:
+                query += ' AND d.timestamp >= ?'
+                params.append(start)
+            if end is not None:
+                query += ' AND d.timestamp < ?'
+                params.append(end)
+            return self.reader().execute(query + ' ORDER BY d.timestamp DESC', params).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def search_plates(self, query, start=None, end=None, camera=None, max_errors=2, limit=200):
+        """Plates that read like ``query``, best match first, as detection rows.
+
+        Candidates come from the n-gram index over confusion-normalized text:
+        a plate qualifies if it shares enough n-grams with the query to be
+        within ``max_errors`` edits of it. Only the query's rarest n-grams are
+        read to find candidates (see candidate_grams); the share count is then
+        checked per candidate by primary key. The time range [start, end) and the
+        camera are applied in the same statement, before any row reaches
+        Python; the candidates are then ranked by confusion-aware edit
+        distance. Queries shorter than an n-gram match plates starting with them.
+        """
+        normalized = normalize_plate(query)
+        if not normalized:
+            return []
+        grams = sorted(plate_grams(normalized))
+        filters = []
+        params = []
+        if start is not None:
+            filters.append('d.timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            filters.append('d.timestamp < ?')
+            params.append(end)
+        if camera is not None:
+            filters.append('d.camera = ?')
+            params.append(camera)
+        where = ''.join(f' AND {condition}' for condition in filters)
+        try:
+            if len(normalized) < GRAM_SIZE:
+                # Newest detections first, stopping once enough plates start with the query
+                rows = self.reader().execute(f'''
+                    SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                    FROM detections d
+                    CROSS JOIN plates p ON p.detection_id = d.id
+                    WHERE p.norm_text >= ? AND p.norm_text < ?{where}
+                    ORDER BY d.timestamp DESC
+                    LIMIT ?
+                ''', [normalized, normalized + '~'] + params + [limit]).fetchall()
+            else:
+                conn = self.reader()
+                gram_list = ', '.join('?' * len(grams))
+                counts = dict(conn.execute(f'SELECT gram, texts FROM gram_counts WHERE gram IN ({gram_list})',
+                                           grams).fetchall())
+                shared = min_shared_grams(grams, allowed_errors(query, max_errors))
+                seeds = candidate_grams({gram: counts.get(gram, 0) for gram in grams}, shared)
+                if not seeds:
+                    return []
+                # CROSS JOIN pins the order: candidate texts first, then their plates
+                # through idx_plates_norm_text, then the detection filters
+                rows = conn.execute(f'''
+                    WITH candidates AS (
+                        SELECT DISTINCT norm_text FROM plate_grams
+                        WHERE gram IN ({', '.join('?' * len(seeds))})
+                    ),
+                    matches AS (
+                        SELECT norm_text, (
+                            SELECT COUNT(*) FROM plate_grams g
+                            WHERE g.gram IN ({gram_list}) AND g.norm_text = c.norm_text
+                        ) AS shared
+                        FROM candidates c
+                    )
+                    SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                    FROM matches m
+                    CROSS JOIN plates p ON p.norm_text = m.norm_text
+                    CROSS JOIN detections d ON d.id = p.detection_id
+                    WHERE m.shared >= ?{where}
+                    ORDER BY m.shared DESC, d.timestamp DESC
+                    LIMIT ?
+                ''', seeds + grams + [shared] + params + [limit * 10]).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+        return [row for distance, row in rank_matches(query, rows, max_errors)][:limit]
+
+    def iter_export_chunks(self, start=None, end=None, include_images=False, chunk_size=1000):
+        """Yields lists of up to ``chunk_size`` detections' rows, oldest first.
+
+        One row per plate (plate columns are None for a detection without
+        plates), with the columns in EXPORT_COLUMNS plus the image bytes when
+        ``include_images`` is set. Each chunk is a separate keyset query, so
+        memory stays constant and no read transaction is held open between
+        chunks; blobs are only read when images are asked for.
+        """
+        after = ('', -1)
+        while True:
+            filters = ['(timestamp, id) > (?, ?)']
+            params = list(after)
+            if start is not None:
+                filters.append('timestamp >= ?')
+                params.append(start)
+            if end is not None:
+                filters.append('timestamp < ?')
+                params.append(end)
+            image_columns = ', p.image' if include_images else ''
+            rows = self.reader().execute(f'''
+                SELECT d.id, d.timestamp, d.camera, d.lane, d.plates_count, p.id, p.plate_text, p.confidence,
+                       p.ocr_source, p.x, p.y, p.w, p.h, p.decision, p.watch_plate, p.image_hash{image_columns}
+                FROM (
+                    SELECT id, timestamp, camera, lane, plates_count FROM detections
+                    WHERE {' AND '.join(filters)}
+                    ORDER BY timestamp, id
+                    LIMIT ?
+                ) d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                ORDER BY d.timestamp, d.id, p.id
+            ''', params + [chunk_size]).fetchall()
+            if not rows:
+                return
+            if include_images:
+                rows = [row[:-1] + (self.resolve_image(row[-1], row[15]),) for row in rows]
+            yield rows
+            after = (rows[-1][1], rows[-1][0])
+
+    def get_daily_plates(self, day):
+        # (plate_text, first_seen, last_seen, visits) for one YYYY-MM-DD day, in order of arrival
+        try:
+            return self.reader().execute('''
+                SELECT plate_text, first_seen, last_seen, visits FROM daily_plates
+                WHERE day = ?
+                ORDER BY first_seen
+            ''', (day,)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_hourly_traffic(self, day, camera=None):
+        # (hour, camera, detections, plates) for one day, all cameras unless one is given
+        try:
+            query = 'SELECT hour, camera, detections, plates FROM hourly_traffic WHERE day = ?'
+            params = [day]
+            if camera is not None:
+                query += ' AND camera = ?'
+                params.append(camera)
+            return self.reader().execute(query + ' ORDER BY hour, camera', params).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_detections_between(self, start, end):
+        try:
+            return self.reader().execute('''
+                SELECT d.id, d.timestamp, d.plates_count, p.id, p.plate_text, p.filename
+                FROM detections d
+                LEFT JOIN plates p ON p.detection_id = d.id
+                WHERE d.timestamp >= ? AND d.timestamp < ?
+                ORDER BY d.timestamp DESC, p.id
+            ''', (start, end)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_plate_boxes(self, camera=None, limit=5000):
+        # (x, y, w, h) of the newest plates seen by one camera, for zone calibration
+        try:
+            return self.reader().execute('''
+                SELECT p.x, p.y, p.w, p.h
+                FROM detections d
+                JOIN plates p ON p.detection_id = d.id
+                WHERE d.camera IS ? AND p.w IS NOT NULL
+                ORDER BY d.timestamp DESC
+                LIMIT ?
+            ''', (camera, limit)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def get_corrected_plates(self, limit=None):
+        # (plate_text, image) for plates corrected in the edit dialog, newest first
+        try:
+            rows = self.reader().execute('''
+                SELECT plate_text, image, image_hash FROM plates
+                WHERE corrected_by_user = 1 AND (image IS NOT NULL OR image_hash IS NOT NULL)
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (-1 if limit is None else limit,)).fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+        plates = [(text, self.resolve_image(image, image_hash)) for text, image, image_hash in rows]
+        return [(text, image) for text, image in plates if image is not None]
+
+    def get_ocr_accuracy(self):
+        # (ocr_source, plates read, plates later corrected in the edit dialog) per OCR path
+        try:
+            return self.reader().execute('''
+                SELECT ocr_source, COUNT(*), SUM(corrected_by_user = 1 AND ocr_text != plate_text)
+                FROM plates
+                GROUP BY ocr_source
+                ORDER BY COUNT(*) DESC
+            ''').fetchall()
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return []
+
+    def resolve_image(self, image, image_hash):
+        # Inline blob from older rows, otherwise the image store's copy (None once evicted)
+        if image is not None:
+            return image
+        if image_hash and self.image_store is not None:
+            return self.image_store.get(image_hash)
+        return None
+
+    def get_plate_image(self, plate_id):
+        try:
+            result = self.reader().execute('SELECT image, image_hash FROM plates WHERE id = ?', (plate_id,)).fetchone()
+            return self.resolve_image(*result) if result else None
+        except Exception as e:
+            print(f"Database query error: {e}")
+            return None
+
+    def move_images_to_store(self, batch_size=200):
+        # Moves inline image blobs into the image store, a batch per write so detection saves interleave
+        if self.image_store is None:
+            return 0
+        moved = 0
+        while True:
+            rows = self.reader().execute('''
+                SELECT id, image FROM plates WHERE image IS NOT NULL LIMIT ?
+            ''', (batch_size,)).fetchall()
+            if not rows:
+                break
+            updates = [(self.image_store.put(bytes(image), block=True), plate_id) for plate_id, image in rows]
+            # Only drop the blobs whose copies made it to disk
+            self.image_store.flush()
+            updates = [(key, plate_id) for key, plate_id in updates if os.path.exists(self.image_store.path(key))]
+            if not updates:
+                print("Image store is not accepting writes; leaving plate images in the database")
+                break
+
+            def write(cursor, updates=updates):
+                cursor.executemany('UPDATE plates SET image_hash = ?, image = NULL WHERE id = ?', updates)
+
+            self.execute_write(write)
+            moved += len(updates)
+        if moved:
+            print(f"Moved {moved} plate images into the image store")
+        return moved
+
+    def clear_plate_images(self, before, limit=500):
+        # Drops the images of up to `limit` plates seen before `before`; returns
+        # (plates cleared, image hashes no other plate still uses)
+        def write(cursor):
+            rows = cursor.execute('''
+                SELECT p.id, p.image_hash FROM plates p
+                JOIN detections d ON d.id = p.detection_id
+                WHERE d.timestamp < ? AND (p.image IS NOT NULL OR p.image_hash IS NOT NULL)
+                LIMIT ?
+            ''', (before, limit)).fetchall()
+            cursor.executemany('UPDATE plates SET image = NULL, image_hash = NULL WHERE id = ?',
+                               [(plate_id,) for plate_id, image_hash in rows])
+            hashes = {image_hash for plate_id, image_hash in rows if image_hash}
+            orphaned = [image_hash for image_hash in hashes
+                        if cursor.execute('SELECT 1 FROM plates WHERE image_hash = ? LIMIT 1',
+                                          (image_hash,)).fetchone() is None]
+            return len(rows), orphaned
+
+        return self.execute_write(write)
+
+    def get_detections_before(self, before, limit=500):
+        # Oldest detections before `before` with their plates, as dicts for archiving
+        conn = self.reader()
+        detections = conn.execute('''
+            SELECT id, timestamp, plates_count, detection_data, camera, lane FROM detections
+            WHERE timestamp < ?
+            ORDER BY timestamp, id
+            LIMIT ?
+        ''', (before, limit)).fetchall()
+        records = []
+        for detection_id, timestamp, plates_count, detection_data, camera, lane in detections:
+            plates = conn.execute('''
+                SELECT id, plate_text, x, y, w, h, confidence, ocr_source, ocr_text, image_hash, decision, watch_plate
+                FROM plates WHERE detection_id = ? ORDER BY id
+            ''', (detection_id,)).fetchall()
+            records.append({
+                'kind': 'detection', 'id': detection_id, 'timestamp': timestamp, 'plates_count': plates_count,
+                'detection_data': detection_data, 'camera': camera, 'lane': lane,
+                'plates': [dict(zip(('id', 'text', 'x', 'y', 'w', 'h', 'confidence', 'ocr_source', 'ocr_text',
+                                     'image_hash', 'decision', 'watch_plate'), plate)) for plate in plates],
+            })
+        return records
+
+    def get_vehicle_events_before(self, before, limit=500):
+        rows = self.reader().execute('''
+            SELECT id, detection_id, plate_text, first_seen, last_seen, sightings, ocr_runs, camera
+            FROM vehicle_events
+            WHERE last_seen < ?
+            ORDER BY last_seen, id
+            LIMIT ?
+        ''', (before, limit)).fetchall()
+        columns = ('id', 'detection_id', 'plate_text', 'first_seen', 'last_seen', 'sightings', 'ocr_runs', 'camera')
+        return [dict(zip(columns, row), kind='vehicle_event', timestamp=row[4]) for row in rows]
+
+    def delete_detections(self, detection_ids):
+        # Deletes detections with their plates; returns the image hashes no remaining plate uses
+        def write(cursor):
+            params = [(detection_id,) for detection_id in detection_ids]
+            hashes = set()
+            for param in params:
+                hashes.update(row[0] for row in cursor.execute(
+                    'SELECT image_hash FROM plates WHERE detection_id = ? AND image_hash IS NOT NULL', param))
+            cursor.executemany('DELETE FROM plates WHERE detection_id = ?', params)
+            cursor.executemany('DELETE FROM detections WHERE id = ?', params)
+            return [image_hash for image_hash in hashes
+                    if cursor.execute('SELECT 1 FROM plates WHERE image_hash = ? LIMIT 1',
+                                      (image_hash,)).fetchone() is None]
+
+        return self.execute_write(write)
+
+    def delete_vehicle_events(self, event_ids):
+        def write(cursor):
+            cursor.executemany('DELETE FROM vehicle_events WHERE id = ?', [(event_id,) for event_id in event_ids])
+
+        self.execute_write(write)
+
+    def incremental_vacuum(self, pages=1024):
+        # Returns free pages to the filesystem, at most `pages` per call so other writes are not held up
+        def write(cursor):
+            free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            # The pragma frees one page per step and the sqlite3 module only steps a
+            # row-less statement once, so it is run once per page
+            for _ in range(min(pages, free_pages)):
+                cursor.execute('PRAGMA incremental_vacuum')
+            return cursor.execute('PRAGMA freelist_count').fetchone()[0]
+
+        return self.execute_write(write)
+
+    def delete_detection(self, detection_id):
+        try:
+            def write(cursor):
+                detection = cursor.execute('SELECT timestamp, camera, plates_count FROM detections WHERE id = ?',
+                                           (detection_id,)).fetchone()
+                plate_texts = {row[0] for row in cursor.execute(
+                    'SELECT plate_text FROM plates WHERE detection_id = ?', (detection_id,))}
+                cursor.execute('DELETE FROM plates WHERE detection_id = ?', (detection_id,))
+                cursor.execute('DELETE FROM detections WHERE id = ?', (detection_id,))
+                if detection is not None:
+                    timestamp, camera, plates_count = detection
+                    cursor.execute('''
+                        UPDATE hourly_traffic SET detections = detections - 1, plates = plates - ?
+                        WHERE day = ? AND hour = ? AND camera = ?
+                    ''', (plates_count or 0, timestamp[:10], int(timestamp[11:13]), camera or ''))
+                    for plate_text in plate_texts:
+                        self.refresh_daily_plate(cursor, timestamp[:10], plate_text)
+
+            self.execute_write(write)
+            print(f"Detection ID {detection_id} deleted from database")
+        except Exception as e:
+            print(f"Database delete error: {e}")
+
+    def update_plate_text(self, plate_id, new_plate_text, corrected=False):
+        # `corrected` marks a person's correction from the edit dialog; the tracker's
+        # majority-vote updates leave the OCR bookkeeping alone
+        try:
+            def write(cursor):
+                cursor.execute('''
+                    SELECT p.detection_id, p.plate_text, d.timestamp FROM plates p
+                    JOIN detections d ON d.id = p.detection_id
+                    WHERE p.id = ?
+                ''', (plate_id,))
+                result = cursor.fetchone()
+                if not result:
+                    return None
+                detection_id, old_plate_text, timestamp = result
+                normalized = normalize_plate(new_plate_text)
+                if corrected:
+                    # The first correction keeps the original reading for OCR accuracy and training
+                    cursor.execute('''
+                        UPDATE plates SET plate_text = ?, norm_text = ?, ocr_text = COALESCE(ocr_text, plate_text),
+                                          corrected_by_user = 1
+                        WHERE id = ?
+                    ''', (new_plate_text, normalized, plate_id))
+                else:
+                    cursor.execute('UPDATE plates SET plate_text = ?, norm_text = ? WHERE id = ?',
+                                   (new_plate_text, normalized, plate_id))
+                self.add_plate_grams(cursor, normalized)
+                # Rebuild the summary from the plates rows instead of editing the text in place
+                cursor.execute('''
+                    SELECT plate_text AS text, x, y, w, h FROM plates WHERE detection_id = ? ORDER BY id
+                ''', (detection_id,))
+                plates_data = [dict(zip(('text', 'x', 'y', 'w', 'h'), row)) for row in cursor.fetchall()]
+                cursor.execute('UPDATE detections SET detection_data = ? WHERE id = ?',
+                               (self.summarize_plates(plates_data), detection_id))
+                # The visit moves from the old reading's report row to the new one's
+                for plate_text in {old_plate_text, new_plate_text}:
+                    self.refresh_daily_plate(cursor, timestamp[:10], plate_text)
+                return detection_id, old_plate_text
+
+            result = self.execute_write(write)
+            if result is None:
+                return False
+            detection_id, old_plate_text = result
+            print(f"Updated plate text from {old_plate_text} to {new_plate_text} for detection ID {detection_id}")
+            return True
+        except Exception as e:
+            print(f"Database update error: {e}")
+            return False
@@ -0,0 +1,238 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+CASCADE_CANDIDATES = (
+    'haarcascades/haarcascade_russian_plate_number.xml',
+    'haarcascade_russian_plate_number.xml',
+)
+
+MODEL_CANDIDATES = (
+    'models/plate_detector.onnx',
+    'plate_detector.onnx',
+)
+
+
+def find_cascade_path():
+    for path in CASCADE_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_model_path():
+    for path in MODEL_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def within_size(box, min_size=None, max_size=None):
+    w, h = box[2], box[3]
+    if min_size and (w < min_size[0] or h < min_size[1]):
+        return False
+    if max_size and (w > max_size[0] or h > max_size[1]):
+        return False
+    return True
+
+
+class DetectorBackend:
+    """Base for plate detectors: the model file is read once, parsed once per thread.
+
+    OpenCV classifiers and nets are not safe to share between threads, so each
+    thread builds its own copy from the bytes on first use, and ``reload``
+    bumps a generation counter that makes every thread rebuild. Subclasses
+    implement ``_build`` and ``_detect_batch``. ``detect_batch`` takes a list of
+    images (BGR or grayscale, whichever ``wants_color`` asks for) and returns an
+    (N, 4) int array of (x, y, w, h) boxes per image.
+    """
+    name = None
+    wants_color = False
+
+    def __init__(self, path=None):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.path = None
+        self._data = None
+        self.reload(path)
+
+    def find_path(self):
+        return None
+
+    def _read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def _build(self, data):
+        raise NotImplementedError
+
+    def _model(self):
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            with self._lock:
+                local.model = self._build(self._data)
+                local.generation = self._generation
+        return local.model
+
+    def reload(self, path=None):
+        path = path or self.path or self.find_path()
+        if path is None or not os.path.exists(path):
+            raise FileNotFoundError(f"{self.name} detector model file not found.")
+        data = self._read(path)
+        # Parse before swapping so a broken file leaves the old model in place
+        model = self._build(data)
+        with self._lock:
+            self.path = path
+            self._data = data
+            self._generation += 1
+            self._local.model = model
+            self._local.generation = self._generation
+        self.warm_up()
+        print(f"{self.name} detector loaded: {path}")
+
+    def warm_up(self, size=(480, 640)):
+        shape = size + (3,) if self.wants_color else size
+        self.detect(np.zeros(shape, np.uint8))
+
+    def detect(self, image, min_size=None, max_size=None):
+        return self.detect_batch([image], [min_size], [max_size])[0]
+
+    def detect_batch(self, images, min_sizes=None, max_sizes=None):
+        if not images:
+            return []
+        min_sizes = min_sizes or [None] * len(images)
+        max_sizes = max_sizes or [None] * len(images)
+        return self._detect_batch(self._model(), images, min_sizes, max_sizes)
+
+    def _detect_batch(self, model, images, min_sizes, max_sizes):
+        raise NotImplementedError
+
+
+class HaarDetector(DetectorBackend):
+    """The original Haar cascade; tuned for Russian plates."""
+    name = 'haar'
+
+    def __init__(self, cascade_path=None, scale_factor=1.2, min_neighbors=5):
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        super().__init__(cascade_path)
+
+    @property
+    def cascade_path(self):
+        return self.path
+
+    def find_path(self):
+        return find_cascade_path()
+
+    def _read(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def _build(self, cascade_xml):
+        storage = cv2.FileStorage(cascade_xml, cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY)
+        cascade = cv2.CascadeClassifier()
+        if not cascade.read(storage.getFirstTopLevelNode()) or cascade.empty():
+            raise ValueError("Invalid Haarcascade file.")
+        return cascade
+
+    def _detect_batch(self, cascade, images, min_sizes, max_sizes):
+        # The cascade has no batch mode; frames are searched one after another
+        results = []
+        for gray, min_size, max_size in zip(images, min_sizes, max_sizes):
+            kwargs = {}
+            if min_size:
+                kwargs['minSize'] = tuple(int(v) for v in min_size)
+            if max_size:
+                kwargs['maxSize'] = tuple(int(v) for v in max_size)
+            boxes = cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors, **kwargs)
+            results.append(np.asarray(boxes, dtype=np.int32).reshape(-1, 4))
+        return results
+
+
+class DnnDetector(DetectorBackend):
+    """ONNX plate detector run on the CPU through cv2.dnn.
+
+    Expects a single-class YOLO-style export: ``output_format='yolov8'`` for
+    (N, 4 + classes, anchors) outputs, 'yolov5' for (N, anchors, 5 + classes)
+    with an objectness column. Images in a batch go through one forward pass
+    when the model has a dynamic batch axis; otherwise they fall back to one
+    pass each. Overlapping boxes are merged with NMS.
+    """
+    name = 'dnn'
+    wants_color = True
+
+    def __init__(self, model_path=None, input_size=(640, 640), conf_threshold=0.4, nms_threshold=0.45,
+                 output_format='yolov8'):
+        if output_format not in ('yolov8', 'yolov5'):
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.input_size = tuple(input_size)
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.output_format = output_format
+        self.batched = True
+        super().__init__(model_path)
+
+    def find_path(self):
+        return find_model_path()
+
+    def _build(self, data):
+        net = cv2.dnn.readNetFromONNX(np.frombuffer(data, np.uint8))
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return net
+
+    def _forward(self, net, images):
+        blob = cv2.dnn.blobFromImages(images, 1 / 255.0, self.input_size, swapRB=True, crop=False)
+        net.setInput(blob)
+        return net.forward()
+
+    def _detect_batch(self, net, images, min_sizes, max_sizes):
+        images = [cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image for image in images]
+        outputs = None
+        if self.batched and len(images) > 1:
+            try:
+                outputs = self._forward(net, images)
+            except cv2.error:
+                # Exported with a fixed batch size of 1
+                self.batched = False
+        if outputs is None:
+            outputs = np.concatenate([self._forward(net, [image]) for image in images])
+        return [self._parse(output, image.shape, min_size, max_size)
+                for output, image, min_size, max_size in zip(outputs, images, min_sizes, max_sizes)]
+
+    def _parse(self, output, shape, min_size, max_size):
+        if self.output_format == 'yolov8':
+            rows = output.T
+            scores = rows[:, 4:].max(axis=1)
+        else:
+            rows = output
+            scores = rows[:, 4] * (rows[:, 5:].max(axis=1) if rows.shape[1] > 5 else 1.0)
+        keep = scores >= self.conf_threshold
+        rows, scores = rows[keep], scores[keep]
+        if not len(rows):
+            return np.empty((0, 4), np.int32)
+        # Boxes are centre/size in network input pixels; stretch them back to the image
+        sx = shape[1] / float(self.input_size[0])
+        sy = shape[0] / float(self.input_size[1])
+        cx, cy, w, h = rows[:, 0] * sx, rows[:, 1] * sy, rows[:, 2] * sx, rows[:, 3] * sy
+        boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        boxes[:, 0:2] = np.maximum(boxes[:, 0:2], 0)
+        boxes = boxes.round().astype(np.int32)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.astype(float).tolist(),
+                                   self.conf_threshold, self.nms_threshold)
+        kept = [boxes[i] for i in np.array(indices).flatten() if within_size(boxes[i], min_size, max_size)]
+        return np.array(kept, dtype=np.int32).reshape(-1, 4)
+
+
+DETECTORS = {
+    'haar': HaarDetector,
+    'dnn': DnnDetector,
+}
+
+
+def create_detector(name='haar', path=None, **kwargs):
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector backend: {name}")
+    return DETECTORS[name](path, **kwargs)
@@ -0,0 +1,373 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from detectors import HaarDetector
+from metrics import REGISTRY
+from ocr import OCREngine
+
+
+class DetectionZone:
+    """Where, and at what size, plates appear for one camera.
+
+    ``region`` is the (x, y, w, h) part of the frame to search, in frame pixels.
+    ``min_size`` and ``max_size`` are (w, h) bounds for the detector's scale
+    search. Any of them can be None to leave that dimension unrestricted.
+    """
+
+    def __init__(self, region=None, min_size=None, max_size=None, samples=0):
+        self.region = region
+        self.min_size = min_size
+        self.max_size = max_size
+        self.samples = samples
+
+    @classmethod
+    def from_boxes(cls, boxes, frame_size=None, margin=0.5, size_slack=0.25, min_samples=20):
+        # Learns a zone from stored plate boxes; returns None when there are too few to trust
+        boxes = np.array([box for box in boxes if None not in box], dtype=np.float64).reshape(-1, 4)
+        if len(boxes) < min_samples:
+            return None
+        x, y, w, h = boxes.T
+        # Percentiles rather than min/max so a few false positives don't widen the zone
+        pad_x = margin * np.median(w)
+        pad_y = margin * np.median(h)
+        left = max(0.0, np.percentile(x, 1) - pad_x)
+        top = max(0.0, np.percentile(y, 1) - pad_y)
+        right = np.percentile(x + w, 99) + pad_x
+        bottom = np.percentile(y + h, 99) + pad_y
+        if frame_size is not None:
+            right = min(right, frame_size[0])
+            bottom = min(bottom, frame_size[1])
+        region = (int(left), int(top), int(right - left), int(bottom - top))
+        min_size = (int(np.percentile(w, 1) * (1 - size_slack)), int(np.percentile(h, 1) * (1 - size_slack)))
+        max_size = (int(np.ceil(np.percentile(w, 99) * (1 + size_slack))),
+                    int(np.ceil(np.percentile(h, 99) * (1 + size_slack))))
+        return cls(region, min_size, max_size, samples=len(boxes))
+
+    def crop(self, image):
+        # Returns the part of the frame to search and its offset in the frame
+        if self.region is None:
+            return image, (0, 0)
+        x, y, w, h = self.region
+        x0 = min(max(0, x), image.shape[1])
+        y0 = min(max(0, y), image.shape[0])
+        x1 = min(image.shape[1], x + w)
+        y1 = min(image.shape[0], y + h)
+        if x1 <= x0 or y1 <= y0:
+            return image, (0, 0)
+        return image[y0:y1, x0:x1], (x0, y0)
+
+    def __repr__(self):
+        return f"DetectionZone(region={self.region}, min_size={self.min_size}, max_size={self.max_size})"
+
+
+def scale_size(size, factor):
+    return None if size is None else tuple(max(1, int(round(v * factor))) for v in size)
+
+
+PIPELINE_STAGES = ('detect', 'crop', 'track', 'ocr', 'encode', 'total')
+
+STAGE_SECONDS = REGISTRY.histogram('alpr_stage_seconds', "Time per frame spent in each pipeline stage")
+FRAMES_PROCESSED = REGISTRY.counter('alpr_frames_processed_total', "Frames run through detection")
+PLATES_DETECTED = REGISTRY.counter('alpr_plates_detected_total', "Plates found by the detector")
+
+
+class StageTimings:
+    """Per-stage latency totals for process_frame, shared by every worker using an engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, timings):
+        # timings maps stage -> seconds for one frame
+        with self._lock:
+            for stage, seconds in timings.items():
+                count, total, worst = self._stats.get(stage, (0, 0.0, 0.0))
+                self._stats[stage] = (count + 1, total + seconds, max(worst, seconds))
+
+    def summary(self):
+        with self._lock:
+            return {stage: {'count': count, 'mean_ms': total / count * 1000, 'max_ms': worst * 1000}
+                    for stage, (count, total, worst) in self._stats.items()}
+
+    def format(self):
+        summary = self.summary()
+        return ', '.join(f"{stage} {summary[stage]['mean_ms']:.1f} ms"
+                         for stage in PIPELINE_STAGES if stage in summary)
+
+
+class ImageArchiver:
+    """Writes plate crops to disk on a background thread.
+
+    Archival is optional; detection never waits on the filesystem. When the
+    queue is full new crops are dropped rather than stalling the caller.
+    """
+
+    def __init__(self, max_pending=256):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, filename, data):
+        try:
+            self.queue.put_nowait((filename, data))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Archive queue full, dropping {filename}")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            filename, data = item
+            try:
+                directory = os.path.dirname(filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(filename, 'wb') as file:
+                    file.write(data)
+                self.written += 1
+            except Exception as e:
+                print(f"Error archiving plate image {filename}: {e}")
+
+    def close(self, timeout=5.0):
+        # Flush whatever is queued, then stop the writer thread
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+
+class DetectionEngine:
+    """GUI-free detect -> crop -> threshold -> OCR -> persist chain."""
+
+    def __init__(self, db_manager=None, cascade_path=None, output_dir=None, detector=None, archiver=None, ocr=None,
+                 tracker=None, zones=None, detect_scale=1.0, image_store=None, watchlist=None):
+        self.db_manager = db_manager
+        self.detector = detector or HaarDetector(cascade_path)
+        # ocr=False builds a detection-only engine that never starts Tesseract
+        self.ocr = OCREngine() if ocr is None else ocr or None
+        self.output_dir = output_dir
+        self.archiver = archiver
+        # Content-addressed store for new plate crops; takes precedence over the archiver
+        self.image_store = image_store
+        self.tracker = tracker
+        # WatchlistMonitor that decides on each plate as soon as it is read
+        self.watchlist = watchlist
+        # Camera name -> DetectionZone; cameras without one search the whole frame
+        self.zones = dict(zones or {})
+        # The detector sees the frame shrunk by this factor; crops for OCR still come from the full frame
+        self.detect_scale = detect_scale
+        self.stage_timings = StageTimings()
+
+    def prepare_detection(self, img, zone=None):
+        # Returns (image the detector sees, zone offset, min_size, max_size) for a BGR frame
+        image = img if self.detector.wants_color or img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if zone is not None:
+            roi, offset = zone.crop(image)
+            min_size, max_size = zone.min_size, zone.max_size
+        else:
+            roi, offset = image, (0, 0)
+            min_size = max_size = None
+        scale = self.detect_scale
+        if scale != 1.0:
+            # INTER_AREA averages like a pyramid level, so small text edges don't alias
+            roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            min_size, max_size = scale_size(min_size, scale), scale_size(max_size, scale)
+        return roi, offset, min_size, max_size
+
+    def restore_boxes(self, plates, offset):
+        # Maps boxes from the detector's image back to full-resolution frame coordinates
+        if len(plates) and self.detect_scale != 1.0:
+            plates = np.round(plates / self.detect_scale).astype(np.int32)
+        if len(plates) and (offset[0] or offset[1]):
+            plates = plates + np.array([offset[0], offset[1], 0, 0], dtype=plates.dtype)
+        return plates
+
+    def detect_batch(self, imgs, cameras=None, zones=None):
+        # One detector call for several frames; batching backends share a single forward pass
+        cameras = cameras or [None] * len(imgs)
+        zones = zones or [None] * len(imgs)
+        prepared = [self.prepare_detection(img, zone or self.zones.get(camera))
+                    for img, camera, zone in zip(imgs, cameras, zones)]
+        results = self.detector.detect_batch([p[0] for p in prepared], [p[2] for p in prepared],
+                                             [p[3] for p in prepared])
+        return [self.restore_boxes(plates, p[1]) for plates, p in zip(results, prepared)]
+
+    def detect_plates(self, img, camera=None, zone=None):
+        return self.detect_batch([img], [camera], [zone])[0]
+
+    def time_detection(self, img, zone=None, runs=5):
+        # Median detector latency in milliseconds for one frame
+        timings = []
+        # An empty zone searches the whole frame, whatever is configured for the camera
+        zone = zone or DetectionZone()
+        for _ in range(runs):
+            start = time.perf_counter()
+            self.detect_plates(img, zone=zone)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings))
+
+    def calibrate_zone(self, camera=None, frame=None, **kwargs):
+        # Learns camera's zone from its stored plates; with a sample frame, also reports latency before/after
+        boxes = self.db_manager.get_plate_boxes(camera)
+        frame_size = (frame.shape[1], frame.shape[0]) if frame is not None else None
+        zone = DetectionZone.from_boxes(boxes, frame_size=frame_size, **kwargs)
+        if zone is None:
+            return None, None
+        report = {'samples': zone.samples}
+        if frame is not None:
+            report['before_ms'] = self.time_detection(frame)
+            report['after_ms'] = self.time_detection(frame, zone)
+        self.zones[camera] = zone
+        return zone, report
+
+    def reload_detector(self, path=None):
+        self.detector.reload(path)
+
+    def extract_plate(self, img, box):
+        x, y, w, h = box
+        # Calculate margins based on image dimensions
+        a, b = (int(0.02 * img.shape[0]), int(0.025 * img.shape[1]))
+
+        # Extract plate region with margins
+        plate = img[y + a:y + h - a, x + b:x + w - b, :]
+
+        # Apply morphological operations
+        kernel = np.ones((1, 1), np.uint8)
+        plate = cv2.dilate(plate, kernel, iterations=1)
+        plate = cv2.erode(plate, kernel, iterations=1)
+
+        # Convert to grayscale and apply thresholding to get binary image
+        plate_gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)
+        (thresh, plate_binary) = cv2.threshold(plate_gray, 127, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return plate_binary
+
+    def process_frame(self, img, camera=None, timings=None):
+        return self.process_frames([img], [camera], [{} if timings is None else timings])[0]
+
+    def process_frames(self, imgs, cameras=None, timings=None):
+        # Detects on all frames in one batch, then crops, tracks and reads each frame's plates.
+        # Stage durations in seconds go into the per-frame `timings` dicts if given, and always to stage_timings
+        cameras = cameras or [None] * len(imgs)
+        timings = timings or [{} for _ in imgs]
+        start = time.perf_counter()
+        detections = self.detect_batch(imgs, cameras)
+        # A shared forward pass is charged evenly to the frames in it
+        detect_time = (time.perf_counter() - start) / max(1, len(imgs))
+        return [self.read_detections(img, plates, camera, frame_timings, detect_time)
+                for img, plates, camera, frame_timings in zip(imgs, detections, cameras, timings)]
+
+    def read_detections(self, img, plates, camera=None, timings=None, detect_time=0.0):
+        timings = {} if timings is None else timings
+        timings['detect'] = detect_time
+        start = mark = time.perf_counter()
+
+        def lap(stage):
+            nonlocal mark
+            now = time.perf_counter()
+            timings[stage] = now - mark
+            mark = now
+
+        print('Number of detected license plates:', len(plates))
+        crops = [self.extract_plate(img, box) for box in plates]
+        lap('crop')
+        if self.tracker is not None:
+            matches = self.tracker.match(plates, camera=camera)
+        else:
+            matches = [(None, True)] * len(plates)
+        # Tracks with a stable reading skip OCR; the rest go to the backend in one call
+        to_read = [i for i, (track, is_new) in enumerate(matches) if track is None or self.tracker.needs_ocr(track)]
+        lap('track')
+        readings = dict(zip(to_read, self.ocr.read_plates([crops[i] for i in to_read])))
+        lap('ocr')
+        detected_plates = []
+        for i, ((x, y, w, h), plate_binary) in enumerate(zip(plates, crops)):
+            track, is_new = matches[i]
+            if i in readings:
+                plate_text, ocr_error, confidence, ocr_source = readings[i]
+                if track is not None:
+                    self.tracker.add_reading(track, plate_text)
+            else:
+                plate_text, ocr_error, confidence, ocr_source = track.best_text, None, None, 'track'
+            if track is not None and track.best_text:
+                # Report the vote over every reading of this vehicle so far
+                plate_text = track.best_text
+
+            # Encode once; the same bytes go to the database and the archive
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            plate_filename = f'plate_{timestamp}_{plate_text}.jpg'
+            if self.output_dir:
+                plate_filename = os.path.join(self.output_dir, plate_filename)
+            plate_jpeg = cv2.imencode('.jpg', plate_binary)[1].tobytes() if is_new else None
+            image_hash = None
+            if self.image_store is not None and is_new:
+                # A crop the store could not take is kept in the database row instead
+                image_hash = self.image_store.put(plate_jpeg)
+                if image_hash is not None:
+                    plate_filename = self.image_store.path(image_hash)
+            elif self.archiver is not None and is_new:
+                self.archiver.submit(plate_filename, plate_jpeg)
+
+            detected_plates.append({
+                'text': plate_text,
+                'x': int(x),
+                'y': int(y),
+                'w': int(w),
+                'h': int(h),
+                'filename': plate_filename,
+                'image': plate_binary,
+                'jpeg': plate_jpeg,
+                'image_hash': image_hash,
+                'ocr_error': ocr_error,
+                'confidence': confidence,
+                'ocr_source': ocr_source,
+                'track': track,
+                'new_track': is_new,
+                'ocr_skipped': i not in readings
+            })
+        lap('encode')
+        if self.watchlist is not None:
+            self.watchlist.check(detected_plates, camera=camera)
+            lap('watchlist')
+        timings['total'] = time.perf_counter() - start + detect_time
+        self.stage_timings.add(timings)
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        FRAMES_PROCESSED.inc(camera=camera or '')
+        PLATES_DETECTED.inc(len(detected_plates), camera=camera or '')
+        return detected_plates
+
+    def save(self, detected_plates, camera=None, lane=None):
+        if self.db_manager is None:
+            return None
+        if self.tracker is None:
+            return self.db_manager.save_detection(detected_plates, camera=camera, lane=lane)
+        # Only a vehicle's first sighting gets a detections row; the event is written when its track closes
+        self.close_tracks()
+        new_plates = [plate for plate in detected_plates if plate['new_track']]
+        if not new_plates:
+            return None
+        detection_id = self.db_manager.save_detection(new_plates, camera=camera, lane=lane)
+        for plate in new_plates:
+            plate['track'].detection_id = detection_id
+            plate['track'].plate_id = plate.get('plate_id')
+            plate['track'].saved_text = plate['text']
+        return detection_id
+
+    def close_tracks(self, force=False):
+        if self.tracker is None:
+            return []
+        closed = self.tracker.expire(force=force)
+        if self.db_manager is not None:
+            for track in closed:
+                best_text = track.best_text
+                if track.plate_id and best_text and best_text != track.saved_text:
+                    self.db_manager.update_plate_text(track.plate_id, best_text)
+                self.db_manager.save_vehicle_event(track)
+        return closed
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+from batch import list_images, resolve_model_path
+from detectors import DETECTORS, create_detector
+from engine import DetectionEngine
+from tracker import box_iou
+
+
+def load_labels(path):
+    # {"image.jpg": [[x, y, w, h], ...]}, keyed by file name relative to the image directory
+    with open(path) as file:
+        return {name: [tuple(box) for box in boxes] for name, boxes in json.load(file).items()}
+
+
+def match_boxes(found, expected, iou_threshold=0.5):
+    # Greedy one-to-one matching by IoU; returns the number of expected boxes found
+    candidates = sorted(((box_iou(f, e), i, j) for i, f in enumerate(found) for j, e in enumerate(expected)),
+                        reverse=True)
+    used_found, used_expected = set(), set()
+    for iou, i, j in candidates:
+        if iou < iou_threshold:
+            break
+        if i in used_found or j in used_expected:
+            continue
+        used_found.add(i)
+        used_expected.add(j)
+    return len(used_expected)
+
+
+def evaluate_detector(engine, images, labels, batch_size=1, iou_threshold=0.5):
+    latencies = []
+    boxes_found = {}
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        began = time.perf_counter()
+        results = engine.detect_batch([img for name, img in batch])
+        # Per-image latency, with a batched pass charged evenly to its images
+        latencies.extend([(time.perf_counter() - began) * 1000 / len(batch)] * len(batch))
+        for (name, img), plates in zip(batch, results):
+            boxes_found[name] = [tuple(int(v) for v in box) for box in plates]
+    report = {
+        'images': len(images),
+        'boxes': sum(len(boxes) for boxes in boxes_found.values()),
+        'mean_ms': float(np.mean(latencies)) if latencies else 0.0,
+        'p95_ms': float(np.percentile(latencies, 95)) if latencies else 0.0,
+    }
+    if labels is not None:
+        expected = sum(len(labels.get(name, [])) for name, img in images)
+        hits = sum(match_boxes(boxes_found[name], labels.get(name, []), iou_threshold) for name, img in images)
+        report['recall'] = hits / expected if expected else None
+        report['precision'] = hits / report['boxes'] if report['boxes'] else None
+    return report, boxes_found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare plate detector backends on the same image set")
+    parser.add_argument('images', help="Directory of images")
+    parser.add_argument('--detectors', nargs='+', default=['haar'], choices=sorted(DETECTORS),
+                        help="Backends to compare (default: haar)")
+    parser.add_argument('--labels', default=None,
+                        help="JSON of ground-truth boxes per image; without it recall is measured "
+                             "against the first backend listed")
+    parser.add_argument('--cascade', default=None, help="Path to the Haar cascade XML")
+    parser.add_argument('--model', default=None, help="Path to the ONNX model for the dnn detector")
+    parser.add_argument('--detect-scale', type=float, default=1.0, help="Shrink frames by this factor before detecting")
+    parser.add_argument('--batch-size', type=int, default=1, help="Images per detector call")
+    parser.add_argument('--iou', type=float, default=0.5, help="IoU needed for a detection to count as a match")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.images):
+        parser.error(f"Not a directory: {args.images}")
+    images = []
+    for path in list_images(args.images):
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Could not read image file: {path}")
+            continue
+        images.append((os.path.basename(path), img))
+    labels = load_labels(args.labels) if args.labels else None
+
+    reports = {}
+    for name in args.detectors:
+        path = args.cascade if name == 'haar' else args.model
+        # Only detection is timed and scored, so no OCR engine is started
+        engine = DetectionEngine(detector=create_detector(name, resolve_model_path(name, path)),
+                                 ocr=False, detect_scale=args.detect_scale)
+        report, boxes_found = evaluate_detector(engine, images, labels, args.batch_size, args.iou)
+        if labels is None:
+            # The first backend becomes the reference the others are scored against
+            labels = boxes_found
+            report['reference'] = True
+        reports[name] = report
+
+    print(f"{'backend':<8} {'images':>6} {'boxes':>6} {'mean ms':>8} {'p95 ms':>8} {'recall':>7} {'precision':>9}")
+    for name, report in reports.items():
+        recall = report.get('recall')
+        precision = report.get('precision')
+        print(f"{name:<8} {report['images']:>6} {report['boxes']:>6} {report['mean_ms']:>8.1f} {report['p95_ms']:>8.1f} "
+              f"{'-' if recall is None else f'{recall:.3f}':>7} {'-' if precision is None else f'{precision:.3f}':>9}"
+              f"{'  (reference)' if report.get('reference') else ''}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import base64
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from database import DatabaseManager, EXPORT_COLUMNS
+from imagestore import ImageStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+def export_format(path):
+    # Format from the file name, ignoring a trailing .gz
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    if extension == 'json':
+        return 'jsonl'
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Can't tell the export format from '{path}' (use .csv, .jsonl or .parquet)")
+    return extension
+
+
+def open_text(path):
+    # .gz names are compressed on the fly
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def encode_image(data):
+    return base64.b64encode(data).decode('ascii') if data else None
+
+
+def write_csv(path, columns, chunks):
+    rows = 0
+    with open_text(path) as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        image_column = columns.index('image') if 'image' in columns else None
+        for chunk in chunks:
+            if image_column is not None:
+                chunk = [row[:image_column] + (encode_image(row[image_column]),) for row in chunk]
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def write_jsonl(path, columns, chunks):
+    rows = 0
+    with open_text(path) as file:
+        for chunk in chunks:
+            for row in chunk:
+                record = dict(zip(columns, row))
+                if 'image' in record:
+                    record['image'] = encode_image(record['image'])
+                file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            rows += len(chunk)
+    return rows
+
+
+def parquet_schema(columns):
+    types = {
+        'detection_id': pa.int64(), 'plates_count': pa.int64(), 'plate_id': pa.int64(),
+        'x': pa.int64(), 'y': pa.int64(), 'w': pa.int64(), 'h': pa.int64(),
+        'confidence': pa.float64(), 'image': pa.binary(),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+
+def write_parquet(path, columns, chunks):
+    # One row group per chunk; images are stored as raw bytes
+    if pq is None:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = parquet_schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            arrays = [pa.array([row[i] for row in chunk], type=field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+
+def export_detections(db_manager, path, start=None, end=None, include_images=False, fmt=None, chunk_size=1000):
+    """Streams detections in [start, end) to a CSV, JSON Lines or Parquet file.
+
+    Rows are read and written a chunk at a time, so memory use does not
+    grow with the size of the range. With ``include_images`` each row carries
+    its plate image (base64 in CSV and JSON Lines). Returns the number of rows.
+    """
+    fmt = fmt or export_format(path)
+    columns = EXPORT_COLUMNS + (('image',) if include_images else ())
+    chunks = db_manager.iter_export_chunks(start, end, include_images, chunk_size)
+    return WRITERS[fmt](path, columns, chunks)
+
+
+def day_range(start_day=None, end_day=None):
+    # ISO bounds [start, end) for inclusive YYYY-MM-DD days; either may be None
+    start = datetime.strptime(start_day, "%Y-%m-%d").isoformat() if start_day else None
+    end = (datetime.strptime(end_day, "%Y-%m-%d") + timedelta(days=1)).isoformat() if end_day else None
+    return start, end
+
+
+def print_daily_report(db_manager, day, camera=None):
+    plates = db_manager.get_daily_plates(day)
+    print(f"{day}: {len(plates)} distinct plates")
+    print(f"{'plate':<14} {'first entry':>11} {'last exit':>11} {'visits':>6}")
+    for plate_text, first_seen, last_seen, visits in plates:
+        print(f"{plate_text:<14} {first_seen[11:19]:>11} {last_seen[11:19]:>11} {visits:>6}")
+    print()
+    print(f"{'hour':<6} {'camera':<12} {'detections':>10} {'plates':>7}")
+    for hour, camera_name, detections, plate_count in db_manager.get_hourly_traffic(day, camera):
+        print(f"{hour:02d}:00  {camera_name or '-':<12} {detections:>10} {plate_count:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export detections and print daily reports")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('detections', help="Export detections and plates for a range of days")
+    export_parser.add_argument('output', help="Output file: .csv, .jsonl or .parquet (.csv.gz/.jsonl.gz compress)")
+    export_parser.add_argument('--db', default='license_plates.db', help="Detections database")
+    export_parser.add_argument('--start', default=None, help="First day to export, YYYY-MM-DD")
+    export_parser.add_argument('--end', default=None, help="Last day to export, YYYY-MM-DD (inclusive)")
+    export_parser.add_argument('--format', default=None, choices=EXPORT_FORMATS,
+                               help="Output format (default: from the file name)")
+    export_parser.add_argument('--images', action='store_true', help="Include plate images")
+    export_parser.add_argument('--image-store', default='plate_images',
+                               help="Image store directory, for images not kept in the database")
+    export_parser.add_argument('--chunk-size', type=int, default=1000, help="Detections read per query")
+    report_parser = commands.add_parser('report', help="Per-plate entries/exits and hourly traffic for a day")
+    report_parser.add_argument('--db', default='license_plates.db', help="Detections database")
+    report_parser.add_argument('--day', default=None, help="Day to report, YYYY-MM-DD (default: today)")
+    report_parser.add_argument('--camera', default=None, help="Only this camera's hourly traffic")
+    report_parser.add_argument('--rebuild', action='store_true',
+                               help="Recompute the report tables from the detections first")
+    args = parser.parse_args()
+
+    if args.command == 'detections':
+        try:
+            args.format = args.format or export_format(args.output)
+            if args.format == 'parquet' and pq is None:
+                raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        except (ValueError, ImportError) as e:
+            print(e)
+            return 1
+    image_store = None
+    if args.command == 'detections' and args.images and os.path.isdir(args.image_store):
+        image_store = ImageStore(args.image_store, max_bytes=None)
+    db_manager = DatabaseManager(args.db, image_store=image_store)
+    try:
+        if args.command == 'report':
+            if args.rebuild:
+                db_manager.execute_write(db_manager.rebuild_reports)
+            print_daily_report(db_manager, args.day or datetime.now().strftime("%Y-%m-%d"), args.camera)
+            return 0
+        start, end = day_range(args.start, args.end)
+        started = time.perf_counter()
+        rows = export_detections(db_manager, args.output, start, end, args.images, args.format, args.chunk_size)
+        print(f"Exported {rows} rows to {args.output} in {time.perf_counter() - started:.1f}s")
+        return 0
+    finally:
+        db_manager.close()
+        if image_store is not None:
+            image_store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
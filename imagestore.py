@@ -0,0 +1,219 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from metrics import REGISTRY
+
+STORE_WRITES = REGISTRY.counter('alpr_image_store_writes_total', "Plate images stored, by result (written, deduplicated)")
+STORE_EVICTIONS = REGISTRY.counter('alpr_image_store_evictions_total',
+                                   "Plate images removed, by reason (budget, age, retention)")
+
+
+def content_key(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class ImageStore:
+    """Content-addressed plate images in a sharded directory tree.
+
+    Each crop is written once as ``<root>/ab/cd/<hash>.jpg``; storing the same
+    bytes again only marks the file as recently used. ``put`` hashes in the
+    caller and hands the write to a background thread, so detection never
+    waits on the disk. The same thread keeps the store under ``max_bytes`` by
+    removing the least recently used files, and removes files unused for
+    ``max_age`` seconds. The database keeps only the hash.
+    """
+
+    def __init__(self, root='plate_images', max_bytes=2 * 2 ** 30, max_age=None, max_pending=256,
+                 low_water=0.9, sweep_interval=60.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.low_water = low_water
+        self.sweep_interval = sweep_interval
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # key -> [size, last used]; mtime on disk carries last use across restarts
+        self._index = {}
+        # Images queued but not yet on disk, so they can be read back straight away
+        self._pending = {}
+        self.total_bytes = 0
+        self.written = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="image-store", daemon=True)
+        self.thread.start()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], f'{key}.jpg')
+
+    def put(self, data, block=False):
+        # Returns the key the image will be stored under, or None when a full queue (without block)
+        # drops it, so the caller can keep the bytes itself
+        key = content_key(data)
+        with self._lock:
+            self._pending[key] = data
+        try:
+            self.queue.put((key, data), block=block)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(key, None)
+            self.dropped += 1
+            print(f"Image store queue full, dropping {key}")
+            return None
+        return key
+
+    def get(self, key):
+        with self._lock:
+            data = self._pending.get(key)
+        if data is not None:
+            return data
+        try:
+            with open(self.path(key), 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        self._touch(key)
+        return data
+
+    def _touch(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                entry[1] = now
+        try:
+            os.utime(self.path(key), (now, now))
+        except OSError:
+            pass
+
+    def _scan(self):
+        # Rebuild the index from what a previous run left on disk
+        index = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.jpg'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                index[name[:-4]] = [st.st_size, st.st_mtime]
+        with self._lock:
+            for key, entry in index.items():
+                self._index.setdefault(key, entry)
+            self.total_bytes = sum(size for size, used in self._index.values())
+
+    def _write(self, key, data):
+        with self._lock:
+            known = key in self._index
+        path = self.path(key)
+        if known and os.path.exists(path):
+            self.deduplicated += 1
+            STORE_WRITES.inc(result='deduplicated')
+            self._touch(key)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._index[key] = [len(data), time.time()]
+            self.total_bytes += len(data)
+        self.written += 1
+        STORE_WRITES.inc(result='written')
+
+    def _remove(self, keys, reason):
+        for key in keys:
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry is None:
+                    continue
+                self.total_bytes -= entry[0]
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+            self.evicted += 1
+            STORE_EVICTIONS.inc(reason=reason)
+
+    def remove(self, keys):
+        # Deletes images the database no longer refers to
+        self._remove(keys, 'retention')
+
+    def evict(self):
+        # Oldest-used first until the store is back under low_water * max_bytes, plus anything past max_age
+        now = time.time()
+        with self._lock:
+            by_use = sorted(self._index.items(), key=lambda item: item[1][1])
+            total = self.total_bytes
+        expired = [key for key, (size, used) in by_use if self.max_age and now - used > self.max_age]
+        self._remove(expired, 'age')
+        if self.max_bytes and total > self.max_bytes:
+            target = self.low_water * self.max_bytes
+            over_budget = []
+            expired = set(expired)
+            for key, (size, used) in by_use:
+                if total <= target:
+                    break
+                if key not in expired:
+                    over_budget.append(key)
+                    total -= size
+            self._remove(over_budget, 'budget')
+
+    def _run(self):
+        try:
+            self._scan()
+            self.evict()
+        except Exception as e:
+            print(f"Image store scan error: {e}")
+        last_sweep = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self.queue.task_done()
+                break
+            if item:
+                key, data = item
+                try:
+                    self._write(key, data)
+                except Exception as e:
+                    print(f"Error storing plate image {key}: {e}")
+                with self._lock:
+                    self._pending.pop(key, None)
+                self.queue.task_done()
+            over_budget = self.max_bytes and self.total_bytes > self.max_bytes
+            if over_budget or time.monotonic() - last_sweep >= self.sweep_interval:
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"Image store eviction error: {e}")
+                last_sweep = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._index),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'written': self.written,
+                'deduplicated': self.deduplicated,
+                'evicted': self.evicted,
+                'dropped': self.dropped,
+                'pending': self.queue.qsize(),
+            }
+
+    def flush(self):
+        # Blocks until every image queued so far is on disk
+        self.queue.join()
+
+    def close(self, timeout=5.0):
+        # Flush queued writes, then stop the store thread
+        self.queue.put(None)
+        self.thread.join(timeout)
@@ -1,19 +1,30 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, Toplevel
+from tkinter import ttk, messagebox, Toplevel, filedialog
 import cv2
-import numpy as np
 import os
 from PIL import Image, ImageTk
 import threading
 import time
-import sqlite3
-import base64
-from datetime import datetime
 import io
-import json
+from datetime import datetime
 import pytesseract
 import subprocess
 import platform
+from database import DatabaseManager
+from detectors import create_detector
+from engine import DetectionEngine
+from export import day_range, export_detections
+from imagestore import ImageStore
+from retention import RetentionManager, RetentionPolicy
+from ocr import OCRCache, OCREngine
+from charclass import CharClassifier, train_from_database
+from trigger import CaptureTrigger, TRIGGER_MODES
+from workers import DetectionJob, DetectionWorkerPool
+from tracker import PlateTracker
+from ui_bus import UIEventBus
+from camera import CameraSource, CameraFeed
+from metrics import REGISTRY, MetricsServer
+from watchlist import WatchlistMonitor
 
 # Set the path to the Tesseract executable
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\rithv\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
@@ -30,154 +41,110 @@ if not os.path.exists(tessdata_path):
         "https://github.com/tesseract-ocr/tessdata if missing."
     )
 
-class DatabaseManager:
-    def __init__(self, db_name='license_plates.db'):
-        self.db_name = db_name
-        self.init_database()
-    
-    def init_database(self):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS detections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    plates_count INTEGER,
-                    plate_images BLOB,
-                    detection_data TEXT
-                )
-            ''')
-            conn.commit()
-            conn.close()
-            print(f"Database initialized: {self.db_name}")
-        except Exception as e:
-            print(f"Database initialization error: {e}")
-    
-    def save_detection(self, plates_data):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            plate_images_blob = self.serialize_plate_images(plates_data)
-            detection_summary = f"Plates detected: {len(plates_data)}"
-            for plate in plates_data:
-                detection_summary += f"\nPlate {plate['text']}: {plate['w']}x{plate['h']}px at ({plate['x']}, {plate['y']})"
-            cursor.execute('''
-                INSERT INTO detections 
-                (timestamp, plates_count, plate_images, detection_data)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                datetime.now().isoformat(),
-                len(plates_data),
-                plate_images_blob,
-                detection_summary
-            ))
-            detection_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            print(f"Detection saved to database with ID: {detection_id}")
-            return detection_id
-        except Exception as e:
-            print(f"Database save error: {e}")
-            return None
-    
-    def image_to_blob(self, image_path):
-        try:
-            with open(image_path, 'rb') as file:
-                return file.read()
-        except Exception as e:
-            print(f"Error converting image to blob: {e}")
-            return None
-    
-    def serialize_plate_images(self, plates_data):
-        try:
-            plate_images = {}
-            for plate in plates_data:
-                if os.path.exists(plate['filename']):
-                    with open(plate['filename'], 'rb') as file:
-                        plate_images[f"plate_{plate['text']}"] = base64.b64encode(file.read()).decode()
-                    plate_images[f"filename_{plate['text']}"] = plate['filename']
-            return json.dumps(plate_images).encode()
-        except Exception as e:
-            print(f"Error serializing plate images: {e}")
-            return None
-    
-    def get_recent_detections(self, limit=20):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, timestamp, plates_count, plate_images, detection_data 
-                FROM detections 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-            results = cursor.fetchall()
-            conn.close()
-            return results
-        except Exception as e:
-            print(f"Database query error: {e}")
-            return []
-
-    def get_all_detections(self):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, timestamp, plates_count, plate_images, detection_data 
-                FROM detections 
-                ORDER BY timestamp DESC
-            ''')
-            results = cursor.fetchall()
-            conn.close()
-            return results
-        except Exception as e:
-            print(f"Database query error: {e}")
-            return []
-
-    def delete_detection(self, detection_id):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM detections WHERE id = ?', (detection_id,))
-            conn.commit()
-            conn.close()
-            print(f"Detection ID {detection_id} deleted from database")
-        except Exception as e:
-            print(f"Database delete error: {e}")
-
-    def update_plate_text(self, detection_id, old_plate_text, new_plate_text):
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            # Fetch the current entry
-            cursor.execute('SELECT plate_images, detection_data FROM detections WHERE id = ?', (detection_id,))
-            result = cursor.fetchone()
-            if not result:
-                return False
-            plate_images_blob, detection_data = result
-            # Update plate_images
-            plate_images = json.loads(plate_images_blob.decode())
-            if f"plate_{old_plate_text}" in plate_images:
-                plate_images[f"plate_{new_plate_text}"] = plate_images.pop(f"plate_{old_plate_text}")
-                plate_images[f"filename_{new_plate_text}"] = plate_images.pop(f"filename_{old_plate_text}")
-                new_plate_images_blob = json.dumps(plate_images).encode()
-                # Update detection_data
-                new_detection_data = detection_data.replace(f"Plate {old_plate_text}:", f"Plate {new_plate_text}:")
-                # Update the database
-                cursor.execute('''
-                    UPDATE detections 
-                    SET plate_images = ?, detection_data = ? 
-                    WHERE id = ?
-                ''', (new_plate_images_blob, new_detection_data, detection_id))
-                conn.commit()
-                conn.close()
-                print(f"Updated plate text from {old_plate_text} to {new_plate_text} for detection ID {detection_id}")
-                return True
-            return False
-        except Exception as e:
-            print(f"Database update error: {e}")
-            return False
+# Plate crops are written once per distinct image under IMAGE_STORE_DIR/<hash prefix>/,
+# in the background; the database keeps only the hash. The least recently used
+# images are removed beyond IMAGE_STORE_MAX_MB, and any unused for
+# IMAGE_STORE_MAX_AGE_DAYS (None keeps them). False keeps images inside the database
+ARCHIVE_PLATE_IMAGES = True
+IMAGE_STORE_DIR = 'plate_images'
+IMAGE_STORE_MAX_MB = 2048
+IMAGE_STORE_MAX_AGE_DAYS = None
+
+# Retention: plate images are dropped after RETENTION_IMAGE_DAYS; detections and
+# vehicle events older than RETENTION_METADATA_DAYS move to compressed, read-only
+# daily segments in ARCHIVE_DIR (searchable with `retention.py search`). Pruning
+# runs in small background batches every RETENTION_INTERVAL_MIN minutes. None keeps forever
+RETENTION_IMAGE_DAYS = 90
+RETENTION_METADATA_DAYS = 365
+ARCHIVE_DIR = 'archive'
+RETENTION_INTERVAL_MIN = 10
+
+# Auto-capture: 'motion' runs detection only when something changes in MOTION_REGION,
+# 'timer' runs it every TIMER_INTERVAL seconds regardless
+CAPTURE_MODE = 'motion'
+TIMER_INTERVAL = 5.0
+MOTION_REGION = None  # (x, y, w, h) as fractions of the frame; None watches the whole frame
+MOTION_MIN_INTERVAL = 1.0
+MOTION_COOLDOWN = 3.0
+
+# Each camera has its own grabber and trigger. A source is a device index, an
+# RTSP/HTTP URL or a video file (played on a loop); detections are tagged with
+# the camera name and lane
+CAMERA_SOURCES = [
+    CameraSource('camera-0', 0),
+]
+
+# Every camera feeds one detection pool sized to the machine, not to the number
+# of cameras; when its bounded queue is full the overflow policy
+# ('drop-oldest', 'drop-newest' or 'block') decides what gives
+# Cameras without a configured zone learn one from their stored plates
+# (CameraSource(..., zone=engine.DetectionZone(...)) fixes it instead); Ctrl+K recalibrates
+AUTO_CALIBRATE_ZONES = True
+ZONE_CALIBRATION_DELAY_MS = 3000
+
+DETECTION_WORKERS = max(2, (os.cpu_count() or 2) - 1)
+DETECTION_QUEUE_SIZE = max(4, 2 * len(CAMERA_SOURCES))
+DETECTION_OVERFLOW = 'drop-oldest'
+
+# Repeated sightings of the same plate are merged into one vehicle event; a track
+# closes after TRACK_MAX_AGE seconds unseen and skips OCR once its reading is stable
+TRACK_MAX_AGE = 30.0
+TRACK_STABLE_VOTES = 3
+# How often tracks that have left the frame are closed and their vehicle events written
+TRACK_EXPIRY_SEC = 5.0
+
+# Worker threads post to the UI bus; the Tk loop applies their updates every UI_TICK_MS
+UI_TICK_MS = 50
+HISTORY_MAX_ROWS = 100
+
+# The camera is read on its own thread; the preview only redraws at PREVIEW_FPS,
+# scaled to fit PREVIEW_SIZE
+PREVIEW_FPS = 15
+PREVIEW_SIZE = (640, 480)
+
+# Cameras capture at their native resolution. The detector runs on the frame
+# shrunk by DETECT_SCALE, and OCR crops are cut from the full-resolution frame
+DETECT_SCALE = 0.5
+
+# Plate detector backend: 'haar' (cascade XML) or 'dnn' (ONNX model on the CPU).
+# DETECTOR_MODEL=None looks in the default locations. Workers hand up to
+# DETECTION_BATCH_SIZE queued captures to the detector at once; the dnn backend
+# runs them in one forward pass
+DETECTOR_BACKEND = 'haar'
+DETECTOR_MODEL = None
+DETECTION_BATCH_SIZE = 4
+
+# Stage latencies, queue depths and frame ages are served in the Prometheus text
+# format on http://127.0.0.1:METRICS_PORT/metrics (None turns the endpoint off);
+# the stats line under the preview refreshes every STATS_REFRESH_MS
+METRICS_PORT = 9108
+STATS_REFRESH_MS = 1000
+
+# Readings are reused for crops whose perceptual hash is within OCR_CACHE_DISTANCE
+# bits of one read in the last OCR_CACHE_TTL seconds (a car waiting at the barrier).
+# OCR_CACHE_SIZE=0 turns the cache off
+OCR_CACHE_SIZE = 256
+OCR_CACHE_TTL = 60.0
+OCR_CACHE_DISTANCE = 6
+
+# Fast OCR path: a nearest-neighbour character classifier trained from plates
+# corrected in the edit dialog (Ctrl+T retrains it). Tesseract only reads plates
+# whose weakest character scores below OCR_FAST_MIN_CONFIDENCE
+OCR_CLASSIFIER_MODEL = 'models/char_classifier.npz'
+OCR_FAST_MIN_CONFIDENCE = 0.85
+
+# Gate decisions: plates are matched against WATCHLIST_PATH (CSV rows of
+# plate,action,label with action allow, deny or alert) as soon as they are read,
+# tolerating confusable characters plus WATCHLIST_MAX_EDITS other OCR errors. The
+# file is reloaded within WATCHLIST_RELOAD_SEC of being saved. Plates on no list get
+# WATCHLIST_DEFAULT_ACTION (None records no decision)
+WATCHLIST_PATH = 'watchlist.csv'
+WATCHLIST_DEFAULT_ACTION = None
+WATCHLIST_MAX_EDITS = 1
+WATCHLIST_RELOAD_SEC = 2.0
+
+UI_TICK_SECONDS = REGISTRY.histogram('alpr_ui_tick_seconds', "Time the Tk loop spends applying one tick of UI events")
+UI_EVENTS = REGISTRY.counter('alpr_ui_events_total', "Events applied by the Tk loop")
 
 class LicensePlateDetectorGUI:
     def __init__(self, root):
@@ -188,13 +155,52 @@ class LicensePlateDetectorGUI:
         self.root.resizable(True, True)
         
         self.current_image = None
-        self.current_image_path = None
         self.detected_plates = []
-        self.camera = None
         self.camera_running = False
-        self.camera_thread = None
-        self.captured_frame = None
-        self.db_manager = DatabaseManager()
+        self.preview_seq = 0
+        self.ui_bus = UIEventBus()
+        self.results_header = None
+        self.plate_rows = []
+        self.history_last_key = ('', 0)
+        self.cameras = {source.name: CameraFeed(source, self.make_trigger(), self.on_camera_capture)
+                        for source in CAMERA_SOURCES}
+        self.capture_mode = tk.StringVar(value=CAPTURE_MODE)
+        self.preview_camera = tk.StringVar(value=CAMERA_SOURCES[0].name)
+        # Plate crops stay in memory; storing them on disk is optional and async
+        self.image_store = None
+        if ARCHIVE_PLATE_IMAGES:
+            max_age = IMAGE_STORE_MAX_AGE_DAYS * 86400 if IMAGE_STORE_MAX_AGE_DAYS else None
+            self.image_store = ImageStore(IMAGE_STORE_DIR, max_bytes=IMAGE_STORE_MAX_MB * 2 ** 20, max_age=max_age)
+        self.db_manager = DatabaseManager(image_store=self.image_store)
+        if self.image_store is not None:
+            # Images saved inside the database by older versions move out in the background
+            threading.Thread(target=self.db_manager.move_images_to_store, name="image-migration", daemon=True).start()
+        self.retention = RetentionManager(self.db_manager,
+                                          RetentionPolicy(RETENTION_IMAGE_DAYS, RETENTION_METADATA_DAYS, ARCHIVE_DIR),
+                                          image_store=self.image_store, interval=RETENTION_INTERVAL_MIN * 60)
+        self.retention.start()
+        self.tracker = PlateTracker(max_age=TRACK_MAX_AGE, stable_votes=TRACK_STABLE_VOTES)
+        self.ocr_cache = OCRCache(OCR_CACHE_SIZE, OCR_CACHE_TTL, OCR_CACHE_DISTANCE) if OCR_CACHE_SIZE else None
+        self.watchlist = WatchlistMonitor(WATCHLIST_PATH, default_action=WATCHLIST_DEFAULT_ACTION,
+                                          max_edits=WATCHLIST_MAX_EDITS, interval=WATCHLIST_RELOAD_SEC,
+                                          on_match=lambda event: self.ui_bus.post('watch', event))
+        self.watchlist.start()
+        try:
+            self.engine = self.create_engine()
+        except Exception as e:
+            print(f"Detector initialization error: {e}")
+            self.engine = None
+        self.detection_pool = DetectionWorkerPool(self.run_numberplate_detection, workers=DETECTION_WORKERS,
+                                                  max_queue=DETECTION_QUEUE_SIZE, overflow=DETECTION_OVERFLOW,
+                                                  batch_handler=self.run_detection_batch,
+                                                  batch_size=DETECTION_BATCH_SIZE)
+        self.register_metrics()
+        self.metrics_server = None
+        if METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(port=METRICS_PORT)
+            except OSError as e:
+                print(f"Metrics endpoint disabled: {e}")
 
         # Style configuration for a professional look
         self.style = ttk.Style()
@@ -212,7 +218,18 @@ class LicensePlateDetectorGUI:
         self.main_frame.pack(fill='both', expand=True, padx=15, pady=15)
 
         self.setup_ui()
+        self.root.bind('<Control-r>', self.reload_cascade)
+        self.root.bind('<Control-k>', self.calibrate_zones)
+        self.root.bind('<Control-t>', self.retrain_classifier)
+        if AUTO_CALIBRATE_ZONES:
+            self.root.after(ZONE_CALIBRATION_DELAY_MS, self.calibrate_zones)
+        self.track_expiry_stop = threading.Event()
+        self.track_expiry = threading.Thread(target=self.expire_tracks, name="track-expiry", daemon=True)
+        self.track_expiry.start()
+        self.root.after(UI_TICK_MS, self.process_ui_events)
+        self.root.after(STATS_REFRESH_MS, self.refresh_stats)
         self.start_camera()
+        self.render_preview()
 
     def setup_ui(self):
         # Header
@@ -257,8 +274,10 @@ class LicensePlateDetectorGUI:
         # Status bar
         self.status_frame = tk.Frame(self.camera_panel, bg='#3A3A5C', relief='raised', bd=1)
         self.status_frame.pack(fill='x', pady=(5, 0))
-        self.status_label = tk.Label(self.status_frame, text="Camera active - Auto-capturing every 5 seconds", fg='#E0E0E0', bg='#3A3A5C', font=('Helvetica', 10))
+        self.status_label = tk.Label(self.status_frame, text=self.active_status_text(), fg='#E0E0E0', bg='#3A3A5C', font=('Helvetica', 10))
         self.status_label.pack(expand=True, pady=5)
+        self.stats_label = tk.Label(self.status_frame, text="", fg='#A0A0C0', bg='#3A3A5C', font=('Helvetica', 9))
+        self.stats_label.pack(expand=True, pady=(0, 5))
         self.progress = ttk.Progressbar(self.status_frame, mode='indeterminate')
         
         # Control buttons
@@ -270,6 +289,14 @@ class LicensePlateDetectorGUI:
         stop_btn.pack(side='left', padx=5, pady=5)
         capture_btn = ttk.Button(control_frame, text="Manual Capture", command=self.capture_image)
         capture_btn.pack(side='left', padx=5, pady=5)
+        mode_box = ttk.Combobox(control_frame, textvariable=self.capture_mode, values=TRIGGER_MODES, state='readonly', width=8)
+        mode_box.pack(side='left', padx=5, pady=5)
+        mode_box.bind('<<ComboboxSelected>>', self.change_capture_mode)
+        if len(self.cameras) > 1:
+            camera_box = ttk.Combobox(control_frame, textvariable=self.preview_camera, values=list(self.cameras),
+                                      state='readonly', width=12)
+            camera_box.pack(side='left', padx=5, pady=5)
+            camera_box.bind('<<ComboboxSelected>>', self.change_preview_camera)
 
     def setup_right_panel(self):
         # Split right panel into results, manage database button, and history
@@ -371,6 +398,27 @@ class LicensePlateDetectorGUI:
         header_label = tk.Label(header_frame, text="Database Management", font=('Helvetica', 16, 'bold'), fg='#E0E0E0', bg='#3A3A5C')
         header_label.pack(pady=10)
 
+        # Fuzzy plate search, optionally limited to one camera and a range of days
+        search_frame = tk.Frame(main_frame, bg='#2D2D44')
+        search_frame.pack(fill='x', pady=(0, 5))
+        tk.Label(search_frame, text="Plate:", fg='#E0E0E0', bg='#2D2D44').pack(side='left', padx=(5, 2), pady=5)
+        search_entry = ttk.Entry(search_frame, width=16, font=('Helvetica', 10))
+        search_entry.pack(side='left', padx=2, pady=5)
+        tk.Label(search_frame, text="Camera:", fg='#E0E0E0', bg='#2D2D44').pack(side='left', padx=(10, 2), pady=5)
+        search_camera = tk.StringVar(value='All')
+        camera_box = ttk.Combobox(search_frame, textvariable=search_camera, values=['All'] + list(self.cameras),
+                                  state='readonly', width=10)
+        camera_box.pack(side='left', padx=2, pady=5)
+        tk.Label(search_frame, text="From:", fg='#E0E0E0', bg='#2D2D44').pack(side='left', padx=(10, 2), pady=5)
+        from_entry = ttk.Entry(search_frame, width=11, font=('Helvetica', 10))
+        from_entry.pack(side='left', padx=2, pady=5)
+        tk.Label(search_frame, text="To:", fg='#E0E0E0', bg='#2D2D44').pack(side='left', padx=(10, 2), pady=5)
+        to_entry = ttk.Entry(search_frame, width=11, font=('Helvetica', 10))
+        to_entry.pack(side='left', padx=2, pady=5)
+        search_status = tk.Label(search_frame, text="Dates as YYYY-MM-DD", fg='#A0A0B0', bg='#2D2D44',
+                                 font=('Helvetica', 8))
+        search_status.pack(side='right', padx=5, pady=5)
+
         # Database table
         table_frame = tk.Frame(main_frame, bg='#2D2D44', relief='raised', bd=2)
         table_frame.pack(fill='both', expand=True, pady=5)
@@ -393,40 +441,132 @@ class LicensePlateDetectorGUI:
         tree.pack(side='left', fill='both', expand=True, padx=5, pady=5)
 
         scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side='right', fill='y', pady=5)
 
-        # Load all database entries
-        def load_database():
-            for item in tree.get_children():
-                tree.delete(item)
-            all_detections = self.db_manager.get_all_detections()
-            for detection in all_detections:
-                detection_id, timestamp, plates_count, plate_images_blob, _ = detection
+        # Entries are loaded a page at a time (newest first) as the list is scrolled;
+        # only metadata is queried, the plate image is fetched when a row is selected
+        page_size = 100
+        state = {'oldest': None, 'newest': None, 'exhausted': False, 'search': None}
+        rows_by_detection = {}
+
+        def insert_rows(rows, at_top=False):
+            keys = []
+            for position, detection in enumerate(rows):
+                detection_id, timestamp, plates_count, plate_id, plate_text, filename = detection
+                if not keys or keys[-1][1] != detection_id:
+                    keys.append((timestamp, detection_id))
                 dt = datetime.fromisoformat(timestamp)
                 date_str = dt.strftime("%Y-%m-%d")
                 time_str = dt.strftime("%H:%M:%S")
-                if plate_images_blob:
-                    plate_images = json.loads(plate_images_blob.decode())
-                    for key, value in plate_images.items():
-                        if key.startswith('plate_'):
-                            plate_text = key.replace('plate_', '')
-                            filename_key = f"filename_{plate_text}"
-                            filename = plate_images.get(filename_key, 'Unknown')
-                            tree.insert('', 'end', values=(
-                                detection_id, date_str, time_str, plate_text, filename, plates_count
-                            ))
+                index = position if at_top else 'end'
+                # Row ids carry the plate id so edits target one plate, not a text match
+                if plate_id is not None:
+                    iid = f"plate_{plate_id}"
+                    tree.insert('', index, iid=iid, values=(
+                        detection_id, date_str, time_str, plate_text, filename or 'Unknown', plates_count
+                    ))
                 else:
-                    tree.insert('', 'end', values=(
+                    iid = f"detection_{detection_id}"
+                    tree.insert('', index, iid=iid, values=(
                         detection_id, date_str, time_str, '-', 'No plates', plates_count
                     ))
+                rows_by_detection.setdefault(detection_id, []).append(iid)
+            return keys
 
-        load_database()
+        def load_next_page():
+            if state['exhausted']:
+                return
+            rows = self.db_manager.get_detection_page(state['oldest'], page_size)
+            keys = insert_rows(rows)
+            if keys:
+                state['oldest'] = keys[-1]
+                if state['newest'] is None:
+                    state['newest'] = keys[0]
+            if len(keys) < page_size:
+                state['exhausted'] = True
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) > 0.9 and not state['exhausted']:
+                db_window.after_idle(load_next_page)
+
+        tree.configure(yscrollcommand=on_scroll)
+        load_next_page()
+
+        def date_bounds():
+            # [start, end) from the From/To days, or None after warning about a bad date
+            try:
+                return day_range(from_entry.get().strip() or None, to_entry.get().strip() or None)
+            except ValueError:
+                messagebox.showwarning("Warning", "Enter dates as YYYY-MM-DD.", parent=db_window)
+                return None
+
+        def clear_tree():
+            tree.delete(*tree.get_children())
+            rows_by_detection.clear()
+
+        def run_search(event=None):
+            query = search_entry.get().strip()
+            if not query:
+                clear_search()
+                return
+            bounds = date_bounds()
+            if bounds is None:
+                return
+            camera = None if search_camera.get() == 'All' else search_camera.get()
+            started = time.perf_counter()
+            rows = self.db_manager.search_plates(query, bounds[0], bounds[1], camera)
+            elapsed = time.perf_counter() - started
+            # Search results replace the paged list until the search is cleared
+            state['search'] = query
+            state['exhausted'] = True
+            clear_tree()
+            insert_rows(rows)
+            search_status.configure(text=f"{len(rows)} plate(s) like {query} ({elapsed * 1000:.0f} ms)")
+
+        def clear_search():
+            search_entry.delete(0, 'end')
+            state.update(oldest=None, newest=None, exhausted=False, search=None)
+            clear_tree()
+            search_status.configure(text="Dates as YYYY-MM-DD")
+            load_next_page()
+
+        search_entry.bind('<Return>', run_search)
+        search_btn = ttk.Button(search_frame, text="🔍 Search", command=run_search)
+        search_btn.pack(side='left', padx=(10, 2), pady=5)
+        clear_btn = ttk.Button(search_frame, text="Clear", command=clear_search)
+        clear_btn.pack(side='left', padx=2, pady=5)
 
         # Actions frame
         actions_frame = tk.Frame(main_frame, bg='#2D2D44')
         actions_frame.pack(fill='x', pady=10)
 
+        preview_label = tk.Label(actions_frame, text="Select a plate to preview", fg='#E0E0E0', bg='#2D2D44', font=('Helvetica', 8))
+        preview_label.pack(side='right', padx=5, pady=5)
+
+        def show_preview(event=None):
+            selected_item = tree.selection()
+            if not selected_item or not selected_item[0].startswith('plate_'):
+                preview_label.configure(image='', text="No plate image")
+                preview_label.image = None
+                return
+            data = self.db_manager.get_plate_image(int(selected_item[0][len('plate_'):]))
+            if not data:
+                preview_label.configure(image='', text="No plate image")
+                preview_label.image = None
+                return
+            try:
+                plate_img = Image.open(io.BytesIO(data))
+                plate_img.thumbnail((200, 60), Image.Resampling.LANCZOS)
+                plate_photo = ImageTk.PhotoImage(plate_img)
+                preview_label.configure(image=plate_photo, text='')
+                preview_label.image = plate_photo
+            except Exception as e:
+                preview_label.configure(image='', text="Preview error")
+                preview_label.image = None
+
+        tree.bind('<<TreeviewSelect>>', show_preview)
+
         # Delete selected entry
         def delete_entry():
             selected_item = tree.selection()
@@ -437,7 +577,9 @@ class LicensePlateDetectorGUI:
             confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete entry ID {detection_id}?", parent=db_window)
             if confirm:
                 self.db_manager.delete_detection(detection_id)
-                load_database()
+                for iid in rows_by_detection.pop(detection_id, []):
+                    if tree.exists(iid):
+                        tree.delete(iid)
                 self.update_history_display()
 
         delete_btn = ttk.Button(actions_frame, text="🗑️ Delete Entry", command=delete_entry)
@@ -450,11 +592,12 @@ class LicensePlateDetectorGUI:
                 messagebox.showwarning("Warning", "Please select an entry to edit.", parent=db_window)
                 return
             values = tree.item(selected_item)['values']
-            detection_id = values[0]
-            old_plate_text = values[3]
-            if old_plate_text == '-':
+            old_plate_text = str(values[3])
+            if not selected_item[0].startswith('plate_'):
                 messagebox.showwarning("Warning", "This entry has no plate to edit.", parent=db_window)
                 return
+            plate_iid = selected_item[0]
+            plate_id = int(plate_iid[len('plate_'):])
 
             # Create a new window for editing
             edit_window = Toplevel(db_window)
@@ -479,9 +622,10 @@ class LicensePlateDetectorGUI:
                 if not new_plate_text:
                     messagebox.showwarning("Warning", "Please enter a new plate number.", parent=edit_window)
                     return
-                if self.db_manager.update_plate_text(detection_id, old_plate_text, new_plate_text):
+                if self.db_manager.update_plate_text(plate_id, new_plate_text, corrected=True):
                     messagebox.showinfo("Success", "Plate number updated successfully!", parent=edit_window)
-                    load_database()
+                    if tree.exists(plate_iid):
+                        tree.set(plate_iid, 'Plate', new_plate_text)
                     self.update_history_display()
                     edit_window.destroy()
                 else:
@@ -493,265 +637,488 @@ class LicensePlateDetectorGUI:
         edit_btn = ttk.Button(actions_frame, text="✏️ Edit Plate", command=edit_plate)
         edit_btn.pack(side='left', padx=5, pady=5)
 
-        # Refresh button
-        refresh_btn = ttk.Button(actions_frame, text="🔄 Refresh", command=load_database)
+        # Refresh only pulls in detections newer than the newest row shown
+        def refresh():
+            if state['search'] is not None:
+                run_search()
+                return
+            if state['newest'] is None:
+                state['exhausted'] = False
+                load_next_page()
+                return
+            keys = insert_rows(self.db_manager.get_detections_after(state['newest']), at_top=True)
+            if keys:
+                state['newest'] = keys[0]
+
+        refresh_btn = ttk.Button(actions_frame, text="🔄 Refresh", command=refresh)
         refresh_btn.pack(side='left', padx=5, pady=5)
 
-    def start_camera(self):
-        try:
-            self.camera = cv2.VideoCapture(0)
-            if not self.camera.isOpened():
-                messagebox.showerror("Error", "Could not open camera.")
-                self.camera_running = False
+        # Export the From/To range (everything when both are empty) in the background
+        def export_entries():
+            bounds = date_bounds()
+            if bounds is None:
                 return
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera_running = True
-            self.camera_thread = threading.Thread(target=self.update_camera)
-            self.camera_thread.daemon = True
-            self.camera_thread.start()
-            self.root.after(2000, self.schedule_capture)
-            self.status_label.configure(text="Camera active - Auto-capturing every 5 seconds")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
-            self.camera_running = False
+            path = filedialog.asksaveasfilename(parent=db_window, title="Export detections", defaultextension='.csv',
+                                                filetypes=[('CSV', '*.csv'), ('JSON Lines', '*.jsonl'),
+                                                           ('Parquet', '*.parquet')])
+            if not path:
+                return
+            include_images = messagebox.askyesno("Export", "Include plate images?", parent=db_window)
+
+            def run():
+                try:
+                    rows = export_detections(self.db_manager, path, bounds[0], bounds[1], include_images)
+                    self.ui_bus.post('status', f"📤 Exported {rows} rows to {os.path.basename(path)}")
+                except Exception as e:
+                    print(f"Export error: {e}")
+                    self.ui_bus.post('status', f"Export failed: {e}")
+
+            threading.Thread(target=run, name="export", daemon=True).start()
+            search_status.configure(text=f"Exporting to {os.path.basename(path)}...")
+
+        export_btn = ttk.Button(actions_frame, text="📤 Export", command=export_entries)
+        export_btn.pack(side='left', padx=5, pady=5)
+        report_btn = ttk.Button(actions_frame, text="📊 Daily Report", command=lambda: self.open_daily_report(db_window))
+        report_btn.pack(side='left', padx=5, pady=5)
+
+    def open_daily_report(self, parent=None):
+        # Reads the report tables the database keeps up to date, so any day opens instantly
+        report_window = Toplevel(parent or self.root)
+        report_window.title("Daily Report - License Plate Recognition System")
+        report_window.geometry("700x600")
+        report_window.configure(bg='#1E1E2F')
+
+        controls = tk.Frame(report_window, bg='#2D2D44')
+        controls.pack(fill='x', padx=15, pady=(15, 5))
+        tk.Label(controls, text="Day:", fg='#E0E0E0', bg='#2D2D44').pack(side='left', padx=(5, 2), pady=5)
+        day_entry = ttk.Entry(controls, width=11, font=('Helvetica', 10))
+        day_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        day_entry.pack(side='left', padx=2, pady=5)
+        summary_label = tk.Label(controls, text='', fg='#A0A0B0', bg='#2D2D44', font=('Helvetica', 8))
+        summary_label.pack(side='right', padx=5, pady=5)
+
+        plates_columns = ('Plate', 'First Entry', 'Last Exit', 'Visits')
+        plates_tree = ttk.Treeview(report_window, columns=plates_columns, show='headings', height=14)
+        for column in plates_columns:
+            plates_tree.heading(column, text=column)
+            plates_tree.column(column, width=140, anchor='center')
+        plates_tree.pack(fill='both', expand=True, padx=15, pady=5)
+
+        traffic_columns = ('Hour', 'Camera', 'Detections', 'Plates')
+        traffic_tree = ttk.Treeview(report_window, columns=traffic_columns, show='headings', height=8)
+        for column in traffic_columns:
+            traffic_tree.heading(column, text=column)
+            traffic_tree.column(column, width=140, anchor='center')
+        traffic_tree.pack(fill='both', expand=True, padx=15, pady=(5, 15))
+
+        def show_day(event=None):
+            day = day_entry.get().strip()
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showwarning("Warning", "Enter the day as YYYY-MM-DD.", parent=report_window)
+                return
+            plates = self.db_manager.get_daily_plates(day)
+            traffic = self.db_manager.get_hourly_traffic(day)
+            plates_tree.delete(*plates_tree.get_children())
+            traffic_tree.delete(*traffic_tree.get_children())
+            for plate_text, first_seen, last_seen, visits in plates:
+                plates_tree.insert('', 'end', values=(plate_text, first_seen[11:19], last_seen[11:19], visits))
+            for hour, camera, detections, plate_count in traffic:
+                traffic_tree.insert('', 'end', values=(f"{hour:02d}:00", camera or '-', detections, plate_count))
+            summary_label.configure(text=f"{len(plates)} distinct plates, "
+                                         f"{sum(row[2] for row in traffic)} detections")
+
+        day_entry.bind('<Return>', show_day)
+        show_btn = ttk.Button(controls, text="Show", command=show_day)
+        show_btn.pack(side='left', padx=5, pady=5)
+        show_day()
+
+    def make_trigger(self):
+        return CaptureTrigger(CAPTURE_MODE, region=MOTION_REGION, timer_interval=TIMER_INTERVAL,
+                              min_interval=MOTION_MIN_INTERVAL, cooldown=MOTION_COOLDOWN)
+
+    def running_cameras(self):
+        return [feed for feed in self.cameras.values() if feed.running]
+
+    def start_camera(self):
+        errors = []
+        for feed in self.cameras.values():
+            if feed.running:
+                continue
+            try:
+                feed.trigger.set_mode(self.capture_mode.get())
+                feed.start()
+            except Exception as e:
+                errors.append(str(e))
+        self.camera_running = bool(self.running_cameras())
+        self.preview_seq = 0
+        if errors:
+            messagebox.showerror("Error", "Failed to start camera:\n" + "\n".join(errors))
+        if self.camera_running:
+            self.status_label.configure(text=self.active_status_text())
 
     def stop_camera(self):
         self.camera_running = False
-        if self.camera:
-            self.camera.release()
-            self.camera = None
+        for feed in self.cameras.values():
+            feed.stop()
         self.camera_label.configure(image='', text="Camera stopped", fg='#E0E0E0', font=('Helvetica', 10))
         self.status_label.configure(text="Camera stopped")
 
-    def update_camera(self):
-        while self.camera_running and self.camera:
-            try:
-                ret, frame = self.camera.read()
-                if not ret or frame is None:
-                    print("Failed to read frame from camera. Retrying...")
-                    time.sleep(0.1)
-                    continue
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                display_size = (640, 480)
-                frame_resized = cv2.resize(frame_rgb, display_size)
-                pil_image = Image.fromarray(frame_resized)
-                photo = ImageTk.PhotoImage(pil_image)
-                self.root.after(0, self.update_camera_display, photo, frame)
-                time.sleep(0.03)
-            except Exception as e:
-                print(f"Camera update error: {e}")
-                time.sleep(0.1)
+    def on_camera_capture(self, feed, frame):
+        # Called on the feed's trigger thread, so a full queue under the 'block' policy
+        # holds up this feed's trigger rather than the Tk loop
+        self.submit_capture(frame, feed.name)
 
-    def update_camera_display(self, photo, frame):
-        if self.camera_running:
-            self.camera_label.configure(image=photo, text='')
-            self.camera_label.image = photo
-            self.captured_frame = frame
+    def change_preview_camera(self, event=None):
+        self.preview_seq = 0
 
-    def schedule_capture(self):
+    def render_preview(self):
+        # Runs on the Tk loop at PREVIEW_FPS and only converts a frame when a new one has arrived
+        try:
+            feed = self.cameras.get(self.preview_camera.get())
+            if self.camera_running and feed is not None and feed.running:
+                seq, frame = feed.latest(self.preview_seq)
+                if frame is not None:
+                    self.preview_seq = seq
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    fit = min(PREVIEW_SIZE[0] / frame_rgb.shape[1], PREVIEW_SIZE[1] / frame_rgb.shape[0])
+                    if fit != 1.0:
+                        size = (max(1, int(frame_rgb.shape[1] * fit)), max(1, int(frame_rgb.shape[0] * fit)))
+                        frame_rgb = cv2.resize(frame_rgb, size, interpolation=cv2.INTER_AREA)
+                    photo = ImageTk.PhotoImage(Image.fromarray(frame_rgb))
+                    self.camera_label.configure(image=photo, text='')
+                    self.camera_label.image = photo
+        except Exception as e:
+            print(f"Preview error: {e}")
+        self.root.after(max(1, int(1000 / PREVIEW_FPS)), self.render_preview)
+
+    def process_ui_events(self):
+        # Apply everything the camera and detection threads posted since the last tick in one pass
+        start = time.perf_counter()
+        try:
+            events = self.ui_bus.drain()
+            jobs = []
+            for kind, payload in events:
+                UI_EVENTS.inc(kind=kind)
+                if kind == 'queued':
+                    self.show_capture_queued(*payload)
+                elif kind == 'detection':
+                    jobs.append(payload)
+                elif kind == 'zone':
+                    self.show_zone_report(*payload)
+                elif kind == 'status':
+                    self.status_label.configure(text=payload)
+                elif kind == 'watch':
+                    self.show_watch_event(payload)
+                elif kind == 'tracks':
+                    self.update_history_display()
+            if jobs:
+                self.finish_detections(jobs)
+        except Exception as e:
+            print(f"UI update error: {e}")
+        UI_TICK_SECONDS.observe(time.perf_counter() - start)
+        self.root.after(UI_TICK_MS, self.process_ui_events)
+
+    def register_metrics(self):
+        # Live state is read when the endpoint is scraped rather than pushed on every change
+        def per_camera(read):
+            return lambda: {(('camera', name),): read(feed.grabber)
+                            for name, feed in self.cameras.items() if feed.grabber is not None}
+
+        REGISTRY.gauge('alpr_frame_age_seconds', "Age of the newest frame from each camera",
+                       fn=per_camera(lambda grabber: grabber.frame_age()))
+        REGISTRY.counter('alpr_frames_dropped_total', "Camera frames replaced before anything read them",
+                         fn=per_camera(lambda grabber: grabber.frames_dropped))
+        REGISTRY.gauge('alpr_detection_pending', "Captures queued or being detected",
+                       fn=self.detection_pool.pending)
+        REGISTRY.gauge('alpr_detection_queue_depth', "Captures waiting for a detection worker",
+                       fn=lambda: self.detection_pool.stats()['queue_depth'])
+        REGISTRY.counter('alpr_detection_dropped_total', "Captures dropped because the detection queue was full",
+                         fn=lambda: self.detection_pool.stats()['dropped'])
+        REGISTRY.gauge('alpr_db_pending_writes', "Writes waiting for the database writer thread",
+                       fn=self.db_manager.pending_writes)
+        REGISTRY.gauge('alpr_open_tracks', "Vehicle tracks not yet closed",
+                       fn=lambda: self.tracker.stats()['open_tracks'])
+        if self.image_store is not None:
+            REGISTRY.gauge('alpr_image_store_bytes', "Bytes of plate images on disk",
+                           fn=lambda: self.image_store.stats()['bytes'])
+        REGISTRY.gauge('alpr_watchlist_entries', "Plates on the loaded watchlist",
+                       fn=lambda: len(self.watchlist.watchlist))
+        if self.ocr_cache is not None:
+            REGISTRY.gauge('alpr_ocr_cache_entries', "Readings held in the OCR cache",
+                           fn=lambda: self.ocr_cache.stats()['entries'])
+
+    def stats_text(self):
+        ages = [feed.grabber.frame_age() for feed in self.running_cameras()]
+        ages = [age for age in ages if age is not None]
+        stage_seconds = REGISTRY.get('alpr_stage_seconds')
+        means = [('detect', stage_seconds.mean(stage='detect')), ('ocr', stage_seconds.mean(stage='ocr')),
+                 ('save', REGISTRY.get('alpr_db_commit_seconds').mean())]
+        parts = [
+            f"frame age {max(ages) * 1000:.0f} ms" if ages else "frame age -",
+            f"pending {self.detection_pool.pending()}",
+            f"db backlog {self.db_manager.pending_writes()}",
+        ]
+        parts += [f"{name} {mean * 1000:.1f} ms" if mean is not None else f"{name} -" for name, mean in means]
+        fast_ratio = self.engine.ocr.stats()['fast_ratio'] if self.engine is not None else None
+        if fast_ratio is not None:
+            parts.append(f"fast ocr {fast_ratio:.0%}")
+        if self.ocr_cache is not None and self.ocr_cache.stats()['hit_rate'] is not None:
+            parts.append(f"ocr cache {self.ocr_cache.stats()['hit_rate']:.0%}")
+        return " | ".join(parts)
+
+    def refresh_stats(self):
+        try:
+            self.stats_label.configure(text=self.stats_text())
+        except Exception as e:
+            print(f"Stats update error: {e}")
+        self.root.after(STATS_REFRESH_MS, self.refresh_stats)
+
+    def show_watch_event(self, event):
+        # The barrier hook: one event per vehicle decision, posted by the detection worker
+        entry = event['entry']
+        text = f"{event['action'].upper()}: {event['text']}"
+        if entry is not None:
+            text += f" matches {entry.plate}" + (f" ({entry.label})" if entry.label else '')
+            if event['distance']:
+                text += f", distance {event['distance']:g}"
+        else:
+            text += " is on no list"
+        if event['camera']:
+            text += f" at {event['camera']}"
+        print(f"Watchlist: {text}")
+        self.status_label.configure(text=("🚫 " if event['action'] == 'deny' else "🔔 " if event['action'] == 'alert'
+                                          else "✅ ") + text)
+
+    def change_capture_mode(self, event=None):
+        for feed in self.cameras.values():
+            feed.trigger.set_mode(self.capture_mode.get())
         if self.camera_running:
-            if self.captured_frame is None:
-                print("No frame available yet. Waiting for the next frame...")
-                self.root.after(1000, self.schedule_capture)
-                return
-            self.capture_image()
-            self.root.after(5000, self.schedule_capture)
+            self.status_label.configure(text=self.active_status_text())
 
-    def capture_image(self):
-        if self.captured_frame is not None:
-            self.current_image_path = f'captured_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg'
-            cv2.imwrite(self.current_image_path, cv2.cvtColor(self.captured_frame, cv2.COLOR_RGB2BGR))
-            self.status_label.configure(text="Image captured - Running detection...")
-            self.progress.pack(fill='x', padx=10, pady=5)
-            self.progress.start()
-            detection_thread = threading.Thread(target=self.run_numberplate_detection)
-            detection_thread.daemon = True
-            detection_thread.start()
+    def active_status_text(self):
+        feeds = self.running_cameras() or list(self.cameras.values())
+        if self.capture_mode.get() == 'timer':
+            text = f"Camera active - Auto-capturing every {TIMER_INTERVAL:g} seconds"
         else:
-            print("Capture attempted but no frame available.")
-            messagebox.showwarning("Warning", "No frame available to capture. Retrying in 5 seconds...")
+            stats = [feed.trigger.stats() for feed in feeds]
+            text = (f"Camera active - Motion-triggered capture "
+                    f"({sum(s['triggers'] for s in stats)} captures, "
+                    f"{sum(s['saved_captures'] for s in stats)} saved)")
+        if len(self.cameras) > 1:
+            text = f"{len(self.running_cameras())}/{len(self.cameras)} cameras - " + text
+        ages = [feed.grabber.frame_age() for feed in self.running_cameras()]
+        ages = [age for age in ages if age is not None]
+        if ages:
+            dropped = sum(feed.grabber.frames_dropped for feed in self.running_cameras())
+            text += f" | frame age {max(ages) * 1000:.0f} ms, {dropped} frames dropped"
+        return text
 
-    def run_numberplate_detection(self):
-        try:
-            img = cv2.imread(self.current_image_path)
-            if img is None:
-                self.root.after(0, lambda: messagebox.showerror("Error", "Could not read image file"))
-                self.root.after(0, self.stop_progress)
-                return
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            cascade_path = 'haarcascades/haarcascade_russian_plate_number.xml'
-            if not os.path.exists(cascade_path):
-                cascade_path = 'haarcascade_russian_plate_number.xml'
-                if not os.path.exists(cascade_path):
-                    self.root.after(0, lambda: messagebox.showerror("Error", "Haarcascade file not found."))
-                    self.root.after(0, self.stop_progress)
-                    return
-            cascade = cv2.CascadeClassifier(cascade_path)
-            plates = cascade.detectMultiScale(gray, 1.2, 5)
-            print('Number of detected license plates:', len(plates))
-            self.detected_plates = []
-            for i, (x, y, w, h) in enumerate(plates):
-                cv2.rectangle(img, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                
-                # Calculate margins based on image dimensions
-                a, b = (int(0.02 * img.shape[0]), int(0.025 * img.shape[1]))
-                
-                # Extract plate region with margins
-                plate = img[y + a:y + h - a, x + b:x + w - b, :]
-                
-                # Apply morphological operations
-                kernel = np.ones((1,1), np.uint8)
-                plate = cv2.dilate(plate, kernel, iterations=1)
-                plate = cv2.erode(plate, kernel, iterations=1)
-                
-                # Convert to grayscale
-                plate_gray = cv2.cvtColor(plate, cv2.COLOR_BGR2GRAY)
-                
-                # Apply thresholding to get binary image
-                (thresh, plate_binary) = cv2.threshold(plate_gray, 127, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                
-                # Recognize characters using pytesseract on the binary image
-                try:
-                    plate_text = pytesseract.image_to_string(plate_binary, config='--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
-                    plate_text = ''.join(c for c in plate_text if c.isalnum()).strip() or f"Unknown_{i+1}"
-                except Exception as ocr_error:
-                    error_msg = f"Tesseract OCR failed: {str(ocr_error)}."
-                    self.root.after(0, lambda: messagebox.showerror("OCR Error", error_msg))
-                    plate_text = f"OCR_Failed_{i+1}"
-                
-                # Save the processed (binary) plate image
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                plate_filename = f'plate_{timestamp}_{plate_text}.jpg'
-                cv2.imwrite(plate_filename, plate_binary)
-                
-                # Store plate details
-                self.detected_plates.append({
-                    'text': plate_text,
-                    'x': x,
-                    'y': y,
-                    'w': w,
-                    'h': h,
-                    'filename': plate_filename,
-                    'image': plate_binary
-                })
-            
-            if os.path.exists(self.current_image_path):
-                os.remove(self.current_image_path)
-            processed_filename = f'processed_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg'
-            cv2.imwrite(processed_filename, img)
-            detection_id = self.db_manager.save_detection(self.detected_plates)
-            if os.path.exists(processed_filename):
-                os.remove(processed_filename)
-            self.root.after(0, self.display_results, detection_id)
-        except Exception as e:
-            error_msg = f"Detection failed: {str(e)}"
-            self.root.after(0, lambda: messagebox.showerror("Error", error_msg))
-            self.root.after(0, self.stop_progress)
-            if self.current_image_path and os.path.exists(self.current_image_path):
-                os.remove(self.current_image_path)
+    def capture_image(self):
+        # Manual capture from the preview camera
+        camera = self.preview_camera.get()
+        feed = self.cameras.get(camera)
+        frame = feed.latest()[1] if feed is not None and feed.running else None
+        if frame is None:
+            print("Capture attempted but no frame available.")
+            messagebox.showwarning("Warning", "No frame available to capture.")
+            return
+        if self.engine is None:
+            messagebox.showerror("Error", "Plate detector model not found.")
+            return
+        threading.Thread(target=self.submit_capture, args=(frame, camera), name="manual-capture", daemon=True).start()
+
+    def submit_capture(self, frame, camera):
+        # Runs off the Tk thread and may block on a full queue; the UI hears about the capture once it is queued
+        if self.engine is None:
+            self.ui_bus.post('status', "Plate detector model not found.")
+            return False
+        feed = self.cameras.get(camera)
+        # Grabbed frames are private BGR copies and go straight to the detector
+        job = DetectionJob(frame, on_done=lambda job: self.ui_bus.post('detection', job),
+                           camera=camera, lane=feed.source.lane if feed is not None else None)
+        if not self.detection_pool.submit(job):
+            print("Detection queue full, capture dropped.")
+            return False
+        self.ui_bus.post('queued', (camera, frame))
+        return True
+
+    def show_capture_queued(self, camera, frame):
+        self.current_image = frame
+        self.status_label.configure(text=f"Image captured ({camera}) - Running detection...")
+        self.progress.pack(fill='x', padx=10, pady=5)
+        self.progress.start()
+
+    def run_numberplate_detection(self, job):
+        self.run_detection_batch([job])
+
+    def run_detection_batch(self, jobs):
+        # Runs on a detection worker; results stay on the jobs until the UI picks them up
+        results = self.engine.process_frames([job.frame for job in jobs], [job.camera for job in jobs],
+                                             [job.timings for job in jobs])
+        for job, plates in zip(jobs, results):
+            job.plates = plates
+            job.detection_id = self.engine.save(job.plates, camera=job.camera, lane=job.lane)
+            for plate in job.plates:
+                plate['thumbnail'] = self.make_thumbnail(plate.get('image'))
+
+    def make_thumbnail(self, image):
+        # Resized on the worker so the UI thread only has to wrap it in a PhotoImage
+        if image is None or image.size == 0:
+            return None
+        plate_img = Image.fromarray(image)
+        scale_factor = min(100 / plate_img.size[0], 50 / plate_img.size[1])
+        new_size = (max(1, int(plate_img.size[0] * scale_factor)), 
+                   max(1, int(plate_img.size[1] * scale_factor)))
+        return plate_img.resize(new_size, Image.Resampling.LANCZOS)
+
+    def finish_detections(self, jobs):
+        failed = [job for job in jobs if job.error is not None]
+        done = [job for job in jobs if job.error is None]
+        if failed:
+            self.stop_progress()
+            messagebox.showerror("Error", f"Detection failed: {str(failed[-1].error)}")
+        # Report each distinct OCR error once per tick rather than once per plate
+        ocr_errors = {plate['ocr_error'] for job in done for plate in job.plates if plate['ocr_error']}
+        for error_msg in ocr_errors:
+            messagebox.showerror("OCR Error", error_msg)
+        if done:
+            # Show the newest capture that found plates, or the newest one if none did
+            shown = next((job for job in reversed(done) if job.plates), done[-1])
+            self.detected_plates = shown.plates
+            self.display_results(shown.detection_id, shown.timings)
+            self.refresh_history()
 
     def stop_progress(self):
+        # Keep the progress bar running while other captures are still queued
+        if self.detection_pool.pending():
+            return
         self.progress.stop()
         self.progress.pack_forget()
-        self.status_label.configure(text="Camera active - Auto-capturing every 5 seconds")
+        self.status_label.configure(text=self.active_status_text())
+
+    def build_results_widgets(self):
+        # Created once and reused; each result only reconfigures and repacks them
+        self.results_header = tk.Label(self.scrollable_results, fg='#E0E0E0', bg='#2D2D44', font=('Helvetica', 10, 'bold'))
+        self.results_db_info = tk.Label(self.scrollable_results, fg='#4ECDC4', bg='#2D2D44', font=('Helvetica', 8))
+        self.results_no_plates = tk.Label(self.scrollable_results, text="No license plates detected", 
+                                          fg='#FFA726', bg='#2D2D44', font=('Helvetica', 8))
+        self.results_actions = tk.Frame(self.scrollable_results, bg='#2D2D44')
+        capture_again_btn = ttk.Button(self.results_actions, text="🔄 Capture Again", 
+                                      command=self.reset_for_next_capture, style="Small.TButton")
+        capture_again_btn.pack(pady=2)
+        view_files_btn = ttk.Button(self.results_actions, text="📁 View Files", 
+                                   command=self.open_output_folder, style="Small.TButton")
+        view_files_btn.pack(pady=2)
 
-    def display_results(self, detection_id):
+    def get_plate_row(self, index):
+        # Plate rows grow with the largest result seen so far and are never destroyed
+        while len(self.plate_rows) <= index:
+            plate_frame = tk.Frame(self.scrollable_results, bg='#3A3A5C', relief='raised', bd=1)
+            title_label = tk.Label(plate_frame, fg='#E0E0E0', bg='#3A3A5C', font=('Helvetica', 8))
+            title_label.pack(pady=2)
+            image_label = tk.Label(plate_frame, bg='#3A3A5C', fg='#FF6B6B', font=('Helvetica', 6))
+            image_label.pack(pady=2)
+            self.plate_rows.append((plate_frame, title_label, image_label))
+        return self.plate_rows[index]
+
+    def display_results(self, detection_id, timings=None):
         self.stop_progress()
+        if self.results_header is None:
+            self.build_results_widgets()
         for widget in self.scrollable_results.winfo_children():
-            widget.destroy()
+            widget.pack_forget()
         num_plates = len(self.detected_plates)
-        self.status_label.configure(text=f"✅ Detection complete - {num_plates} plate{'s' if num_plates != 1 else ''} found")
-        results_header = tk.Label(self.scrollable_results, 
-                                 text=f"🎯 {num_plates} License Plate{'s' if num_plates != 1 else ''} Detected",
-                                 fg='#E0E0E0', bg='#2D2D44', font=('Helvetica', 10, 'bold'))
-        results_header.pack(pady=5)
+        status_text = f"✅ Detection complete - {num_plates} plate{'s' if num_plates != 1 else ''} found"
+        pool_stats = self.detection_pool.stats()
+        if pool_stats['queue_depth'] or pool_stats['dropped']:
+            status_text += f" (queued: {pool_stats['queue_depth']}, dropped: {pool_stats['dropped']})"
+        if timings:
+            status_text += (f" in {timings['total'] * 1000:.0f} ms (detect {timings['detect'] * 1000:.0f}, "
+                            f"OCR {timings['ocr'] * 1000:.0f})")
+        self.status_label.configure(text=status_text)
+        self.results_header.configure(text=f"🎯 {num_plates} License Plate{'s' if num_plates != 1 else ''} Detected")
+        self.results_header.pack(pady=5)
         if detection_id:
-            db_info = tk.Label(self.scrollable_results, 
-                              text=f"💾 Saved to database (ID: {detection_id})",
-                              fg='#4ECDC4', bg='#2D2D44', font=('Helvetica', 8))
-            db_info.pack(pady=3)
+            self.results_db_info.configure(text=f"💾 Saved to database (ID: {detection_id})")
+            self.results_db_info.pack(pady=3)
         if self.detected_plates:
-            for plate in self.detected_plates:
-                plate_frame = tk.Frame(self.scrollable_results, bg='#3A3A5C', relief='raised', bd=1)
-                plate_frame.pack(fill='x', pady=2, padx=5)
+            for i, plate in enumerate(self.detected_plates):
+                plate_frame, title_label, image_label = self.get_plate_row(i)
                 info_text = f"Plate {plate['text']}: {plate['w']}×{plate['h']}px at ({plate['x']}, {plate['y']})"
-                title_label = tk.Label(plate_frame, text=info_text, 
-                                      fg='#E0E0E0', bg='#3A3A5C', font=('Helvetica', 8))
-                title_label.pack(pady=2)
+                if not plate.get('new_track', True):
+                    info_text += " [tracked]"
+                if plate.get('decision'):
+                    info_text += f" [{plate['decision'].upper()}]"
+                title_label.configure(text=info_text)
                 try:
-                    if os.path.exists(plate['filename']):
-                        plate_img = Image.open(plate['filename'])
-                        if plate_img.size[0] > 0:
-                            scale_factor = min(100 / plate_img.size[0], 50 / plate_img.size[1])
-                            new_size = (max(1, int(plate_img.size[0] * scale_factor)), 
-                                       max(1, int(plate_img.size[1] * scale_factor)))
-                            plate_img = plate_img.resize(new_size, Image.Resampling.LANCZOS)
-                        plate_photo = ImageTk.PhotoImage(plate_img)
-                        plate_image_label = tk.Label(plate_frame, image=plate_photo, bg='#3A3A5C')
-                        plate_image_label.image = plate_photo
-                        plate_image_label.pack(pady=2)
+                    plate_photo = ImageTk.PhotoImage(plate['thumbnail'])
+                    image_label.configure(image=plate_photo, text='')
+                    image_label.image = plate_photo
                 except Exception as e:
-                    error_label = tk.Label(plate_frame, text="Preview error", 
-                                          fg='#FF6B6B', bg='#3A3A5C', font=('Helvetica', 6))
-                    error_label.pack(pady=2)
+                    image_label.configure(image='', text="Preview error")
+                    image_label.image = None
+                plate_frame.pack(fill='x', pady=2, padx=5)
         else:
-            no_plates_label = tk.Label(self.scrollable_results, text="No license plates detected", 
-                                      fg='#FFA726', bg='#2D2D44', font=('Helvetica', 8))
-            no_plates_label.pack(pady=10)
-        actions_frame = tk.Frame(self.scrollable_results, bg='#2D2D44')
-        actions_frame.pack(pady=5)
-        capture_again_btn = ttk.Button(actions_frame, text="🔄 Capture Again", 
-                                      command=self.reset_for_next_capture, style="Small.TButton")
-        capture_again_btn.pack(pady=2)
-        view_files_btn = ttk.Button(actions_frame, text="📁 View Files", 
-                                   command=self.open_output_folder, style="Small.TButton")
-        view_files_btn.pack(pady=2)
-        self.update_history_display()
+            self.results_no_plates.pack(pady=10)
+        self.results_actions.pack(pady=5)
+
+    def insert_history_rows(self, rows, index='end'):
+        for detection in rows:
+            detection_id, timestamp, plates_count, plate_id, plate_text, filename = detection
+            dt = datetime.fromisoformat(timestamp)
+            date_str = dt.strftime("%Y-%m-%d")
+            time_str = dt.strftime("%H:%M:%S")
+            if plate_id is not None:
+                self.history_tree.insert('', index, values=(
+                    date_str, time_str, plate_text, filename or 'Unknown'
+                ))
+            else:
+                self.history_tree.insert('', index, values=(
+                    date_str, time_str, '-', 'No plates'
+                ))
+            if index != 'end':
+                index += 1
+            self.history_last_key = max(self.history_last_key, (timestamp, detection_id))
 
     def update_history_display(self):
+        # Full reload, for edits and deletes that change rows already shown
         try:
             self.history_tree.delete(*self.history_tree.get_children())
-            recent_detections = self.db_manager.get_recent_detections(20)
-            for detection in recent_detections:
-                detection_id, timestamp, plates_count, plate_images_blob, _ = detection
-                dt = datetime.fromisoformat(timestamp)
-                date_str = dt.strftime("%Y-%m-%d")
-                time_str = dt.strftime("%H:%M:%S")
-                if plate_images_blob:
-                    plate_images = json.loads(plate_images_blob.decode())
-                    for key, value in plate_images.items():
-                        if key.startswith('plate_'):
-                            plate_text = key.replace('plate_', '')
-                            filename_key = f"filename_{plate_text}"
-                            filename = plate_images.get(filename_key, 'Unknown')
-                            self.history_tree.insert('', 'end', values=(
-                                date_str, time_str, plate_text, filename
-                            ))
-                else:
-                    self.history_tree.insert('', 'end', values=(
-                        date_str, time_str, '-', 'No plates'
-                    ))
+            self.history_last_key = ('', 0)
+            self.insert_history_rows(self.db_manager.get_recent_detections(20))
+        except Exception as e:
+            print(f"Error updating history: {e}")
+
+    def refresh_history(self):
+        # Only detections newer than the newest row shown are queried and added on top
+        try:
+            rows = self.db_manager.get_detections_after(self.history_last_key, limit=HISTORY_MAX_ROWS)
+            self.insert_history_rows(rows, index=0)
+            children = self.history_tree.get_children()
+            if len(children) > HISTORY_MAX_ROWS:
+                self.history_tree.delete(*children[HISTORY_MAX_ROWS:])
         except Exception as e:
             print(f"Error updating history: {e}")
 
     def reset_for_next_capture(self):
         self.current_image = None
-        self.current_image_path = None
         self.detected_plates = []
         for widget in self.scrollable_results.winfo_children():
-            widget.destroy()
-        self.no_results_label = tk.Label(self.scrollable_results, text="Ready for next capture", 
-                                        fg='#E0E0E0', bg='#2D2D44', font=('Helvetica', 10))
+            widget.pack_forget()
+        self.no_results_label.configure(text="Ready for next capture")
         self.no_results_label.pack(expand=True, pady=10)
         if self.camera_running:
-            self.status_label.configure(text="Camera active - Auto-capturing every 5 seconds")
+            self.status_label.configure(text=self.active_status_text())
         else:
             self.status_label.configure(text="Camera stopped")
 
     def open_output_folder(self):
         try:
             current_dir = os.getcwd()
+            if self.image_store is not None and os.path.isdir(self.image_store.root):
+                current_dir = os.path.abspath(self.image_store.root)
             if platform.system() == "Windows":
                 subprocess.Popen(f'explorer "{current_dir}"')
             elif platform.system() == "Darwin":
@@ -761,8 +1128,110 @@ class LicensePlateDetectorGUI:
         except Exception as e:
             messagebox.showinfo("Output Location", f"Output files saved in:\n{os.getcwd()}")
 
+    def reload_cascade(self, event=None):
+        # Swap in an updated cascade or model file without restarting (Ctrl+R)
+        try:
+            if self.engine is None:
+                self.engine = self.create_engine()
+            else:
+                self.engine.reload_detector()
+            detector = self.engine.detector
+            self.status_label.configure(text=f"{detector.name} detector reloaded: {detector.path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to reload plate detector: {str(e)}")
+
+    def create_engine(self):
+        ocr = OCREngine(cache=self.ocr_cache, classifier=self.load_classifier(), min_confidence=OCR_FAST_MIN_CONFIDENCE)
+        return DetectionEngine(self.db_manager, detector=create_detector(DETECTOR_BACKEND, DETECTOR_MODEL),
+                               image_store=self.image_store, ocr=ocr, tracker=self.tracker,
+                               zones=self.configured_zones(), detect_scale=DETECT_SCALE, watchlist=self.watchlist)
+
+    def load_classifier(self):
+        if not OCR_CLASSIFIER_MODEL or not os.path.exists(OCR_CLASSIFIER_MODEL):
+            return None
+        try:
+            return CharClassifier.load(OCR_CLASSIFIER_MODEL)
+        except Exception as e:
+            print(f"Character classifier not loaded: {e}")
+            return None
+
+    def retrain_classifier(self, event=None):
+        # Rebuilds the fast OCR classifier from corrected plates (Ctrl+T) on a background thread
+        if self.engine is None:
+            return
+
+        def run():
+            try:
+                classifier, used = train_from_database(self.db_manager)
+                if not used:
+                    self.ui_bus.post('status', "No corrected plates to train the character classifier on")
+                    return
+                classifier.save(OCR_CLASSIFIER_MODEL)
+                self.engine.ocr.classifier = classifier
+                # Readings cached before the retrain may be ones the classifier now gets right
+                if self.ocr_cache is not None:
+                    self.ocr_cache.clear()
+                self.ui_bus.post('status', f"Character classifier trained on {used} corrected plates "
+                                           f"({len(classifier.classes)} characters)")
+            except Exception as e:
+                print(f"Classifier training error: {e}")
+
+        threading.Thread(target=run, name="classifier-training", daemon=True).start()
+
+    def configured_zones(self):
+        return {source.name: source.zone for source in CAMERA_SOURCES if source.zone is not None}
+
+    def calibrate_zones(self, event=None):
+        # Learns a zone for every camera without a fixed one (Ctrl+K); timing runs off the UI thread
+        if self.engine is None:
+            return
+        feeds = [feed for feed in self.running_cameras() if feed.source.zone is None]
+
+        def run():
+            for feed in feeds:
+                try:
+                    zone, report = self.engine.calibrate_zone(feed.name, feed.latest()[1])
+                    self.ui_bus.post('zone', (feed.name, zone, report))
+                except Exception as e:
+                    print(f"Zone calibration error for {feed.name}: {e}")
+
+        threading.Thread(target=run, name="zone-calibration", daemon=True).start()
+
+    def show_zone_report(self, camera, zone, report):
+        if zone is None:
+            print(f"Not enough stored plates to calibrate a zone for {camera}")
+            return
+        text = f"Zone for {camera} learned from {report['samples']} plates: {zone}"
+        if 'before_ms' in report:
+            text += f" - detection {report['before_ms']:.1f} ms -> {report['after_ms']:.1f} ms"
+        print(text)
+        self.status_label.configure(text=text)
+
+    def expire_tracks(self):
+        # Runs on its own thread: closing tracks waits on database writes, so it stays off the Tk loop
+        while not self.track_expiry_stop.wait(TRACK_EXPIRY_SEC):
+            try:
+                engine = self.engine
+                if engine is not None and engine.close_tracks():
+                    self.ui_bus.post('tracks')
+            except Exception as e:
+                print(f"Track expiry error: {e}")
+
     def on_closing(self):
         self.stop_camera()
+        self.detection_pool.close()
+        self.track_expiry_stop.set()
+        self.track_expiry.join(timeout=2.0)
+        if self.engine is not None:
+            self.engine.close_tracks(force=True)
+        self.retention.stop()
+        self.watchlist.stop()
+        # Flush queued database writes before exiting
+        self.db_manager.close()
+        if self.image_store is not None:
+            self.image_store.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
         self.root.destroy()
 
 def main():
@@ -782,7 +1251,7 @@ if __name__ == "__main__":
     print("- SQLite database storage (plates only)")
     print("- Timestamp-based plate image naming")
     print("- Columnar history view (Date, Time, Plate Text, Filename)")
-    print("- Larger camera feed, always running, auto-capture every 5 seconds")
+    print("- Larger camera feed, always running, motion-triggered capture (or fixed 5-second timer)")
     print("- Tesseract OCR with enhanced plate processing")
     print("- Manage Database functionality with view, edit, and delete options")
     print("\nRequirements:")
@@ -791,4 +1260,5 @@ if __name__ == "__main__":
     print("3. Tesseract OCR installed at C:\\Users\\rithv\\AppData\\Local\\Programs\\Tesseract-OCR\\tesseract.exe")
     print("4. tessdata directory with eng.traineddata at C:\\Users\\rithv\\AppData\\Local\\Programs\\Tesseract-OCR\\tessdata")
     print("5. Connected camera")
+    print("6. Optional: pip install tesserocr (in-process OCR, falls back to pytesseract)")
     main()
@@ -0,0 +1,334 @@
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+import cv2
+import pytesseract
+from PIL import Image
+from metrics import REGISTRY
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCR_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+OCR_CONFIG = f'--psm 8 -c tessedit_char_whitelist={OCR_WHITELIST}'
+
+OCR_CROPS = REGISTRY.counter('alpr_ocr_crops_total', "Plate crops sent to an OCR backend")
+OCR_FAILURES = REGISTRY.counter('alpr_ocr_failures_total', "OCR backend calls that raised")
+OCR_CALL_SECONDS = REGISTRY.histogram('alpr_ocr_call_seconds', "Duration of one batched OCR backend call")
+OCR_READS = REGISTRY.counter('alpr_ocr_reads_total', "Plate readings by the source that produced them")
+OCR_CACHE_LOOKUPS = REGISTRY.counter('alpr_ocr_cache_lookups_total', "OCR cache lookups by result (hit, near_hit, miss)")
+OCR_CACHE_EVICTIONS = REGISTRY.counter('alpr_ocr_cache_evictions_total', "OCR cache entries dropped, by reason")
+
+
+def plate_hash(image, hash_size=(16, 8)):
+    # Difference hash: shrink to (w + 1) x h and keep one bit per horizontal brightness step
+    width, height = hash_size
+    small = cv2.resize(image, (width + 1, height), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class OCRCache:
+    """Bounded LRU/TTL cache of OCR results keyed by a perceptual hash of the crop.
+
+    A car standing at the barrier gives nearly the same binarized crop capture
+    after capture. Crops whose ``plate_hash`` is within ``max_distance`` bits
+    of a cached one, and whose aspect ratio is close, reuse its reading instead
+    of running OCR again. Entries expire ``ttl`` seconds after they were read,
+    even if they keep being hit, so a misread is not repeated forever.
+    """
+
+    def __init__(self, capacity=256, ttl=60.0, max_distance=6, hash_size=(16, 8), aspect_tolerance=0.2):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.aspect_tolerance = aspect_tolerance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, image):
+        height, width = image.shape[:2]
+        return plate_hash(image, self.hash_size), width / float(max(height, 1))
+
+    def _expire(self, now):
+        expired = [key for key, (result, stored_at) in self._entries.items() if now - stored_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        if expired:
+            OCR_CACHE_EVICTIONS.inc(len(expired), reason='ttl')
+
+    def get(self, key):
+        # Returns the cached (raw_text, confidence, source) for a crop key, or None
+        hash_value, aspect = key
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            kind = 'hit'
+            if entry is None and self.max_distance:
+                best = None
+                for cached_key, cached in self._entries.items():
+                    distance = hamming(hash_value, cached_key[0])
+                    if (distance <= self.max_distance and abs(cached_key[1] - aspect) <= self.aspect_tolerance * aspect
+                            and (best is None or distance < best[0])):
+                        best = (distance, cached_key, cached)
+                if best is not None:
+                    distance, key, entry = best
+                    kind = 'near_hit'
+            if entry is None:
+                self.misses += 1
+                OCR_CACHE_LOOKUPS.inc(result='miss')
+                return None
+            self._entries.move_to_end(key)
+            if kind == 'hit':
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            OCR_CACHE_LOOKUPS.inc(result=kind)
+            return entry[0]
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                OCR_CACHE_EVICTIONS.inc(reason='capacity')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.near_hits) / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class TesserocrBackend:
+    """In-process Tesseract API kept alive for the life of the app.
+
+    The traineddata is loaded once per thread instead of once per plate, and
+    no temp files or subprocesses are involved. PyTessBaseAPI is not
+    thread-safe, so each thread gets its own instance.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', tessdata_path=None):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.lang = lang
+        self.tessdata_path = tessdata_path or os.environ.get('TESSDATA_PREFIX')
+        self._local = threading.local()
+        self._apis = []
+        self._lock = threading.Lock()
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang, 'psm': tesserocr.PSM.SINGLE_WORD}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            api.SetVariable('tessedit_char_whitelist', OCR_WHITELIST)
+            self._local.api = api
+            with self._lock:
+                self._apis.append(api)
+        return api
+
+    def recognize_batch(self, images):
+        # Returns (raw_text, confidence) per image, confidence in 0..1
+        api = self._api()
+        results = []
+        for image in images:
+            api.SetImage(Image.fromarray(image))
+            results.append((api.GetUTF8Text(), api.MeanTextConf() / 100.0))
+        return results
+
+    def close(self):
+        with self._lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+        self._local = threading.local()
+
+
+class PytesseractBackend:
+    """Fallback that shells out to the tesseract executable.
+
+    A frame's crops are written to one temp directory and passed as an image
+    list, so a frame costs a single tesseract process instead of one per plate.
+    """
+    name = 'pytesseract'
+
+    def recognize_batch(self, images):
+        # The CLI path reports no confidence
+        return [(text, None) for text in self._recognize_texts(images)]
+
+    def _recognize_texts(self, images):
+        if len(images) == 1:
+            return [pytesseract.image_to_string(images[0], config=OCR_CONFIG)]
+        with tempfile.TemporaryDirectory(prefix='plates_') as tmp_dir:
+            paths = []
+            for i, image in enumerate(images):
+                path = os.path.join(tmp_dir, f'plate_{i}.png')
+                cv2.imwrite(path, image)
+                paths.append(path)
+            list_path = os.path.join(tmp_dir, 'plates.txt')
+            with open(list_path, 'w') as file:
+                file.write('\n'.join(paths) + '\n')
+            output = pytesseract.image_to_string(list_path, config=OCR_CONFIG)
+        # Tesseract separates pages with a form feed
+        texts = output.split('\f')
+        if len(texts) > len(images) and not texts[-1].strip():
+            texts = texts[:-1]
+        if len(texts) != len(images):
+            return [pytesseract.image_to_string(image, config=OCR_CONFIG) for image in images]
+        return texts
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'tesserocr': TesserocrBackend,
+    'pytesseract': PytesseractBackend,
+}
+
+
+def create_backend(name='auto'):
+    if name != 'auto':
+        return BACKENDS[name]()
+    try:
+        return TesserocrBackend()
+    except Exception as e:
+        print(f"In-process OCR unavailable ({e}), falling back to pytesseract")
+        return PytesseractBackend()
+
+
+class OCREngine:
+    """Reads plate crops: OCR cache first, then the fast classifier, then Tesseract.
+
+    ``classifier`` (a ``charclass.CharClassifier``) answers crops whose weakest
+    character reaches ``min_confidence``; everything else goes to the OCR
+    backend in one call. Each reading carries its source ('fast' or the
+    backend name), and ``stats`` counts how many crops each source answered.
+    """
+
+    def __init__(self, backend='auto', cache=None, classifier=None, min_confidence=0.85):
+        self.backend = create_backend(backend) if isinstance(backend, str) else backend
+        self.fallback = PytesseractBackend() if self.backend.name != 'pytesseract' else None
+        self.cache = cache
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.sources = Counter()
+        self._lock = threading.Lock()
+        print(f"OCR backend: {self.backend.name}")
+
+    def read_plates(self, images):
+        # Returns one (text, error, confidence, source) per crop; error is None unless OCR itself failed
+        if not images:
+            return []
+        raw_results = [None] * len(images)
+        keys = [self.cache.key(image) for image in images] if self.cache is not None else []
+        for i, key in enumerate(keys):
+            raw_results[i] = self.cache.get(key)
+        cached = {i for i, result in enumerate(raw_results) if result is not None}
+        if self.classifier is not None:
+            for i, image in enumerate(images):
+                if raw_results[i] is None:
+                    reading = self.classifier.read(image)
+                    if reading is not None and reading[1] >= self.min_confidence:
+                        raw_results[i] = (reading[0], reading[1], 'fast')
+        # Only crops nothing else could answer go to the backend, still in one call
+        missing = [i for i, result in enumerate(raw_results) if result is None]
+        failure = None
+        if missing:
+            try:
+                backend = self.backend
+                fresh = self._recognize(backend, [images[i] for i in missing])
+            except Exception as ocr_error:
+                failure = ocr_error
+                if self.fallback is not None:
+                    print(f"{self.backend.name} OCR failed ({ocr_error}), retrying with pytesseract")
+                    try:
+                        backend = self.fallback
+                        fresh = self._recognize(backend, [images[i] for i in missing])
+                        failure = None
+                    except Exception as fallback_error:
+                        failure = fallback_error
+            if failure is None:
+                for i, (raw_text, confidence) in zip(missing, fresh):
+                    raw_results[i] = (raw_text, confidence, backend.name)
+        # If the backend failed, only the crops it was asked about fail; cached and fast readings stand
+        read = [result for result in raw_results if result is not None]
+        for i, result in enumerate(raw_results):
+            if keys and i not in cached and result is not None:
+                self.cache.put(keys[i], result)
+        with self._lock:
+            self.sources.update(source for raw_text, confidence, source in read)
+        for raw_text, confidence, source in read:
+            OCR_READS.inc(source=source)
+        results = []
+        for i, result in enumerate(raw_results):
+            if result is None:
+                results.append(self._failed(i, failure))
+                continue
+            raw_text, confidence, source = result
+            text = ''.join(c for c in raw_text if c.isalnum()).strip() or f"Unknown_{i+1}"
+            results.append((text, None, confidence, source))
+        return results
+
+    def _recognize(self, backend, images):
+        OCR_CROPS.inc(len(images), backend=backend.name)
+        start = time.perf_counter()
+        try:
+            return backend.recognize_batch(images)
+        except Exception:
+            OCR_FAILURES.inc(backend=backend.name)
+            raise
+        finally:
+            OCR_CALL_SECONDS.observe(time.perf_counter() - start, backend=backend.name)
+
+    def _failed(self, index, ocr_error):
+        return (f"OCR_Failed_{index+1}", f"Tesseract OCR failed: {str(ocr_error)}.", None, None)
+
+    def stats(self):
+        # Crops answered per source; cache hits count under the source of the cached reading
+        with self._lock:
+            total = sum(self.sources.values())
+            stats = {'reads': total, 'sources': dict(self.sources)}
+        stats['fast_ratio'] = round(stats['sources'].get('fast', 0) / total, 3) if total else None
+        return stats
+
+    def close(self):
+        self.backend.close()
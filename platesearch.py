@@ -0,0 +1,110 @@
+import re
+
+# Characters OCR confuses on plates. The index stores every plate with each
+# group folded to its first member, so a misread still shares its n-grams
+CONFUSION_GROUPS = ('0ODQ', '1IL', '2Z', '5S', '6G', '8B')
+# Cost of substituting one member of a group for another, against 1 for any other edit
+CONFUSION_COST = 0.25
+GRAM_SIZE = 3
+# Search reads candidates from its rarest n-grams, adding more common ones only while
+# their texts total under this; a match sharing nothing but very common n-grams
+# (the state and district part) with the query can be missed
+MAX_CANDIDATE_POSTINGS = 2000
+
+FOLD = {char: group[0] for group in CONFUSION_GROUPS for char in group}
+GROUP = {char: group for group in CONFUSION_GROUPS for char in group}
+NOT_ALNUM = re.compile(r'[^0-9A-Z]')
+
+
+def clean_plate(text):
+    return NOT_ALNUM.sub('', str(text or '').upper())
+
+
+def normalize_plate(text):
+    # Upper-case alphanumerics with confusable characters folded together
+    return ''.join(FOLD.get(char, char) for char in clean_plate(text))
+
+
+def plate_grams(normalized):
+    # Distinct n-grams of a normalized plate; plates shorter than an n-gram index as themselves
+    if len(normalized) < GRAM_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + GRAM_SIZE] for i in range(len(normalized) - GRAM_SIZE + 1)}
+
+
+def substitution_cost(a, b):
+    if a == b:
+        return 0.0
+    return CONFUSION_COST if b in GROUP.get(a, ()) else 1.0
+
+
+def confusion_distance(query, text, partial=False):
+    """Edit distance where swapping confusable characters (0/O, 8/B, 1/I...) is cheap.
+
+    With ``partial``, the query may match anywhere inside ``text`` (the
+    characters of ``text`` around the match are free), so a guard can type
+    the part of a plate they remember.
+    """
+    query, text = clean_plate(query), clean_plate(text)
+    previous = [0.0] * (len(text) + 1) if partial else [float(j) for j in range(len(text) + 1)]
+    for i, q in enumerate(query, 1):
+        current = [float(i)]
+        for j, t in enumerate(text, 1):
+            current.append(min(previous[j] + 1.0, current[j - 1] + 1.0, previous[j - 1] + substitution_cost(q, t)))
+        previous = current
+    return min(previous) if partial else previous[-1]
+
+
+def allowed_errors(query, max_errors=2):
+    # Short queries get fewer errors, or every plate would match
+    return min(max_errors, len(clean_plate(query)) // 5)
+
+
+def min_shared_grams(grams, errors):
+    # One edit breaks at most GRAM_SIZE n-grams, so a true match keeps at least this many (q-gram lemma)
+    return max(1, len(grams) - GRAM_SIZE * errors)
+
+
+def candidate_grams(counts, shared):
+    """The query n-grams whose texts are read as search candidates.
+
+    ``counts`` maps each query n-gram to the number of indexed texts that
+    contain it. A text sharing at least ``shared`` of them contains at least
+    one of the ``len(present) - shared + 1`` rarest present n-grams
+    (pigeonhole), so only those are needed, rarest first, and only up to
+    MAX_CANDIDATE_POSTINGS texts (the rarest is always used).
+    """
+    present = sorted((count, gram) for gram, count in counts.items() if count)
+    if len(present) < shared:
+        return []
+    chosen = []
+    postings = 0
+    for count, gram in present[:len(present) - shared + 1]:
+        if chosen and postings + count > MAX_CANDIDATE_POSTINGS:
+            break
+        chosen.append(gram)
+        postings += count
+    return chosen
+
+
+def rank_matches(query, rows, max_errors=2, text_column=4):
+    # (distance, row) for rows whose plate is within the allowed number of edits, not
+    # counting confusable swaps, of the query; best match then newest first
+    cleaned = clean_plate(query)
+    folded = normalize_plate(cleaned)
+    errors = allowed_errors(cleaned, max_errors)
+    distances = {}
+    ranked = []
+    for row in rows:
+        text = row[text_column]
+        if text not in distances:
+            partial = len(cleaned) < len(clean_plate(text))
+            if confusion_distance(folded, normalize_plate(text), partial) <= errors:
+                distances[text] = confusion_distance(cleaned, text, partial)
+            else:
+                distances[text] = None
+        if distances[text] is not None:
+            ranked.append((distances[text], row))
+    ranked.sort(key=lambda item: item[1][1], reverse=True)
+    ranked.sort(key=lambda item: item[0])
+    return ranked
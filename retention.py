@@ -0,0 +1,290 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import stat
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from database import DatabaseManager
+from imagestore import ImageStore
+from metrics import REGISTRY
+
+PRUNED = REGISTRY.counter('alpr_retention_pruned_total', "Rows and images removed by retention, by kind")
+ARCHIVED = REGISTRY.counter('alpr_retention_archived_total', "Records written to archive segments, by kind")
+
+
+class RetentionPolicy:
+    """How long each kind of data stays in the live database.
+
+    ``image_days``: plate images older than this are dropped (None keeps them).
+    ``metadata_days``: detections and vehicle events older than this move to
+    compressed archive segments in ``archive_dir`` (None keeps them).
+    """
+
+    def __init__(self, image_days=None, metadata_days=None, archive_dir='archive'):
+        self.image_days = image_days
+        self.metadata_days = metadata_days
+        self.archive_dir = archive_dir
+
+    def cutoff(self, days, now=None):
+        if days is None:
+            return None
+        return ((now or datetime.now()) - timedelta(days=days)).isoformat()
+
+
+def segment_path(archive_dir, kind, timestamp):
+    # One segment per kind and day, e.g. archive/detections-2026-03-14.jsonl.gz
+    return os.path.join(archive_dir, f'{kind}s-{timestamp[:10]}.jsonl.gz')
+
+
+def append_segment(path, records):
+    # Each call adds a gzip member; segments stay read-only between appends
+    exists = os.path.exists(path)
+    if exists:
+        os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+    with gzip.open(path, 'at', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record, separators=(',', ':')) + '\n')
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def write_archive(archive_dir, records):
+    os.makedirs(archive_dir, exist_ok=True)
+    by_segment = defaultdict(list)
+    for record in records:
+        by_segment[segment_path(archive_dir, record['kind'], record['timestamp'])].append(record)
+    for path, segment_records in by_segment.items():
+        append_segment(path, segment_records)
+
+
+def search_archive(archive_dir, plate_text=None, start=None, end=None, camera=None, kind='detection'):
+    """Yields archived records matching the filters, oldest segment first.
+
+    ``plate_text`` matches any plate containing it; ``start``/``end`` are ISO
+    timestamps bounding [start, end). Only segments whose day overlaps the
+    range are opened. A record archived twice (a crash between archiving and
+    deleting) is returned once.
+    """
+    needle = plate_text.upper() if plate_text else None
+    seen = set()
+    for path in sorted(glob.glob(os.path.join(archive_dir, f'{kind}s-*.jsonl.gz'))):
+        day = os.path.basename(path)[len(kind) + 2:len(kind) + 12]
+        if (start and day < start[:10]) or (end and day > end[:10]):
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                if (start and record['timestamp'] < start) or (end and record['timestamp'] >= end):
+                    continue
+                if camera is not None and record.get('camera') != camera:
+                    continue
+                if needle:
+                    texts = [p['text'] for p in record['plates']] if kind == 'detection' else [record['plate_text']]
+                    if not any(needle in (text or '').upper() for text in texts):
+                        continue
+                seen.add(record['id'])
+                yield record
+
+
+class RetentionManager:
+    """Applies a RetentionPolicy in small batches on a background thread.
+
+    Each batch is one queued write on the database writer, so detection saves
+    interleave with pruning instead of waiting behind it. Expired metadata is
+    appended to the archive before it is deleted. Freed pages are handed back
+    to the filesystem with incremental vacuum, ``vacuum_pages`` at a time.
+    """
+
+    def __init__(self, db_manager, policy, image_store=None, batch_size=500, interval=600.0, pause=0.05,
+                 vacuum_pages=1024):
+        self.db_manager = db_manager
+        self.policy = policy
+        self.image_store = image_store
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self._stop = threading.Event()
+        self._thread = None
+        self.images_cleared = 0
+        self.detections_archived = 0
+        self.events_archived = 0
+        self.runs = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Retention error: {e}")
+            self._stop.wait(self.interval)
+
+    def _batches(self, step):
+        # Repeats one batch step until it finds nothing left or the manager stops
+        total = 0
+        while not self._stop.is_set():
+            done = step()
+            total += done
+            if done < self.batch_size:
+                break
+            self._stop.wait(self.pause)
+        return total
+
+    def prune_images(self, before):
+        def step():
+            cleared, orphaned = self.db_manager.clear_plate_images(before, self.batch_size)
+            if orphaned and self.image_store is not None:
+                self.image_store.remove(orphaned)
+            PRUNED.inc(cleared, kind='image')
+            return cleared
+
+        cleared = self._batches(step)
+        self.images_cleared += cleared
+        return cleared
+
+    def archive_detections(self, before):
+        def step():
+            records = self.db_manager.get_detections_before(before, self.batch_size)
+            if records:
+                write_archive(self.policy.archive_dir, records)
+                orphaned = self.db_manager.delete_detections([record['id'] for record in records])
+                if orphaned and self.image_store is not None:
+                    self.image_store.remove(orphaned)
+                ARCHIVED.inc(len(records), kind='detection')
+            return len(records)
+
+        archived = self._batches(step)
+        self.detections_archived += archived
+        return archived
+
+    def archive_vehicle_events(self, before):
+        def step():
+            records = self.db_manager.get_vehicle_events_before(before, self.batch_size)
+            if records:
+                write_archive(self.policy.archive_dir, records)
+                self.db_manager.delete_vehicle_events([record['id'] for record in records])
+                ARCHIVED.inc(len(records), kind='vehicle_event')
+            return len(records)
+
+        archived = self._batches(step)
+        self.events_archived += archived
+        return archived
+
+    def vacuum(self):
+        # Frees pages a slice at a time until the freelist is empty (or stops shrinking,
+        # in a file that was never switched to incremental auto_vacuum)
+        remaining = None
+        while not self._stop.is_set():
+            free_pages = self.db_manager.incremental_vacuum(self.vacuum_pages)
+            if not free_pages or free_pages == remaining:
+                break
+            remaining = free_pages
+            self._stop.wait(self.pause)
+
+    def run_once(self, now=None):
+        start = time.monotonic()
+        report = {'images': 0, 'detections': 0, 'vehicle_events': 0}
+        image_cutoff = self.policy.cutoff(self.policy.image_days, now)
+        metadata_cutoff = self.policy.cutoff(self.policy.metadata_days, now)
+        if image_cutoff:
+            report['images'] = self.prune_images(image_cutoff)
+        if metadata_cutoff:
+            report['detections'] = self.archive_detections(metadata_cutoff)
+            report['vehicle_events'] = self.archive_vehicle_events(metadata_cutoff)
+        # Also picks up space freed by manual deletes
+        self.vacuum()
+        self.runs += 1
+        if any(report.values()):
+            print(f"Retention: cleared {report['images']} plate images, archived {report['detections']} detections "
+                  f"and {report['vehicle_events']} vehicle events in {time.monotonic() - start:.1f}s")
+        return report
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'images_cleared': self.images_cleared,
+            'detections_archived': self.detections_archived,
+            'events_archived': self.events_archived,
+        }
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the detections database and search its archive")
+    commands = parser.add_subparsers(dest='command', required=True)
+    prune_parser = commands.add_parser('prune', help="Apply a retention policy once and reclaim the space")
+    prune_parser.add_argument('--db', default='license_plates.db', help="Detections database")
+    prune_parser.add_argument('--image-days', type=float, default=None, help="Keep plate images this many days")
+    prune_parser.add_argument('--metadata-days', type=float, default=None,
+                              help="Keep detections and vehicle events this many days, then archive them")
+    prune_parser.add_argument('--archive-dir', default='archive', help="Where archive segments go")
+    prune_parser.add_argument('--image-store', default=None,
+                              help="Image store directory, so images no plate refers to are deleted")
+    prune_parser.add_argument('--vacuum', action='store_true',
+                              help="Finish with a full VACUUM (exclusive; run with the GUI stopped) to also "
+                                   "compact space freed inside pages, e.g. by dropped images, and switch an older "
+                                   "database to incremental vacuum")
+    search_parser = commands.add_parser('search', help="Search archived detections")
+    search_parser.add_argument('--archive-dir', default='archive', help="Where archive segments are")
+    search_parser.add_argument('--plate', default=None, help="Plate text, or part of it")
+    search_parser.add_argument('--start', default=None, help="ISO date/time to search from")
+    search_parser.add_argument('--end', default=None, help="ISO date/time to search up to (exclusive)")
+    search_parser.add_argument('--camera', default=None, help="Only detections from this camera")
+    search_parser.add_argument('--events', action='store_true', help="Search vehicle events instead of detections")
+    args = parser.parse_args()
+
+    if args.command == 'search':
+        kind = 'vehicle_event' if args.events else 'detection'
+        found = 0
+        for record in search_archive(args.archive_dir, args.plate, args.start, args.end, args.camera, kind):
+            found += 1
+            if kind == 'detection':
+                plates = ', '.join(plate['text'] for plate in record['plates']) or '-'
+                print(f"{record['timestamp']}  {record.get('camera') or '-':<10} #{record['id']:<8} {plates}")
+            else:
+                print(f"{record['first_seen']} .. {record['last_seen']}  {record.get('camera') or '-':<10} "
+                      f"{record['plate_text']} ({record['sightings']} sightings)")
+        print(f"{found} archived {kind.replace('_', ' ')}(s) found")
+        return 0
+
+    image_store = ImageStore(args.image_store, max_bytes=None) if args.image_store else None
+    size_before = os.path.getsize(args.db) if os.path.exists(args.db) else 0
+    db_manager = DatabaseManager(args.db, image_store=image_store)
+    try:
+        policy = RetentionPolicy(args.image_days, args.metadata_days, args.archive_dir)
+        RetentionManager(db_manager, policy, image_store).run_once()
+    finally:
+        db_manager.close()
+        if image_store is not None:
+            image_store.close()
+    if args.vacuum:
+        # Rewrites the whole file, so it needs free disk space of about twice its size
+        print(f"Running VACUUM on {args.db} ({os.path.getsize(args.db) / 2 ** 20:.1f} MB), this can take a while...")
+        conn = sqlite3.connect(args.db)
+        # Takes effect with this VACUUM on files created before incremental vacuum
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        conn.close()
+    # The file only shrinks once the WAL is checkpointed, which closing does
+    print(f"Database size: {size_before / 2 ** 20:.1f} MB -> {os.path.getsize(args.db) / 2 ** 20:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import pytest
+import platesearch
+from database import DatabaseManager
+from platesearch import (CONFUSION_COST, allowed_errors, candidate_grams, confusion_distance, normalize_plate,
+                         plate_grams)
+
+
+def test_normalize_plate_folds_confusable_characters():
+    assert normalize_plate('ka-05 mn 1234') == 'KA05MN1234'
+    assert normalize_plate('KAO5MNI234') == normalize_plate('KA05MN1234')
+    assert normalize_plate('B8') == '88'
+    assert normalize_plate(None) == ''
+
+
+def test_plate_grams():
+    assert plate_grams('KA05M') == {'KA0', 'A05', '05M'}
+    assert plate_grams('AAAA') == {'AAA'}
+    # Shorter than an n-gram: the text is its own gram
+    assert plate_grams('KA') == {'KA'}
+    assert plate_grams('') == set()
+
+
+def test_confusion_distance_o_and_0():
+    assert confusion_distance('KAO5MN1234', 'KA05MN1234') == CONFUSION_COST
+    assert confusion_distance('KA05MN1234', 'KA05MN1234') == 0.0
+
+
+def test_confusion_distance_i_and_1():
+    assert confusion_distance('KA05MNI234', 'KA05MN1234') == CONFUSION_COST
+
+
+def test_confusion_distance_b_and_8():
+    assert confusion_distance('MH12AB9999', 'MH12A89999') == CONFUSION_COST
+
+
+def test_confusion_distance_other_edits_cost_one():
+    assert confusion_distance('KA05MX1234', 'KA05MN1234') == 1.0
+    assert confusion_distance('KA05MN123', 'KA05MN1234') == 1.0
+
+
+def test_confusion_distance_partial():
+    assert confusion_distance('MN12', 'KA05MN1234', partial=True) == 0.0
+    assert confusion_distance('MN12', 'KA05MN1234') == 6.0
+
+
+@pytest.mark.parametrize('query, errors', [
+    ('KA05', 0),
+    ('KA-05', 0),
+    ('KA05M', 1),
+    ('KA05MN123', 1),
+    ('KA05MN1234', 2),
+    ('KA05MN1234567', 2),
+])
+def test_allowed_errors(query, errors):
+    assert allowed_errors(query, max_errors=2) == errors
+
+
+def test_candidate_grams_takes_the_rarest():
+    counts = {'KA0': 500, 'A05': 40, '05M': 3, 'MN1': 0}
+    # Three grams occur anywhere; sharing two of them means sharing one of the two rarest
+    assert candidate_grams(counts, 2) == ['05M', 'A05']
+    assert candidate_grams(counts, 4) == []
+
+
+def test_candidate_grams_respects_the_postings_budget(monkeypatch):
+    monkeypatch.setattr(platesearch, 'MAX_CANDIDATE_POSTINGS', 100)
+    counts = {'KA0': 500, 'A05': 400, '05M': 30}
+    assert candidate_grams(counts, 1) == ['05M']
+    # The rarest gram is used even when it alone is over the budget
+    assert candidate_grams({'KA0': 500}, 1) == ['KA0']
+
+
+PLATES = [
+    ('KA05MN1234', '2026-03-01T08:00:00', 'gate'),
+    ('KA05MN1299', '2026-03-02T08:00:00', 'gate'),
+    ('MH12AB9999', '2026-03-03T08:00:00', 'exit'),
+    ('KA09ZZ5555', '2026-03-04T08:00:00', 'exit'),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'plates.db'))
+
+    def write(cursor):
+        for text, timestamp, camera in PLATES:
+            cursor.execute('INSERT INTO detections (timestamp, plates_count, camera) VALUES (?, 1, ?)',
+                           (timestamp, camera))
+            cursor.execute('INSERT INTO plates (detection_id, plate_text, norm_text) VALUES (?, ?, ?)',
+                           (cursor.lastrowid, text, normalize_plate(text)))
+            db_manager.add_plate_grams(cursor, normalize_plate(text))
+
+    db_manager.execute_write(write)
+    yield db_manager
+    db_manager.close()
+
+
+def found(rows):
+    return [row[4] for row in rows]
+
+
+def test_search_exact(db):
+    assert found(db.search_plates('KA05MN1234'))[0] == 'KA05MN1234'
+
+
+def test_search_confusable_misread(db):
+    assert found(db.search_plates('KAO5MNI234'))[0] == 'KA05MN1234'
+    assert found(db.search_plates('MHI2A89999')) == ['MH12AB9999']
+
+
+def test_search_one_substitution(db):
+    assert found(db.search_plates('KA05MX1234'))[0] == 'KA05MN1234'
+
+
+def test_search_prefix_and_part(db):
+    assert set(found(db.search_plates('KA'))) == {'KA05MN1234', 'KA05MN1299', 'KA09ZZ5555'}
+    assert set(found(db.search_plates('KA05'))) == {'KA05MN1234', 'KA05MN1299'}
+    assert found(db.search_plates('AB9999')) == ['MH12AB9999']
+
+
+def test_search_filters(db):
+    assert found(db.search_plates('KA05', camera='exit')) == []
+    assert found(db.search_plates('KA05', start='2026-03-02', end='2026-03-03')) == ['KA05MN1299']
+
+
+def test_search_no_match(db):
+    assert found(db.search_plates('DL01XY0000')) == []
+
+
+def test_gram_counts_count_distinct_texts(db):
+    # A text saved again is already indexed and does not count twice
+    db.execute_write(lambda cursor: db.add_plate_grams(cursor, normalize_plate('KA05MN1234')))
+    counts = dict(db.reader().execute('SELECT gram, texts FROM gram_counts').fetchall())
+    assert counts['KA0'] == 3
+    assert counts['05M'] == 2
+    assert counts['A89'] == 1
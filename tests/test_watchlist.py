@@ -0,0 +1,96 @@
+import os
+from platesearch import CONFUSION_COST
+from watchlist import Watchlist, WatchEntry, WatchlistMonitor, deletions
+
+
+def test_deletions():
+    assert deletions('ABC', 0) == {'ABC'}
+    assert deletions('ABC', 1) == {'ABC', 'BC', 'AC', 'AB'}
+
+
+def test_exact_hit():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'deny', 'stolen')])
+    match = watchlist.match('ka 05 mn 1234')
+    assert match.entry.label == 'stolen'
+    assert match.action == 'deny'
+    assert match.distance == 0
+
+
+def test_hit_with_ocr_confusion():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow')])
+    match = watchlist.match('KAO5MN1234')
+    assert match.entry.plate == 'KA05MN1234'
+    assert match.distance == CONFUSION_COST
+
+
+def test_hit_with_one_edit():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow')], max_edits=1)
+    assert watchlist.match('KA05MN123').distance == 1
+    assert watchlist.match('KA05MX1234').distance == 1
+
+
+def test_miss_beyond_the_distance_limit():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow')], max_edits=1)
+    assert watchlist.match('KA05XY1234') is None
+    assert watchlist.match('KA05MN12') is None
+    # Short readings are allowed no edits at all
+    assert Watchlist([WatchEntry('KA05', 'allow')], max_edits=1).match('KA06') is None
+
+
+def test_deny_wins_over_allow_at_the_same_distance():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow'), WatchEntry('KA05MN1235', 'deny')])
+    assert watchlist.match('KA05MN1236').action == 'deny'
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow'), WatchEntry('KA05MN1234', 'deny')])
+    assert watchlist.match('KA05MN1234').action == 'deny'
+
+
+def test_closer_entry_wins_over_action():
+    watchlist = Watchlist([WatchEntry('KA05MN1234', 'allow'), WatchEntry('KA05MN1299', 'deny')])
+    assert watchlist.match('KA05MN1234').action == 'allow'
+
+
+def write_csv(path, text, mtime):
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def test_monitor_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / 'watchlist.csv'
+    write_csv(path, 'plate,action,label\nKA05MN1234,deny,stolen\n', 1_000_000)
+    monitor = WatchlistMonitor(str(path), default_action='alert')
+    assert monitor.reload()
+    assert monitor.decide('KA05MN1234')[0] == 'deny'
+    assert monitor.decide('MH12AB9999') == ('alert', None)
+    # Nothing changed, nothing reloaded
+    assert not monitor.reload()
+
+    write_csv(path, 'KA05MN1234,allow,resident\nMH12AB9999,deny\n', 1_000_100)
+    assert monitor.reload()
+    assert monitor.reloads == 2
+    assert monitor.decide('KA05MN1234')[0] == 'allow'
+    assert monitor.decide('MH12AB9999')[0] == 'deny'
+
+
+def test_monitor_keeps_the_previous_list_on_a_bad_file(tmp_path):
+    path = tmp_path / 'watchlist.csv'
+    write_csv(path, 'KA05MN1234,deny\n', 1_000_000)
+    monitor = WatchlistMonitor(str(path))
+    assert monitor.reload()
+    write_csv(path, 'KA05MN1234,maybe\n', 1_000_100)
+    assert not monitor.reload()
+    assert monitor.decide('KA05MN1234')[0] == 'deny'
+
+
+def test_monitor_check_reports_each_decision(tmp_path):
+    path = tmp_path / 'watchlist.csv'
+    write_csv(path, 'KA05MN1234,deny,stolen\n', 1_000_000)
+    events = []
+    monitor = WatchlistMonitor(str(path), on_match=events.append)
+    monitor.reload()
+    plates = [{'text': 'KAO5MN1234'}, {'text': 'MH12AB9999'}]
+    monitor.check(plates, camera='gate')
+    assert plates[0]['decision'] == 'deny'
+    assert plates[0]['watch_match'].entry.label == 'stolen'
+    assert plates[1]['decision'] is None
+    assert [(event['camera'], event['action'], event['entry'].plate) for event in events] == \
+        [('gate', 'deny', 'KA05MN1234')]
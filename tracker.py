@@ -0,0 +1,147 @@
+import itertools
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def centroid_distance(a, b):
+    # Distance between box centres relative to the larger box width
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2.0) - (bx + bw / 2.0)
+    dy = (ay + ah / 2.0) - (by + bh / 2.0)
+    return (dx * dx + dy * dy) ** 0.5 / float(max(aw, bw, 1))
+
+
+def is_valid_reading(text):
+    return bool(text) and not text.startswith(('Unknown_', 'OCR_Failed_'))
+
+
+class PlateTrack:
+    def __init__(self, track_id, box, now, camera=None):
+        self.id = track_id
+        self.box = box
+        self.camera = camera
+        self.first_seen = now
+        self.last_seen = now
+        self.sightings = 1
+        self.ocr_runs = 0
+        self.readings = Counter()
+        self.detection_id = None
+        self.plate_id = None
+        self.saved_text = None
+        # Last gate decision reported for this vehicle, as (action, matched plate)
+        self.watch_decision = None
+
+    @property
+    def best_text(self):
+        if not self.readings:
+            return None
+        return self.readings.most_common(1)[0][0]
+
+    def is_stable(self, min_votes, min_ratio):
+        if not self.readings:
+            return False
+        text, votes = self.readings.most_common(1)[0]
+        return votes >= min_votes and votes / float(sum(self.readings.values())) >= min_ratio
+
+
+class PlateTracker:
+    """Links plate boxes across captures so one vehicle pass is one event.
+
+    Boxes are matched to open tracks from the same camera by IoU, falling back
+    to centroid distance for small boxes that moved further than they overlap. Once a track has
+    ``stable_votes`` agreeing readings making up at least ``stable_ratio`` of
+    its votes, OCR is skipped for it. A track closes after ``max_age`` seconds
+    without a sighting.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_age=30.0,
+                 stable_votes=3, stable_ratio=0.6):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age = max_age
+        self.stable_votes = stable_votes
+        self.stable_ratio = stable_ratio
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.ocr_skipped = 0
+
+    def match(self, boxes, now=None, camera=None):
+        # Returns (track, is_new) for every box, in the same order
+        now = now or datetime.now()
+        with self._lock:
+            candidates = []
+            camera_tracks = [track for track in self.tracks.values() if track.camera == camera]
+            for i, box in enumerate(boxes):
+                for track in camera_tracks:
+                    iou = box_iou(box, track.box)
+                    if iou >= self.iou_threshold:
+                        candidates.append((iou, 0.0, i, track.id))
+                    else:
+                        distance = centroid_distance(box, track.box)
+                        if distance <= self.max_centroid_distance:
+                            candidates.append((0.0, -distance, i, track.id))
+            candidates.sort(reverse=True)
+            assigned = {}
+            used_tracks = set()
+            for _, _, i, track_id in candidates:
+                if i in assigned or track_id in used_tracks:
+                    continue
+                assigned[i] = track_id
+                used_tracks.add(track_id)
+            results = []
+            for i, box in enumerate(boxes):
+                box = tuple(int(v) for v in box)
+                if i in assigned:
+                    track = self.tracks[assigned[i]]
+                    track.box = box
+                    track.last_seen = max(track.last_seen, now)
+                    track.sightings += 1
+                    results.append((track, False))
+                else:
+                    track = PlateTrack(next(self._ids), box, now, camera)
+                    self.tracks[track.id] = track
+                    results.append((track, True))
+            return results
+
+    def needs_ocr(self, track):
+        with self._lock:
+            if track.is_stable(self.stable_votes, self.stable_ratio):
+                self.ocr_skipped += 1
+                return False
+            return True
+
+    def add_reading(self, track, text):
+        with self._lock:
+            track.ocr_runs += 1
+            if is_valid_reading(text):
+                track.readings[text] += 1
+
+    def expire(self, now=None, force=False):
+        # Removes and returns the tracks that have not been seen for max_age seconds
+        now = now or datetime.now()
+        with self._lock:
+            closed = [track for track in self.tracks.values()
+                      if force or (now - track.last_seen).total_seconds() >= self.max_age]
+            for track in closed:
+                del self.tracks[track.id]
+            return closed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open_tracks': len(self.tracks),
+                'ocr_skipped': self.ocr_skipped,
+            }
@@ -0,0 +1,123 @@
+import threading
+import time
+import cv2
+
+TRIGGER_MODES = ('motion', 'timer')
+
+
+class CaptureTrigger:
+    """Decides which camera frames are worth running detection on.
+
+    In 'timer' mode a capture fires every ``timer_interval`` seconds, like the
+    original fixed schedule. In 'motion' mode each frame is downscaled to
+    grayscale and compared against the previous one (or a MOG2 background
+    model) inside ``region``; a capture fires when a motion event starts and
+    then at most every ``cooldown`` seconds while the motion continues.
+    ``min_interval`` is a hard floor between any two captures.
+
+    ``region`` is (x, y, w, h) in fractions of the frame, so it does not
+    depend on the camera resolution.
+    """
+
+    def __init__(self, mode='motion', region=None, timer_interval=5.0, min_interval=1.0, cooldown=3.0,
+                 method='diff', downscale_width=160, pixel_threshold=25, min_changed_ratio=0.02):
+        if mode not in TRIGGER_MODES:
+            raise ValueError(f"Unknown trigger mode: {mode}")
+        self.mode = mode
+        self.region = region
+        self.timer_interval = timer_interval
+        self.min_interval = min_interval
+        self.cooldown = cooldown
+        self.method = method
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._previous = None
+            self._subtractor = None
+            self._in_motion = False
+            self._started_at = now
+            self._last_trigger = now
+            self.frames_checked = 0
+            self.motion_frames = 0
+            self.triggers = 0
+            self.suppressed = 0
+
+    def set_mode(self, mode):
+        if mode not in TRIGGER_MODES:
+            raise ValueError(f"Unknown trigger mode: {mode}")
+        self.mode = mode
+        self.reset()
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.downscale_width / float(width)
+        small = cv2.resize(frame, (self.downscale_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.region is not None:
+            rx, ry, rw, rh = self.region
+            h, w = small.shape[:2]
+            x0, y0 = int(rx * w), int(ry * h)
+            x1, y1 = max(x0 + 1, int((rx + rw) * w)), max(y0 + 1, int((ry + rh) * h))
+            small = small[y0:y1, x0:x1]
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def motion_ratio(self, frame):
+        small = self._prepare(frame)
+        if self.method == 'mog2':
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            mask = self._subtractor.apply(small)
+        else:
+            if self._previous is None or self._previous.shape != small.shape:
+                self._previous = small
+                return 0.0
+            diff = cv2.absdiff(small, self._previous)
+            self._previous = small
+            _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def update(self, frame, now=None):
+        # Returns True when this frame should be sent to detection
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.frames_checked += 1
+            since_last = now - self._last_trigger
+            if self.mode == 'timer':
+                fire = since_last >= self.timer_interval
+            else:
+                moving = self.motion_ratio(frame) >= self.min_changed_ratio
+                if moving:
+                    self.motion_frames += 1
+                    started = not self._in_motion
+                    fire = since_last >= self.min_interval and (started or since_last >= self.cooldown)
+                    if not fire:
+                        self.suppressed += 1
+                else:
+                    fire = False
+                self._in_motion = moving
+            if fire:
+                self._last_trigger = now
+                self.triggers += 1
+            return fire
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = now - self._started_at
+            timer_captures = int(elapsed // self.timer_interval) if self.timer_interval > 0 else 0
+            return {
+                'mode': self.mode,
+                'frames_checked': self.frames_checked,
+                'motion_frames': self.motion_frames,
+                'triggers': self.triggers,
+                'suppressed': self.suppressed,
+                # Captures the fixed timer would have run that the trigger skipped
+                'saved_captures': max(0, timer_captures - self.triggers),
+            }
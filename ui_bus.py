@@ -0,0 +1,29 @@
+import queue
+
+
+class UIEventBus:
+    """Hand-off point between worker threads and the Tk main loop.
+
+    Workers never touch widgets. They ``post`` events (queued captures,
+    finished detections, status messages) and the main thread calls ``drain``
+    once per UI tick and applies everything in a single batched update.
+    Camera previews don't go through the bus: the Tk loop reads the newest
+    frame from each feed itself.
+    """
+
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+        self.posted = 0
+
+    def post(self, kind, payload=None):
+        self._events.put((kind, payload))
+        self.posted += 1
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        return events
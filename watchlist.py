@@ -0,0 +1,252 @@
+import argparse
+import csv
+import os
+import sys
+import threading
+import time
+from metrics import REGISTRY
+from platesearch import allowed_errors, clean_plate, confusion_distance, normalize_plate
+from tracker import is_valid_reading
+
+# Most cautious first: when a reading is equally close to entries with different actions, this order decides
+ACTIONS = ('deny', 'alert', 'allow')
+
+WATCH_DECISIONS = REGISTRY.counter('alpr_watchlist_decisions_total', "Gate decisions made, by action")
+WATCH_MATCH_SECONDS = REGISTRY.histogram('alpr_watchlist_match_seconds', "Time to decide on one plate",
+                                         buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01))
+WATCH_RELOADS = REGISTRY.counter('alpr_watchlist_reloads_total', "Watchlist file reloads, by result")
+
+
+def deletions(text, depth):
+    # The text plus every variant with up to `depth` characters removed
+    variants = frontier = {text}
+    for _ in range(depth):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants = variants | frontier
+    return variants
+
+
+class WatchEntry:
+    def __init__(self, plate, action='allow', label=''):
+        self.plate = clean_plate(plate)
+        self.action = action
+        self.label = label
+        self.normalized = normalize_plate(self.plate)
+
+    def __repr__(self):
+        return f"WatchEntry({self.plate!r}, {self.action!r}, {self.label!r})"
+
+
+class WatchMatch:
+    def __init__(self, entry, text, distance):
+        self.entry = entry
+        self.text = text
+        self.distance = distance
+
+    @property
+    def action(self):
+        return self.entry.action
+
+
+class Watchlist:
+    """Registered plates indexed for lookups that tolerate OCR errors.
+
+    Each entry is keyed by its confusion-normalized text (0/O, 8/B, 1/I...
+    folded together) and by every variant of it with up to ``max_edits``
+    characters deleted. A reading probes the same variants of itself, so
+    every entry within ``max_edits`` edits turns up in a handful of dict
+    lookups, however long the list. Short readings are allowed fewer edits,
+    as in plate search. Candidates are ranked by confusion-aware distance.
+    """
+
+    def __init__(self, entries=(), max_edits=1):
+        self.entries = list(entries)
+        self.max_edits = max_edits
+        self._index = {}
+        for entry in self.entries:
+            for key in deletions(entry.normalized, max_edits):
+                self._index.setdefault(key, []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, text):
+        # Closest entry as a WatchMatch, or None
+        normalized = normalize_plate(text)
+        if not normalized:
+            return None
+        edits = allowed_errors(normalized, self.max_edits)
+        candidates = {}
+        for key in deletions(normalized, edits):
+            for entry in self._index.get(key, ()):
+                candidates[id(entry)] = entry
+        best = None
+        for entry in candidates.values():
+            if confusion_distance(normalized, entry.normalized) > edits:
+                continue
+            distance = confusion_distance(text, entry.plate)
+            rank = (distance, ACTIONS.index(entry.action))
+            if best is None or rank < best[0]:
+                best = (rank, entry)
+        return WatchMatch(best[1], clean_plate(text), best[0][0]) if best else None
+
+
+def load_watchlist(path):
+    """Reads ``plate,action,label`` rows from a CSV file.
+
+    The action defaults to allow and the header row is optional; blank lines
+    and lines starting with # are skipped. Rows with an unknown action raise
+    ValueError, so a half-edited file never replaces a good list.
+    """
+    entries = []
+    with open(path, newline='', encoding='utf-8') as file:
+        for line_number, row in enumerate(csv.reader(file), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            if line_number == 1 and row[0].strip().lower() == 'plate':
+                continue
+            action = row[1].strip().lower() if len(row) > 1 and row[1].strip() else 'allow'
+            if action not in ACTIONS:
+                raise ValueError(f"{path}:{line_number}: unknown action '{row[1]}' (expected {', '.join(ACTIONS)})")
+            entries.append(WatchEntry(row[0], action, row[2].strip() if len(row) > 2 else ''))
+    return entries
+
+
+class WatchlistMonitor:
+    """Keeps a Watchlist in step with its CSV file and decides on detected plates.
+
+    A background thread loads the file, then checks its modification time
+    and size every ``interval`` seconds. A changed file is parsed and indexed on that
+    thread and swapped in with one assignment, so detection never waits on a
+    reload; a file that fails to load leaves the previous list in place.
+    Plates on no list get ``default_action`` (None records no decision).
+    ``on_match(event)`` is called whenever a vehicle gets a decision, once
+    per vehicle unless its reading changes the decision.
+    """
+
+    def __init__(self, path, default_action=None, max_edits=1, interval=2.0, on_match=None):
+        self.path = path
+        self.default_action = default_action
+        self.max_edits = max_edits
+        self.interval = interval
+        self.on_match = on_match
+        self.watchlist = Watchlist(max_edits=max_edits)
+        # (mtime, size) of the file last loaded or rejected, so a bad file is reported once
+        self.seen_version = None
+        self.reloads = 0
+        self.decisions = 0
+        self.matches = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reload(self):
+        # Returns True when a new list was swapped in
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        version = (st.st_mtime_ns, st.st_size)
+        if version == self.seen_version:
+            return False
+        self.seen_version = version
+        try:
+            watchlist = Watchlist(load_watchlist(self.path), self.max_edits)
+        except Exception as e:
+            WATCH_RELOADS.inc(result='error')
+            print(f"Watchlist reload error, keeping the previous list: {e}")
+            return False
+        self.watchlist = watchlist
+        self.reloads += 1
+        WATCH_RELOADS.inc(result='loaded')
+        print(f"Watchlist loaded: {self.path} ({len(watchlist)} plates)")
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="watchlist", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Detection runs with an empty list until the first load finishes
+        while True:
+            self.reload()
+            if self._stop.wait(self.interval):
+                break
+
+    def decide(self, text):
+        # (action, WatchMatch or None) for one plate reading
+        match = self.watchlist.match(text) if is_valid_reading(text) else None
+        return (match.action if match else self.default_action), match
+
+    def check(self, plates, camera=None):
+        # Adds 'decision' and 'watch_match' to each plate dict and reports new decisions
+        for plate in plates:
+            start = time.perf_counter()
+            action, match = self.decide(plate['text'])
+            WATCH_MATCH_SECONDS.observe(time.perf_counter() - start)
+            plate['decision'] = action
+            plate['watch_match'] = match
+            if action is None:
+                continue
+            self.decisions += 1
+            self.matches += match is not None
+            WATCH_DECISIONS.inc(action=action)
+            # A tracked vehicle is reported again only if a better reading changes the outcome
+            key = (action, match.entry.plate if match else None)
+            track = plate.get('track')
+            if track is not None:
+                if track.watch_decision == key:
+                    continue
+                track.watch_decision = key
+            if self.on_match is not None:
+                self.on_match({
+                    'camera': camera,
+                    'text': plate['text'],
+                    'action': action,
+                    'entry': match.entry if match else None,
+                    'distance': match.distance if match else None,
+                })
+
+    def stats(self):
+        return {
+            'entries': len(self.watchlist),
+            'reloads': self.reloads,
+            'decisions': self.decisions,
+            'matches': self.matches,
+        }
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check plate readings against a watchlist file")
+    parser.add_argument('watchlist', help="CSV file of plate,action,label rows")
+    parser.add_argument('plates', nargs='+', help="Plate readings to check")
+    parser.add_argument('--max-edits', type=int, default=1, help="Edits allowed besides confusable characters")
+    parser.add_argument('--default-action', default=None, choices=ACTIONS, help="Decision for plates on no list")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        watchlist = Watchlist(load_watchlist(args.watchlist), args.max_edits)
+    except (OSError, ValueError) as e:
+        print(f"Could not load watchlist: {e}")
+        return 1
+    print(f"Indexed {len(watchlist)} plates in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for text in args.plates:
+        start = time.perf_counter()
+        match = watchlist.match(text)
+        elapsed = (time.perf_counter() - start) * 1000
+        if match is None:
+            print(f"{text:<12} {args.default_action or 'no decision':<8} (no match, {elapsed:.2f} ms)")
+        else:
+            print(f"{text:<12} {match.action:<8} {match.entry.plate} {match.entry.label} "
+                  f"(distance {match.distance:g}, {elapsed:.2f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
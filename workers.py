@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+from metrics import REGISTRY
+
+OVERFLOW_POLICIES = ('drop-oldest', 'drop-newest', 'block')
+
+QUEUE_WAIT_SECONDS = REGISTRY.histogram('alpr_detection_queue_wait_seconds', "Time a capture waited for a worker")
+JOB_SECONDS = REGISTRY.histogram('alpr_detection_job_seconds', "Time from capture to finished detection")
+
+
+class DetectionJob:
+    """One capture travelling through the pool.
+
+    The frame and everything produced from it live on the job, so concurrent
+    detections never share state.
+    """
+
+    def __init__(self, frame, source='auto', on_done=None, camera=None, lane=None):
+        self.frame = frame
+        self.source = source
+        self.on_done = on_done
+        self.camera = camera
+        self.lane = lane
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.plates = []
+        self.detection_id = None
+        self.error = None
+        # Seconds per pipeline stage, filled in by DetectionEngine.process_frame
+        self.timings = {}
+
+
+class DetectionWorkerPool:
+    """Fixed number of detection threads fed by a bounded queue.
+
+    ``overflow`` decides what happens when the queue is full: 'drop-oldest'
+    discards the stalest waiting capture, 'drop-newest' rejects the new one and
+    'block' makes the submitter wait for space.
+
+    With ``batch_handler`` set, a worker takes up to ``batch_size`` jobs that are
+    already waiting (from any camera) and hands them over in one call, so a
+    batching detector can run them in a single pass. It never waits to fill a batch.
+    """
+
+    def __init__(self, handler, workers=2, max_queue=4, overflow='drop-oldest', batch_handler=None, batch_size=1):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.batch_size = batch_size if batch_handler is not None else 1
+        self.batches = 0
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.max_depth = 0
+        self.in_flight = 0
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f"detection-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, job):
+        # Returns False if the job was rejected under the drop-newest policy
+        with self._lock:
+            self.submitted += 1
+        if self.overflow == 'block':
+            self.queue.put(job)
+        else:
+            with self._lock:
+                while True:
+                    try:
+                        self.queue.put_nowait(job)
+                        break
+                    except queue.Full:
+                        if self.overflow == 'drop-newest':
+                            self.dropped_newest += 1
+                            return False
+                        try:
+                            self.queue.get_nowait()
+                            self.queue.task_done()
+                            self.dropped_oldest += 1
+                        except queue.Empty:
+                            pass
+        with self._lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def _take_batch(self):
+        # Returns (jobs, stop); blocks for the first job only
+        jobs = []
+        item = self.queue.get()
+        while item is not None:
+            jobs.append(item)
+            with self._lock:
+                self.in_flight += 1
+            if len(jobs) >= self.batch_size:
+                return jobs, False
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return jobs, False
+        self.queue.task_done()
+        return jobs, True
+
+    def _run(self):
+        while True:
+            jobs, stop = self._take_batch()
+            if jobs:
+                self._process(jobs)
+            if stop:
+                break
+
+    def _process(self, jobs):
+        started = time.monotonic()
+        for job in jobs:
+            job.started_at = started
+        if self.batch_handler is not None:
+            try:
+                self.batch_handler(jobs)
+            except Exception as e:
+                for job in jobs:
+                    job.error = e
+        else:
+            for job in jobs:
+                try:
+                    self.handler(job)
+                except Exception as e:
+                    job.error = e
+        finished = time.monotonic()
+        for job in jobs:
+            QUEUE_WAIT_SECONDS.observe(started - job.submitted_at)
+            JOB_SECONDS.observe(finished - job.submitted_at)
+        with self._lock:
+            self.batches += 1
+            for job in jobs:
+                job.finished_at = finished
+                self.in_flight -= 1
+                if job.error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+        for job in jobs:
+            self.queue.task_done()
+            if job.on_done is not None:
+                try:
+                    job.on_done(job)
+                except Exception as e:
+                    print(f"Detection callback error: {e}")
+
+    def pending(self):
+        with self._lock:
+            return self.queue.qsize() + self.in_flight
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': len(self.threads),
+                'queue_depth': self.queue.qsize(),
+                'max_depth': self.max_depth,
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'dropped_oldest': self.dropped_oldest,
+                'dropped_newest': self.dropped_newest,
+                'dropped': self.dropped_oldest + self.dropped_newest,
+                'batches': self.batches,
+            }
+
+    def close(self, timeout=5.0):
+        # Let queued jobs finish, then stop the workers
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)